@@ -8,6 +8,7 @@ from dotenv import load_dotenv
 import logging
 from lib.configuration import read_client_config, get_config_path
 from lib.socket_exception import SocketCommunicationError
+from lib.framing import FRAMED_PROTOCOL_MARKER, FrameReader, encode_frame
 
 # Load environment variables from .env file
 load_dotenv()
@@ -20,6 +21,12 @@ SSL_CERTFILE = os.getenv('SSL_CERTFILE')  # Path to SSL certificate file
 SSL_KEYFILE = os.getenv('SSL_KEYFILE')    # Path to SSL key file
 MAX_RETRIES = 5  # Maximum number of retries for the connection
 RETRY_DELAY = 2  # Delay between retries in seconds
+# Most framed requests, and bytes of them, sent ahead of their
+# responses. Unread requests then stay well within the socket
+# buffers, so sending never waits on a server that waits for us to
+# read its responses.
+PIPELINE_WINDOW = 64
+PIPELINE_WINDOW_BYTES = 16 * 1024
 
 # Setup logging
 logging.basicConfig(level=logging.DEBUG)
@@ -171,6 +178,100 @@ def send_request(data: dict) -> dict:
                 f"Error connecting to the TCP server: {e}")
 
 
+class FramedConnection:
+    """
+    A persistent connection using the length-prefixed framed protocol.
+
+    The connection is opened once and reused for any number of queries,
+    which can be pipelined; responses come back in request order.
+    """
+
+    def __init__(self):
+        """Open the connection and announce the framed protocol."""
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            if USE_SSL:
+                context = ssl.create_default_context()
+                # Disable hostname checking
+                context.check_hostname = False
+                # Do not verify the certificate
+                context.verify_mode = ssl.CERT_NONE
+                sock = context.wrap_socket(sock, server_hostname=SERVER_IP)
+
+            sock.connect((SERVER_IP, SERVER_PORT))
+            sock.sendall(FRAMED_PROTOCOL_MARKER)
+        except Exception as e:
+            raise SocketCommunicationError(
+                f"Error connecting to the TCP server: {e}")
+
+        self.sock = sock
+        self.frame_reader = FrameReader(sock)
+
+    def send_requests(self, requests: list) -> list:
+        """
+        Pipeline several requests and wait for all of their responses.
+
+        Requests are sent in a sliding window of PIPELINE_WINDOW
+        requests and PIPELINE_WINDOW_BYTES, topped up as responses
+        arrive, so large pipelines cannot deadlock.
+
+        Args:
+            requests (list): JSON encoded request strings.
+
+        Returns:
+            list: The decoded responses, in the same order as the requests.
+        """
+        try:
+            frames = [encode_frame(data.encode('utf-8'))
+                      for data in requests]
+            responses = []
+            sent = 0
+            in_flight = 0
+            while len(responses) < len(frames):
+                window = []
+                # At least one request is always in flight.
+                while (sent < len(frames)
+                       and sent - len(responses) < PIPELINE_WINDOW
+                       and (sent == len(responses)
+                            or in_flight + len(frames[sent])
+                            <= PIPELINE_WINDOW_BYTES)):
+                    window.append(frames[sent])
+                    in_flight += len(frames[sent])
+                    sent += 1
+                if window:
+                    self.sock.sendall(b''.join(window))
+
+                payload = self.frame_reader.read_frame()
+                if payload is None:
+                    raise SocketCommunicationError(
+                        "Server closed the connection")
+                in_flight -= len(frames[len(responses)])
+                responses.append(payload.decode('utf-8'))
+            return responses
+
+        except SocketCommunicationError:
+            raise
+        except Exception as e:
+            raise SocketCommunicationError(
+                f"Error communicating with the TCP server: {e}")
+
+    def send_request(self, data: str) -> str:
+        """
+        Send a single request over the persistent connection.
+
+        Args:
+            data (str): The JSON encoded request.
+
+        Returns:
+            str: The server's response.
+        """
+        return self.send_requests([data])[0]
+
+    def close(self):
+        """Close the persistent connection."""
+        close_connection(self.sock)
+
+
 def close_connection(sock: socket.socket):
     """Close the socket connection."""
     try:
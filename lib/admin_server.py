@@ -0,0 +1,229 @@
+import http.server
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Content type of the Prometheus text exposition format.
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Quantiles of the latency summaries, as Prometheus labels them.
+SUMMARY_QUANTILES = (('0.5', 'p50_ms'), ('0.9', 'p90_ms'),
+                     ('0.99', 'p99_ms'), ('0.999', 'p999_ms'))
+
+
+def escape_label_value(value: Any) -> str:
+    """
+    Escape a label value for the text exposition format.
+
+    Args:
+        value (Any): The value, converted with str().
+
+    Returns:
+        str: The value with backslashes, quotes and newlines escaped.
+    """
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+class PrometheusText:
+    """
+    Builds a Prometheus text exposition.
+
+    Samples may be added in any order, they are grouped by metric
+    name with a single HELP and TYPE line each when rendered.
+    """
+
+    def __init__(self, prefix: str = 'search_server_'):
+        """
+        Initialize an empty exposition.
+
+        Args:
+            prefix (str): Prepended to every metric name.
+        """
+        self.prefix = prefix
+        # name -> (type, help, sample lines), in insertion order.
+        self.families: Dict[str, Tuple[str, str, List[str]]] = {}
+
+    def add(self, name: str, kind: str, help_text: str,
+            value: Optional[float],
+            labels: Optional[Dict[str, Any]] = None,
+            suffix: str = '') -> None:
+        """
+        Add one sample, values of None are left out.
+
+        Args:
+            name (str): The metric name, without the prefix.
+            kind (str): 'gauge', 'counter' or 'summary'.
+            help_text (str): Description of the metric.
+            value (Optional[float]): The sample value.
+            labels (Optional[Dict[str, Any]]): Label names and values.
+            suffix (str): Appended to the sample name, e.g. '_sum'.
+        """
+        family = self.families.setdefault(
+            self.prefix + name, (kind, help_text, []))
+        if value is None:
+            return
+        label_text = ''
+        if labels:
+            label_text = '{' + ','.join(
+                f'{key}="{escape_label_value(label)}"'
+                for key, label in labels.items()) + '}'
+        family[2].append(
+            f"{self.prefix}{name}{suffix}{label_text} {float(value)!r}")
+
+    def add_summary(self, name: str, help_text: str,
+                    summary: Dict[str, Any],
+                    labels: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Add a latency summary in seconds from a histogram summary.
+
+        Args:
+            name (str): The metric name, without the prefix.
+            help_text (str): Description of the metric.
+            summary (Dict[str, Any]): A metrics.registry Histogram
+            summary, in milliseconds.
+            labels (Optional[Dict[str, Any]]): Label names and values.
+        """
+        labels = labels or {}
+        for quantile, key in SUMMARY_QUANTILES:
+            value = summary.get(key)
+            self.add(name, 'summary', help_text,
+                     None if value is None else value / 1000,
+                     dict(labels, quantile=quantile))
+        self.add(name, 'summary', help_text, summary['sum_ms'] / 1000,
+                 labels, '_sum')
+        self.add(name, 'summary', help_text, summary['count'], labels,
+                 '_count')
+
+    def render(self) -> str:
+        """
+        Return the exposition text.
+
+        Returns:
+            str: One HELP, TYPE and sample block per metric.
+        """
+        lines = []
+        for name, (kind, help_text, samples) in self.families.items():
+            if not samples:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+class ConnectionCounter:
+    """
+    Counts open, served and rejected client connections.
+    """
+
+    def __init__(self):
+        """Initialize with no connections."""
+        self.lock = threading.Lock()
+        self.active = 0
+        self.total = 0
+        self.rejected = 0
+
+    def opened(self) -> None:
+        """Record a connection that is being served."""
+        with self.lock:
+            self.active += 1
+            self.total += 1
+
+    def closed(self) -> None:
+        """Record a served connection that was closed."""
+        with self.lock:
+            self.active -= 1
+
+    def reject(self) -> None:
+        """Record a connection turned away with SERVER BUSY."""
+        with self.lock:
+            self.rejected += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the connection counts.
+
+        Returns:
+            Dict[str, int]: Active, total and rejected connections.
+        """
+        with self.lock:
+            return {
+                'active': self.active,
+                'total': self.total,
+                'rejected': self.rejected,
+            }
+
+
+class AdminRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Answers GET /metrics with the exposition of its AdminServer."""
+
+    def do_GET(self) -> None:
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        try:
+            body = self.server.collect().encode('utf-8')
+        except Exception as e:
+            logging.error("Error collecting admin metrics: %s", e)
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logging.debug("DEBUG: Admin request: " + format, *args)
+
+
+class AdminServer(http.server.ThreadingHTTPServer):
+    """
+    A localhost-only HTTP endpoint for metrics scrapers.
+
+    Serves GET /metrics from a daemon thread, building the response
+    with collect() on every request, so scrapes cost nothing while
+    nobody polls.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int, collect: Callable[[], str],
+                 host: str = '127.0.0.1'):
+        """
+        Bind the endpoint.
+
+        Args:
+            port (int): Port to listen on, 0 picks a free one.
+            collect (Callable[[], str]): Builds the exposition text.
+            host (str): Address to bind, loopback by default.
+        """
+        super().__init__((host, port), AdminRequestHandler)
+        self.collect = collect
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        """The port the endpoint listens on."""
+        return self.server_address[1]
+
+    def start(self) -> 'AdminServer':
+        """
+        Serve requests in a daemon thread.
+
+        Returns:
+            AdminServer: This server.
+        """
+        self.thread = threading.Thread(
+            target=self.serve_forever, daemon=True)
+        self.thread.start()
+        logging.debug("DEBUG: Admin endpoint on http://%s:%d/metrics",
+                      self.server_address[0], self.port)
+        return self
+
+    def close(self) -> None:
+        """Stop serving and close the socket."""
+        if self.thread is not None:
+            self.shutdown()
+            self.thread.join()
+        self.server_close()
@@ -1,17 +1,24 @@
 import logging
-from typing import List, Tuple
+from typing import Optional, Tuple
+
+from lib.sorted_index import SortedIndex
 
 
 class BinarySearch:
-    def __init__(self, file_path: str, file_content: str):
+    def __init__(self, file_path: str, file_content: str,
+                 sorted_index: Optional[SortedIndex] = None):
         """
         Initialize the BinarySearch instance with the file path and content.
         Args:
             file_path (str): The path to the file for searching strings.
             file_content (str): The content of the file as a single string.
+            sorted_index (Optional[SortedIndex]): Shared sorted lines,
+            built from file_content if not given.
         """
         self.file_path = file_path
         self.file_content = file_content[0]
+        # Sorted once, and shared with the other sorted algorithms
+        self.sorted_index = sorted_index or SortedIndex(self.file_content)
 
     def search(self, target_string: str) -> Tuple[bool, str]:
         """
@@ -21,45 +28,10 @@ class BinarySearch:
         Returns:
             Tuple[bool, str]: Tuple indicating if the string was found.
         """
-        logging.debug(f"Running BinarySearch on {target_string}")
-        # Split content into a list and sort it
-        words = sorted(self.file_content.split('\n'))
-
-        # Perform the iterative binary search
-        result = self.perform_iterative_search(words, target_string)
+        logging.debug("Running BinarySearch on %s", target_string)
 
-        if result:
+        # np.searchsorted runs the binary search over the sorted array
+        if self.sorted_index.contains(target_string):
+            logging.debug("Match found")
             return True
-        else:
-            return False
-
-    def perform_iterative_search(self, content: List[str], query: str) -> bool:
-        """
-        Perform iterative binary search on a list of strings.
-        Args:
-            content (List[str]): A sorted list of strings for searching.
-            query (str): The target string to search.
-        Returns:
-            bool: A boolean indicating if the string was found.
-        """
-        # Clean up extra spaces from the search query
-        query_clean = query.strip()
-
-        # Set initial search bounds
-        left, right = 0, len(content) - 1
-
-        while left <= right:
-            mid = (left + right) // 2
-            current_item = content[mid].strip()
-
-            if current_item == query_clean:
-                logging.debug("Match found")
-                return True  # Item found
-            elif current_item < query_clean:
-                left = mid + 1
-            else:
-                right = mid - 1
-
-        # Return False if the item wasn't found
-        print("Match not found")
         return False
@@ -1,16 +1,26 @@
-from typing import Tuple, Optional, List
+import logging
+from typing import Tuple, Optional
+
+import numpy as np
+
+from lib.sorted_index import SortedIndex
 
 
 class ExponentialSearch:
-    def __init__(self, file_path: str, file_content: str) -> None:
+    def __init__(self, file_path: str, file_content: str,
+                 sorted_index: Optional[SortedIndex] = None) -> None:
         """
         Initialize the ExponentialSearch instance with the given file path.
 
         Args:
             file_path (str): Path to the file containing strings to search.
+            sorted_index (Optional[SortedIndex]): Shared sorted lines,
+            built from file_content if not given.
         """
         self.file_path = file_path
         self.file_content = file_content[0]
+        # Sorted once, and shared with the other sorted algorithms
+        self.sorted_index = sorted_index or SortedIndex(self.file_content)
 
     def search(self, target_string: str) -> Tuple[bool, Optional[str]]:
         """
@@ -24,59 +34,36 @@ class ExponentialSearch:
             and the string itself, or None if not found.
         """
         try:
-            # Sort words for searching
-            words = sorted(self.file_content.split())
-            return self.exponential_search(words, target_string)
+            return self.exponential_search(
+                self.sorted_index.keys,
+                self.sorted_index.encode(target_string))
         except Exception as e:
-            print(ValueError(f"DEBUG: ERROR=> {e}"))
+            logging.error("Exponential search failed: %s", e)
             raise ValueError(f"SSL configuration is incomplete {e}")
 
-    def exponential_search(self, arr: List[str],
-                           target_string: str) -> Tuple[bool, Optional[str]]:
+    def exponential_search(self, arr: np.ndarray,
+                           target: bytes) -> Tuple[bool, Optional[str]]:
         """
         Perform exponential search on a sorted array of strings.
 
         Args:
-            arr (List[str]): The sorted list of strings to search in.
-            target_string (str): The string to search for.
+            arr (np.ndarray): The sorted byte strings to search in.
+            target (bytes): The encoded string to search for.
 
         Returns:
             Tuple[bool, Optional[str]]: Tuple indicating if string was found
             and the string itself, or None if not found.
         """
-        if arr[0] == target_string:
-            return True, arr[0]
+        if not len(arr):
+            return False
+        if arr[0] == target:
+            return True
 
         index = 1
-        while index < len(arr) and arr[index] <= target_string:
+        while index < len(arr) and arr[index] <= target:
             index *= 2
 
-        # Call binary search on the found range
-        return self.binary_search(arr, target_string, index // 2,
-                                  min(index, len(arr) - 1))
-
-    def binary_search(self, arr: List[str], target_string: str,
-                      left: int, right: int) -> Tuple[bool, Optional[str]]:
-        """
-        Perform binary search on a given range of a sorted array.
-
-        Args:
-            arr (List[str]): The sorted list of strings to search in.
-            target_string (str): The string to search for.
-            left (int): The left index for the binary search.
-            right (int): The right index for the binary search.
-
-        Returns:
-            Tuple[bool, Optional[str]]: Tuple indicating if string was found
-            or False if not found.
-        """
-        while left <= right:
-            mid = (left + right) // 2
-
-            if arr[mid] == target_string:
-                return True
-            elif arr[mid] < target_string:
-                left = mid + 1
-            else:
-                right = mid - 1
-        return False
+        # Binary search on the found range
+        left, right = index // 2, min(index, len(arr))
+        i = left + int(np.searchsorted(arr[left:right], target))
+        return bool(i < len(arr) and arr[i] == target)
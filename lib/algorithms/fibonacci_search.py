@@ -1,27 +1,25 @@
-from typing import List, Tuple, Optional
+from typing import Tuple, Optional
+
+import numpy as np
+
+from lib.sorted_index import SortedIndex
 
 
 class FibonacciSearch:
-    def __init__(self, file_path: str, file_content: str) -> None:
+    def __init__(self, file_path: str, file_content: str,
+                 sorted_index: Optional[SortedIndex] = None) -> None:
         """
         Initialize the FibonacciSearch instance with the given file path.
 
         Args:
             file_path (str): Path to the file containing strings to search.
+            sorted_index (Optional[SortedIndex]): Shared sorted lines,
+            built from file_content if not given.
         """
         self.file_path = file_path
         self.file_content = file_content[0]
-
-    def load_file_content(self) -> List[str]:
-        """
-        Load and sort the file content.
-
-        Returns:
-            List[str]: A list of sorted strings from the file.
-        """
-        # Sort lines for Fibonacci search
-        words = sorted(self.file_content.splitlines())
-        return words
+        # Sorted once, and shared with the other sorted algorithms
+        self.sorted_index = sorted_index or SortedIndex(self.file_content)
 
     def search(self, target_string: str) -> Tuple[bool, Optional[str]]:
         """
@@ -34,17 +32,17 @@ class FibonacciSearch:
             Tuple[bool, Optional[str]]: Tuple indicating if string was found
             and the string itself, or None if not found.
         """
-        words = self.load_file_content()  # Load and sort the file content
-        return self.fibonacci_search(words, target_string)
+        return self.fibonacci_search(
+            self.sorted_index.keys, self.sorted_index.encode(target_string))
 
-    def fibonacci_search(self, arr: List[str],
-                         target: str) -> Tuple[bool, Optional[str]]:
+    def fibonacci_search(self, arr: np.ndarray,
+                         target: bytes) -> Tuple[bool, Optional[str]]:
         """
         Perform Fibonacci search on a sorted array.
 
         Args:
-            arr (List[str]): The sorted list of strings to search in.
-            target (str): The string to search for.
+            arr (np.ndarray): The sorted byte strings to search in.
+            target (bytes): The encoded string to search for.
 
         Returns:
             Tuple[bool, Optional[str]]: Tuple indicating if string was found
@@ -81,6 +79,6 @@ class FibonacciSearch:
 
         # Check the last remaining element
         if fib_m1 and offset + 1 < n and arr[offset + 1] == target:
-            return True, arr[offset + 1]
+            return True
 
         return False  # Target not found
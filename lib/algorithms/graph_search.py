@@ -1,3 +1,4 @@
+import logging
 from typing import List
 
 
@@ -62,6 +63,7 @@ class GraphBasedSearch:
         """
         self.file_path = file_path
         self.file_content = file_content[0]
+        self.strings_list = self.load_strings_from_file()
 
     def load_strings_from_file(self) -> List[str]:
         """
@@ -84,10 +86,9 @@ class GraphBasedSearch:
             str: "STRING FOUND" if the target string is found,
             else "STRING NOT FOUND".
         """
-        strings_list = self.load_strings_from_file()
-        if not strings_list:  # Check if the list is empty
-            print("No strings loaded for searching.")
+        if not self.strings_list:  # Check if the list is empty
+            logging.warning("No strings loaded for searching.")
             return "STRING NOT FOUND"
 
-        found = exponential_search(strings_list, target_string)
+        found = exponential_search(self.strings_list, target_string)
         return True if found else False
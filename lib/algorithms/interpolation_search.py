@@ -11,6 +11,7 @@ class InterpolationSearch:
         """
         self.file_path = file_path
         self.file_content = file_content[0]
+        self.words = self.load_file_content()  # Load and sort once
 
     def load_file_content(self) -> List[str]:
         """
@@ -35,8 +36,7 @@ class InterpolationSearch:
             A tuple indicating if the string was found
             and the string itself, or None if not found.
         """
-        words = self.load_file_content()  # Load and sort the file content
-        return self.interpolation_search(words, target_string)
+        return self.interpolation_search(self.words, target_string)
 
     def interpolation_search(self, arr: List[str],
                              target: str) -> Tuple[bool, Optional[str]]:
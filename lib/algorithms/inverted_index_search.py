@@ -1,3 +1,4 @@
+import logging
 from collections import defaultdict
 from typing import Dict, List, Optional
 
@@ -12,6 +13,7 @@ class InvertedIndexSearch:
         """
         self.file_path = file_path
         self.file_content = file_content[0]
+        self.inverted_index = self.build_inverted_index()
 
     def build_inverted_index(self) -> Optional[Dict[str, List[int]]]:
         """
@@ -31,7 +33,7 @@ class InvertedIndexSearch:
             return index
 
         except Exception as error:
-            print(f"DEBUG: Error processing query raised error - {error}")
+            logging.error("Error building the inverted index: %s", error)
             return False
 
     def search(self, target_string: str) -> bool:
@@ -44,7 +46,6 @@ class InvertedIndexSearch:
         Returns:
             bool: True if the target string is found in the index, else False.
         """
-        inverted_index = self.build_inverted_index()
-        if inverted_index is not None:
-            return target_string in inverted_index
+        if self.inverted_index is not None:
+            return target_string in self.inverted_index
         return False
@@ -1,17 +1,24 @@
 import math
-from typing import Tuple
+from typing import Optional, Tuple
+
+from lib.sorted_index import SortedIndex
 
 
 class JumpSearch:
-    def __init__(self, file_path: str, file_content: str) -> None:
+    def __init__(self, file_path: str, file_content: str,
+                 sorted_index: Optional[SortedIndex] = None) -> None:
         """
         Initialize the JumpSearch with the specified file path.
 
         Args:
             file_path (str): Path to file containing the text to be searched.
+            sorted_index (Optional[SortedIndex]): Shared sorted lines,
+            built from file_content if not given.
         """
         self.file_path = file_path
         self.file_content = file_content[0]
+        # Sorted once, and shared with the other sorted algorithms
+        self.sorted_index = sorted_index or SortedIndex(self.file_content)
 
     def search(self, target_string: str) -> Tuple[bool, str]:
         """
@@ -25,22 +32,20 @@ class JumpSearch:
             target string was found and the second element is the target string
             if found, or None if not found.
         """
-
-        words = sorted(self.file_content.split())
+        words = self.sorted_index.keys
+        target = self.sorted_index.encode(target_string)
         n = len(words)
-        jump = int(math.sqrt(n))
-        prev = 0
+        step = int(math.sqrt(n)) or 1
+        prev, jump = 0, step
 
-        # Jump through the sorted list
+        # Jump through the sorted array
         # to find the block where the target might be
-        while words[min(jump, n) - 1] < target_string:
+        while words[min(jump, n) - 1] < target:
             prev = jump
-            jump += int(math.sqrt(n))
+            jump += step
             if prev >= n:
                 return False
-        # Perform a linear search within the identified block
-        for i in range(prev, min(jump, n)):
-            if words[i] == target_string:
-                return True
 
-        return False
+        # Search within the identified block, one vectorized comparison
+        # instead of a Python loop over the block.
+        return bool((words[prev:min(jump, n)] == target).any())
@@ -11,6 +11,7 @@ class LinearSearch:
         """
         self.file_path = file_path
         self.file_content = file_content[0]
+        self.words = self.file_content.split()
 
     def search(self, target_string: str) -> Tuple[bool, str]:
         """
@@ -24,10 +25,8 @@ class LinearSearch:
             target string was found and the second element is the target string
             if found, or None if not found.
         """
-        words = self.file_content.split()
-
         # Iterate through the list of words to find the target string
-        for word in words:
+        for word in self.words:
             if word.strip() == target_string:
                 # Return true if found
                 return True
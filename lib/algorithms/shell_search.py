@@ -14,6 +14,8 @@ class ShellSearch:
         self.file_path = file_path
         # Each line is treated as an individual string
         self.sorted_lines = file_content[0].strip().split('\n')
+        # Perform ShellSort on the lines once
+        self.perform_shell_sort()
 
     def search(self, target_string: str) -> Tuple[bool, Optional[str]]:
         """
@@ -26,10 +28,7 @@ class ShellSearch:
         # Strip any trailing/leading whitespace from the target string
         target_string = target_string.strip()
 
-        # Perform ShellSort on the lines
-        self.perform_shell_sort()
-
-        # Perform a linear search after sorting
+        # Perform a linear search on the sorted lines
         return self.perform_linear_search(target_string)
 
     def perform_shell_sort(self) -> None:
@@ -1,16 +1,25 @@
-from typing import Tuple, List, Optional
+from typing import Tuple, Optional
+
+import numpy as np
+
+from lib.sorted_index import SortedIndex
 
 
 class TernarySearch:
-    def __init__(self, file_path: str, file_content: str) -> None:
+    def __init__(self, file_path: str, file_content: str,
+                 sorted_index: Optional[SortedIndex] = None) -> None:
         """
         Initialize the TernarySearch instance with the given file path.
 
         Args:
             file_path (str): The path to the file containing strings to search.
+            sorted_index (Optional[SortedIndex]): Shared sorted lines,
+            built from file_content if not given.
         """
         self.file_path = file_path
         self.file_content = file_content[0]
+        # Sorted once, and shared with the other sorted algorithms
+        self.sorted_index = sorted_index or SortedIndex(self.file_content)
 
     def search(self, target_string: str) -> Tuple[bool, Optional[str]]:
         """
@@ -23,19 +32,19 @@ class TernarySearch:
             Tuple[bool, Optional[str]]: Tuple indicating if string was found
             and the string itself, or None if not found.
         """
+        keys = self.sorted_index.keys
+        return self.ternary_search(keys, self.sorted_index.encode(
+            target_string), 0, len(keys) - 1)
 
-        words = sorted(self.file_content.split())  # Sort words for searching
-        return self.ternary_search(words, target_string, 0, len(words) - 1)
-
-    def ternary_search(self, arr: List[str],
-                       target_string: str, left: int,
+    def ternary_search(self, arr: np.ndarray,
+                       target: bytes, left: int,
                        right: int) -> Tuple[bool, Optional[str]]:
         """
         Perform ternary search on a sorted array.
 
         Args:
-            arr (List[str]): The sorted list of strings to search in.
-            target_string (str): The string to search for.
+            arr (np.ndarray): The sorted byte strings to search in.
+            target (bytes): The encoded string to search for.
             left (int): The left index for the search range.
             right (int): The right index for the search range.
 
@@ -43,27 +52,22 @@ class TernarySearch:
             Tuple[bool, Optional[str]]: Tuple indicating if string was found
             and the string itself, or None if not found.
         """
-        if left > right:
-            return False  # Base case: target not found
+        while left <= right:
+            third_length = (right - left) // 3
+            mid1 = left + third_length
+            mid2 = right - third_length
 
-        third_length = (right - left) // 3
-        mid1 = left + third_length
-        mid2 = right - third_length
+            if arr[mid1] == target or arr[mid2] == target:
+                return True  # Target found at mid1 or mid2
 
-        if arr[mid1] == target_string:
-            return True  # Target found at mid1
-        if arr[mid2] == target_string:
-            return True  # Target found at mid2
+            if target < arr[mid1]:
+                # Search in the first third
+                right = mid1 - 1
+            elif target > arr[mid2]:
+                # Search in the last third
+                left = mid2 + 1
+            else:
+                # Search in the middle third
+                left, right = mid1 + 1, mid2 - 1
 
-        if target_string < arr[mid1]:
-            # Search in the first third
-            return self.ternary_search(arr,
-                                       target_string, left, mid1 - 1)
-        elif target_string > arr[mid2]:
-            # Search in the last third
-            return self.ternary_search(arr,
-                                       target_string, mid2 + 1, right)
-        else:
-            # Search in the middle third
-            return self.ternary_search(arr,
-                                       target_string, mid1 + 1, mid2 - 1)
+        return False  # Target not found
@@ -0,0 +1,102 @@
+import logging
+import math
+import time
+from typing import Any, Dict, Iterable
+
+import numpy as np
+
+HASH_MASK = (1 << 64) - 1
+LOW_MASK = (1 << 32) - 1
+
+
+class BloomFilter:
+    """
+    A Bloom filter over strings, built with one vectorized pass.
+
+    The k probe positions come from Python's own string hash, split
+    into two 32 bit halves and combined by double hashing. Strings
+    that were hashed before, like the lines of a snapshot's hash set,
+    cache their hash, so building the filter mostly costs the NumPy
+    work. String hashes are randomized per process, a filter is never
+    shared with another process.
+
+    The checks and rejections counters are updated without a lock
+    and are only meant for statistics.
+    """
+
+    __slots__ = ('bits', 'size', 'hash_count', 'count',
+                 'false_positive_rate', 'checks', 'rejections')
+
+    def __init__(self, items: Iterable[str], count: int,
+                 false_positive_rate: float = 0.01):
+        """
+        Build the filter.
+
+        Args:
+            items (Iterable[str]): The strings to add.
+            count (int): Number of strings in items, or an upper bound
+            when items skips repeats, the filter is sized for it.
+            false_positive_rate (float): Target false positive rate.
+        """
+        start_time = time.time()
+        count = max(count, 1)
+        self.count = count
+        self.false_positive_rate = false_positive_rate
+        self.size = max(64, math.ceil(
+            -count * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / count * math.log(2)))
+        self.checks = 0
+        self.rejections = 0
+
+        # No exact count is passed, items may yield fewer strings.
+        hashes = np.fromiter(
+            map(hash, items), dtype=np.int64).view(np.uint64)
+        low = hashes & np.uint64(LOW_MASK)
+        high = (hashes >> np.uint64(32)) | np.uint64(1)
+        bits = np.zeros(self.size, dtype=bool)
+        for i in range(self.hash_count):
+            bits[(low + np.uint64(i) * high) % np.uint64(self.size)] = True
+        self.bits = np.packbits(bits, bitorder='little').tobytes()
+        logging.debug(
+            "DEBUG: Bloom filter of %d strings, %d bytes and %d hashes "
+            "built in %.2f ms", count, len(self.bits), self.hash_count,
+            (time.time() - start_time) * 1000)
+
+    def might_contain(self, item: str) -> bool:
+        """
+        Check whether item may have been added.
+
+        Args:
+            item (str): The string to check.
+
+        Returns:
+            bool: False if item was certainly not added.
+        """
+        self.checks += 1
+        h = hash(item) & HASH_MASK
+        low, high = h & LOW_MASK, (h >> 32) | 1
+        bits, size = self.bits, self.size
+        for i in range(self.hash_count):
+            position = (low + i * high) % size
+            if not bits[position >> 3] >> (position & 7) & 1:
+                self.rejections += 1
+                return False
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the filter size and how often it answered a query.
+
+        Returns:
+            Dict[str, Any]: Size, hash count, checks and rejections.
+        """
+        checks, rejections = self.checks, self.rejections
+        return {
+            'size_bytes': len(self.bits),
+            'count': self.count,
+            'hash_count': self.hash_count,
+            'false_positive_rate': self.false_positive_rate,
+            'checks': checks,
+            'rejections': rejections,
+            'rejection_rate': rejections / checks if checks else 0.0,
+        }
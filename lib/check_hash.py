@@ -6,7 +6,6 @@ class CheckHash:
 
     def search(self, target_string):
         if target_string in self.hash_content:
-            print("String found! hash map")
             return True
         else:
             return False
@@ -1,5 +1,6 @@
 
 import configparser
+import logging
 import os
 import json
 import ssl
@@ -39,7 +40,31 @@ def read_config(config_file: str) -> Dict[str, Any]:
         'ssl_psk_keyfile': None,
         'reread_on_query_config': None,
         'metrics_path': None,
-        "algorithms_list": None
+        "algorithms_list": None,
+        'server_mode': 'threaded',
+        'executor_workers': 4,
+        'listen_backlog': 4096,
+        'prebuild_algorithms': [],
+        'reload_quiet_window_ms': 200,
+        'incremental_reload': True,
+        'queue_depth': 256,
+        'max_connections': 1024,
+        'algorithm_limits': {},
+        'prefork_workers': 4,
+        'index_snapshot_dir': None,
+        'packed_keys': False,
+        'out_of_core': False,
+        'out_of_core_chunk_bytes': 32 * 1024 * 1024,
+        'bloom_filter': False,
+        'bloom_filter_fpr': 0.01,
+        'result_cache_entries': 0,
+        'result_cache_bytes': 16 * 1024 * 1024,
+        'metrics_flush_interval_ms': 5000,
+        'admin_port': 0,
+        'log_level': 'INFO',
+        'log_file': None,
+        'log_queue': True,
+        'query_log_sample_rate': 0.0
     }
 
     for section in config.sections():
@@ -68,6 +93,100 @@ def read_config(config_file: str) -> Dict[str, Any]:
         settings['algorithms_list'] = config.get(
             section, 'algorithms_list', fallback=settings['algorithms_list']
         )
+        settings['server_mode'] = config.get(
+            section, 'server_mode', fallback=settings['server_mode']
+        )
+        settings['executor_workers'] = config.getint(
+            section, 'executor_workers',
+            fallback=settings['executor_workers']
+        )
+        settings['listen_backlog'] = config.getint(
+            section, 'listen_backlog', fallback=settings['listen_backlog']
+        )
+        settings['reload_quiet_window_ms'] = config.getint(
+            section, 'reload_quiet_window_ms',
+            fallback=settings['reload_quiet_window_ms']
+        )
+        settings['incremental_reload'] = config.getboolean(
+            section, 'incremental_reload',
+            fallback=settings['incremental_reload']
+        )
+        settings['queue_depth'] = config.getint(
+            section, 'queue_depth', fallback=settings['queue_depth']
+        )
+        settings['max_connections'] = config.getint(
+            section, 'max_connections', fallback=settings['max_connections']
+        )
+        settings['prefork_workers'] = config.getint(
+            section, 'prefork_workers', fallback=settings['prefork_workers']
+        )
+        settings['index_snapshot_dir'] = config.get(
+            section, 'index_snapshot_dir',
+            fallback=settings['index_snapshot_dir']
+        ) or None
+        settings['packed_keys'] = config.getboolean(
+            section, 'packed_keys', fallback=settings['packed_keys']
+        )
+        settings['out_of_core'] = config.getboolean(
+            section, 'out_of_core', fallback=settings['out_of_core']
+        )
+        settings['out_of_core_chunk_bytes'] = config.getint(
+            section, 'out_of_core_chunk_bytes',
+            fallback=settings['out_of_core_chunk_bytes']
+        )
+        settings['bloom_filter'] = config.getboolean(
+            section, 'bloom_filter', fallback=settings['bloom_filter']
+        )
+        settings['bloom_filter_fpr'] = config.getfloat(
+            section, 'bloom_filter_fpr',
+            fallback=settings['bloom_filter_fpr']
+        )
+        settings['result_cache_entries'] = config.getint(
+            section, 'result_cache_entries',
+            fallback=settings['result_cache_entries']
+        )
+        settings['result_cache_bytes'] = config.getint(
+            section, 'result_cache_bytes',
+            fallback=settings['result_cache_bytes']
+        )
+        settings['metrics_flush_interval_ms'] = config.getint(
+            section, 'metrics_flush_interval_ms',
+            fallback=settings['metrics_flush_interval_ms']
+        )
+        settings['admin_port'] = config.getint(
+            section, 'admin_port', fallback=settings['admin_port']
+        )
+        settings['log_level'] = config.get(
+            section, 'log_level', fallback=settings['log_level']
+        )
+        settings['log_file'] = config.get(
+            section, 'log_file', fallback=settings['log_file']
+        ) or None
+        settings['log_queue'] = config.getboolean(
+            section, 'log_queue', fallback=settings['log_queue']
+        )
+        settings['query_log_sample_rate'] = config.getfloat(
+            section, 'query_log_sample_rate',
+            fallback=settings['query_log_sample_rate']
+        )
+        algorithm_limits = config.get(
+            section, 'algorithm_limits', fallback=None
+        )
+        if algorithm_limits is not None:
+            settings['algorithm_limits'] = {
+                name.strip(): int(limit)
+                for name, limit in (
+                    item.split(':') for item in algorithm_limits.split(',')
+                    if item.strip())
+            }
+        prebuild_algorithms = config.get(
+            section, 'prebuild_algorithms', fallback=None
+        )
+        if prebuild_algorithms is not None:
+            settings['prebuild_algorithms'] = [
+                name.strip() for name in prebuild_algorithms.split(',')
+                if name.strip()
+            ]
 
     return settings
 
@@ -83,7 +202,7 @@ def read_client_config(config_file: str) -> Dict[str, Any]:
     """
     config = configparser.ConfigParser()
     config.read(config_file)
-    print(config_file)
+    logging.debug("Reading client configuration from %s", config_file)
     settings: Dict[str, Any] = {
         'use_ssl': False,
         'ssl_certfile': None,
@@ -91,7 +210,6 @@ def read_client_config(config_file: str) -> Dict[str, Any]:
     }
 
     for section in config.sections():
-        print(section)
         settings['use_ssl'] = config.getboolean(
             section, 'use_ssl', fallback=settings['use_ssl']
         )
@@ -160,12 +278,12 @@ def load_reread_on_query_config(
 
     except json.JSONDecodeError:
         # Handle the case where the JSON is malformed
-        print(f"Error: The file {config_file_path} is not a valid JSON.")
+        logging.error(f"The file {config_file_path} is not a valid JSON.")
         raise
 
     except Exception as e:
         # Catch any other unexpected errors
-        print(f"An unexpected error occurred: {e}")
+        logging.error(f"An unexpected error occurred: {e}")
         raise
 
 
@@ -1,24 +1,28 @@
-import mmap
+import os
 import pyinotify
 import logging
-from lib.optimized_file_reader import FileReader
-from lib.file_server import FileServer
+from lib.reload_scheduler import ReloadScheduler
 
 
 class EventHandler(pyinotify.ProcessEvent):
 
+    def my_init(self, scheduler: ReloadScheduler = None):
+        # Called by pyinotify.ProcessEvent.__init__ with its kwargs.
+        self.scheduler = scheduler
+        self.file_path = os.path.abspath(scheduler.file_path)
+
+    def schedule_reload(self, event):
+        # The parent directory is watched, ignore its other files.
+        if os.path.abspath(event.pathname) != self.file_path:
+            return
+        logging.debug("DEBUG: %s has been modified.", event.pathname)
+        self.scheduler.notify()
+
     def process_IN_MODIFY(self, event):
-        file_reader = FileReader()
-        logging.debug(f"DEBUG: {event.pathname} has been modified.")
-        logging.debug("DEBUG: pyinotify: Reading the file with mmap")
+        self.schedule_reload(event)
 
-        # Open the file first to get a file descriptor
-        with open(event.pathname, 'r') as f:
-            # Use the file descriptor (f.fileno()) for mmap
-            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
-                shared_file_content = m.read().decode('utf-8')
-                file_server_instance = FileServer()
-                file_server_instance.update_file_content(shared_file_content)
-                logging.debug("DEBUG: File content updated.")
+    def process_IN_CLOSE_WRITE(self, event):
+        self.schedule_reload(event)
 
-        return
+    def process_IN_MOVED_TO(self, event):
+        self.schedule_reload(event)
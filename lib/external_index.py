@@ -0,0 +1,295 @@
+import contextlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from lib.index_snapshot import index_snapshot_path
+from lib.shared_index import INDEX_HEADER, SharedIndex, SharedSnapshot
+
+EXTERNAL_INDEX_MAGIC = b'XIDX'
+# Bump whenever the layout changes, older files are then rebuilt.
+EXTERNAL_INDEX_VERSION = 1
+# magic, version, sampled digest of the indexed bytes, length of the
+# data file path that follows.
+FILE_HEADER = struct.Struct('!4sH16sQ')
+# Bytes of the data file sorted in memory at a time. The build peaks
+# at about ten times as much while a chunk is split and sorted.
+DEFAULT_CHUNK_BYTES = 32 * 1024 * 1024
+# Most runs merged at once, each holds an open file and its buffer.
+MERGE_FAN_IN = 128
+
+
+def external_index_path(directory: str, data_file_path: str) -> str:
+    """
+    Return the out-of-core index file for a data file.
+
+    Args:
+        directory (str): Directory holding the index.
+        data_file_path (str): The indexed data file.
+
+    Returns:
+        str: Path of the index file.
+    """
+    return os.path.splitext(
+        index_snapshot_path(directory, data_file_path))[0] + '.xidx'
+
+
+def _index_offset(path_length: int) -> int:
+    """Offset of the index block, aligned to 8 bytes."""
+    return (FILE_HEADER.size + path_length + 7) & ~7
+
+
+def _read_lines(source: BinaryIO, size: int,
+                chunk_bytes: int) -> Iterator[List[str]]:
+    """
+    Read the first size bytes of source as lists of lines.
+
+    Every chunk ends at a line break, and the lines split exactly
+    like content.split('\\n') splits the whole content.
+    """
+    source.seek(0)
+    remaining = size
+    while True:
+        chunk = source.read(max(0, min(chunk_bytes, remaining)))
+        remaining -= len(chunk)
+        if remaining > 0 and chunk and not chunk.endswith(b'\n'):
+            rest = source.readline(remaining)
+            remaining -= len(rest)
+            chunk += rest
+        last = remaining <= 0 or not chunk
+        lines = chunk.decode('utf-8').split('\n')
+        if not last and chunk.endswith(b'\n'):
+            # The next chunk starts a new line, there is no empty one.
+            lines.pop()
+        yield lines
+        if last:
+            return
+
+
+def _sort_unique(records: np.ndarray) -> np.ndarray:
+    """Sort fixed-width byte records and drop repeats."""
+    width = (records.dtype.itemsize + 7) // 8 * 8
+    records = records.astype(f'S{width}')
+    # Big-endian words compare like the bytes they hold, and NumPy
+    # sorts integers several times faster than byte strings.
+    words = records.view('>u8').reshape(len(records), width // 8)
+    records = records[np.lexsort(words.astype(np.uint64).T[::-1])]
+    keep = np.ones(len(records), dtype=bool)
+    keep[1:] = records[1:] != records[:-1]
+    return records[keep]
+
+
+def _write_run(directory: str, records: np.ndarray) -> Tuple[str, int]:
+    """Write sorted records to a new run file, returning its path."""
+    fd, path = tempfile.mkstemp(suffix='.run', dir=directory)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(records.tobytes())
+    return path, records.dtype.itemsize
+
+
+def _merge_runs(runs: List[Tuple[str, int]], out: BinaryIO, width: int,
+                buffer_bytes: int) -> int:
+    """
+    Merge sorted runs into width-byte records without repeats.
+
+    Each round writes every buffered record up to the smallest last
+    record buffered from a run that is not fully read, which no later
+    record of any run can precede.
+
+    Returns:
+        int: Number of records written to out.
+    """
+    dtype = np.dtype(f'S{width}')
+    block = max(1, buffer_bytes // (len(runs) * width))
+    written = 0
+    with contextlib.ExitStack() as stack:
+        files = [stack.enter_context(open(path, 'rb')) for path, _ in runs]
+
+        def read_block(i: int) -> np.ndarray:
+            run_width = runs[i][1]
+            data = files[i].read(block * run_width)
+            return np.frombuffer(data, f'S{run_width}').astype(dtype)
+
+        blocks = [read_block(i) for i in range(len(runs))]
+        done = [len(records) < block for records in blocks]
+        while any(len(records) for records in blocks):
+            limits = [records[-1] for records, finished
+                      in zip(blocks, done) if not finished]
+            taken = []
+            for i, records in enumerate(blocks):
+                end = (np.searchsorted(records, min(limits), 'right')
+                       if limits else len(records))
+                taken.append(records[:end])
+                blocks[i] = records[end:]
+                if not len(blocks[i]) and not done[i]:
+                    blocks[i] = read_block(i)
+                    done[i] = len(blocks[i]) < block
+            merged = _sort_unique(np.concatenate(taken)).astype(dtype)
+            out.write(merged.tobytes())
+            written += len(merged)
+    return written
+
+
+def _merge_to_runs(directory: str, runs: List[Tuple[str, int]],
+                   width: int, buffer_bytes: int) -> List[Tuple[str, int]]:
+    """Merge runs MERGE_FAN_IN at a time until one pass merges all."""
+    while len(runs) > MERGE_FAN_IN:
+        merged = []
+        for start in range(0, len(runs), MERGE_FAN_IN):
+            group = runs[start:start + MERGE_FAN_IN]
+            fd, path = tempfile.mkstemp(suffix='.run', dir=directory)
+            with os.fdopen(fd, 'wb') as f:
+                _merge_runs(group, f, width, buffer_bytes)
+            merged.append((path, width))
+            for run_path, _ in group:
+                os.remove(run_path)
+        runs = merged
+    return runs
+
+
+def _map_index(path: str) -> Tuple[SharedIndex, bytes, str]:
+    """Map an index file, returning it, its sample and indexed path."""
+    with open(path, 'rb') as f:
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, version, sample, path_length = FILE_HEADER.unpack_from(m)
+        if (magic != EXTERNAL_INDEX_MAGIC
+                or version != EXTERNAL_INDEX_VERSION):
+            raise ValueError(f"{path} is not an out-of-core index")
+        indexed_path = m[FILE_HEADER.size:FILE_HEADER.size + path_length]
+        index = SharedIndex(memoryview(m)[_index_offset(path_length):], m)
+        return index, sample, indexed_path.decode('utf-8')
+    except Exception:
+        m.close()
+        raise
+
+
+def build_external_index(
+        path: str,
+        source: BinaryIO,
+        size: int,
+        data_file_path: str,
+        file_stat: Tuple[int, int, int],
+        sample: bytes,
+        chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> SharedIndex:
+    """
+    Sort the distinct stripped lines of a file into an on-disk index.
+
+    An external merge sort: chunk_bytes of the file at a time are
+    split, sorted and written to a run file next to the index, then
+    the runs are merged, chunk_bytes of buffered records at a time,
+    into fixed-width records in the SharedIndex layout. Memory stays
+    bounded by the chunk size whatever the size of the file.
+
+    The index is written next to its final name and renamed over it,
+    so a crash never leaves a half written index.
+
+    Args:
+        path (str): Path of the index file.
+        source (BinaryIO): The open data file.
+        size (int): Number of bytes of source to index.
+        data_file_path (str): The data file, recorded in the index.
+        file_stat (Tuple[int, int, int]): The (inode, size, mtime_ns)
+        of the indexed bytes.
+        sample (bytes): Sampled digest of the indexed bytes.
+        chunk_bytes (int): Bytes of the file sorted in memory at a time.
+
+    Returns:
+        SharedIndex: The mapped index.
+    """
+    start_time = time.time()
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    indexed_path = os.path.abspath(data_file_path).encode('utf-8')
+    index_offset = _index_offset(len(indexed_path))
+    records_offset = index_offset + INDEX_HEADER.size
+
+    with tempfile.TemporaryDirectory(dir=directory) as run_directory:
+        runs = []
+        width = 1
+        for lines in _read_lines(source, size, chunk_bytes):
+            records = np.array([line.strip().encode('utf-8')
+                                for line in lines], dtype=bytes)
+            # Freed before the next chunk is read, one is held at a time.
+            del lines
+            width = max(width, records.dtype.itemsize)
+            runs.append(_write_run(run_directory, _sort_unique(records)))
+            del records
+        run_count = len(runs)
+        runs = _merge_to_runs(run_directory, runs, width, chunk_bytes)
+
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(FILE_HEADER.pack(
+                EXTERNAL_INDEX_MAGIC, EXTERNAL_INDEX_VERSION, sample,
+                len(indexed_path)))
+            f.write(indexed_path.ljust(index_offset - FILE_HEADER.size,
+                                       b'\0'))
+            f.seek(records_offset)
+            record_count = _merge_runs(runs, f, width, chunk_bytes)
+            # The count is only known now, the header goes in last.
+            f.seek(index_offset)
+            f.write(INDEX_HEADER.pack(
+                0, 0, record_count, width, *file_stat))
+        os.replace(temp_path, path)
+
+    logging.info(
+        "Built out-of-core index of %s: %d distinct lines from %d runs "
+        "in %.2f s", data_file_path, record_count, run_count,
+        time.time() - start_time)
+    return _map_index(path)[0]
+
+
+def load_external_index(
+        path: str,
+        data_file_path: str) -> Optional[Tuple[SharedIndex, bytes]]:
+    """
+    Map an out-of-core index written for data_file_path.
+
+    Only the header is checked here, the caller decides whether the
+    data file still matches the indexed size, mtime and sample.
+
+    Args:
+        path (str): Path of the index file.
+        data_file_path (str): The data file the index must be for.
+
+    Returns:
+        Optional[Tuple[SharedIndex, bytes]]: The mapped index and the
+        sampled digest, or None if there is no usable index.
+    """
+    try:
+        index, sample, indexed_path = _map_index(path)
+    except (OSError, ValueError, struct.error, UnicodeDecodeError):
+        return None
+
+    if indexed_path != os.path.abspath(data_file_path):
+        logging.debug("DEBUG: Ignoring out-of-core index %s", path)
+        index.close()
+        return None
+    return index, sample
+
+
+class ExternalSnapshot(SharedSnapshot):
+    """
+    A FileSnapshot answered from an out-of-core index alone.
+
+    The file content is never loaded, so every algorithm is answered
+    by a binary search over the mapped records.
+    """
+
+    __slots__ = ()
+
+    @property
+    def content(self) -> str:
+        raise ValueError(
+            f"{self.file_path} is indexed out of core, its content "
+            f"is not loaded")
+
+    def content_chunks(self) -> Tuple[str, ...]:
+        return ()
@@ -1,3 +1,4 @@
+import logging
 import mmap
 import time
 from typing import Any, List, Optional, Type
@@ -47,14 +48,15 @@ class FileReader:
             data_cached_content = []
 
             with open(file_path, 'r') as file:
-                print("DEBUG: Reading the file in FileReader")
+                logging.debug("DEBUG: Reading the file in FileReader")
                 while chunk := file.read(chunk_size):
                     data_cached_content.append(chunk)
 
             self.cached_content = ''.join(data_cached_content).split()
             self.caching_done = True
             exec_time = time.time() - start_time
-            print(f"DEBUG: File reader Time: {exec_time * 1000:.2f} ms")
+            logging.debug(
+                "DEBUG: File reader Time: %.2f ms", exec_time * 1000)
 
             return self.cached_content
 
@@ -1,34 +1,221 @@
+import itertools
 import logging
+import os
 import threading
+from typing import (
+    AbstractSet, FrozenSet, Iterable, Iterator, Optional, Tuple, Union)
+
+from lib.index_registry import IndexRegistry
+from lib.packed_index import PackedKeyIndex
+
+
+class LayeredHashIndex:
+    """
+    An immutable set of lines made of a base set and appended layers.
+
+    Extending it only hashes the new lines. Layers are merged like a
+    log-structured merge tree whenever a layer is at least half the
+    size of the one below it, which keeps the number of layers
+    logarithmic and the amortized cost per appended line constant.
+    """
+
+    __slots__ = ('layers',)
+
+    def __init__(self, layers: Tuple[FrozenSet[str], ...]):
+        self.layers = layers
+
+    def __contains__(self, item: str) -> bool:
+        for layer in self.layers:
+            if item in layer:
+                return True
+        return False
+
+    def __len__(self) -> int:
+        return sum(len(layer) for layer in self.layers)
+
+    def __iter__(self) -> Iterator[str]:
+        # Layers are disjoint only by chance, so skip repeated lines.
+        for i, layer in enumerate(self.layers):
+            for item in layer:
+                if not any(item in lower for lower in self.layers[:i]):
+                    yield item
+
+    def extend(self, lines: Iterable[str]) -> 'LayeredHashIndex':
+        layers = self.layers + (frozenset(lines),)
+        # A base that is not a frozenset (a mapped index) is never merged.
+        while (len(layers) > 1 and isinstance(layers[-2], frozenset)
+               and 2 * len(layers[-1]) >= len(layers[-2])):
+            layers = layers[:-2] + (layers[-2] | layers[-1],)
+        return LayeredHashIndex(layers)
+
+
+class FileSnapshot:
+    """
+    An immutable view of the data file content and its hash index.
+
+    Snapshots are never modified after they are built. A reload builds
+    a new snapshot off to the side and publishes it with a single
+    reference swap, so a query that grabbed a snapshot keeps a
+    consistent view until it finishes, and the old snapshot is freed
+    once the last query holding it is done.
+
+    Snapshots made by appending keep their content as chunks, joined
+    only when an algorithm first needs the whole content.
+
+    file_stat holds the (inode, size, mtime_ns) of the file the
+    content was read from, so queries can cheaply tell whether the
+    file changed since.
+    """
+
+    __slots__ = ('_content', '_chunks', 'hash_map', 'generation',
+                 'file_path', 'file_stat')
+
+    def __init__(self,
+                 content: Optional[str],
+                 hash_map: AbstractSet[str],
+                 generation: int,
+                 file_path: Optional[str] = None,
+                 chunks: Optional[Tuple[str, ...]] = None,
+                 file_stat: Optional[Tuple[int, int, int]] = None):
+        self._content = content
+        self._chunks = chunks
+        self.hash_map = hash_map
+        self.generation = generation
+        self.file_path = file_path
+        self.file_stat = file_stat
+
+    @property
+    def content(self) -> str:
+        content = self._content
+        if content is None:
+            # Joining twice from two threads is harmless, both get
+            # the same string. The chunks are read once, another
+            # thread may clear them after joining.
+            chunks = self._chunks
+            if chunks is None:
+                return self._content
+            content = ''.join(chunks)
+            self._content = content
+            self._chunks = None
+        return content
+
+    def content_chunks(self) -> Tuple[str, ...]:
+        chunks = self._chunks
+        if chunks is None:
+            return (self._content,)
+        return chunks
+
+    def loaded_chunks(self) -> Tuple[str, ...]:
+        # The content strings in memory right now, nothing is joined
+        # or copied out of shared memory.
+        if self._content is not None:
+            return (self._content,)
+        return self._chunks or ()
 
 
 class FileServer:
 
-    _shared_file_content = ""
-    _server_updated = False
-    _shared_hash_map = {}
+    _snapshot = FileSnapshot("", frozenset(), 0)
+    # Serializes publishers only, readers never take it.
+    _publish_lock = threading.Lock()
+    _generations = itertools.count(1)
+    # Index lines as packed integer keys instead of strings.
+    packed_keys = False
+
+    @classmethod
+    def hashing_data(
+            cls, content: str) -> Union[FrozenSet[str], PackedKeyIndex]:
+        if cls.packed_keys:
+            return PackedKeyIndex(content)
+        return frozenset(line.strip() for line in content.split('\n'))
 
-    def __init__(self):
-        self.lock = threading.Lock()
+    @staticmethod
+    def next_generation() -> int:
+        # Allocating the generation up front keeps it unique even when
+        # several snapshots are built at the same time.
+        return next(FileServer._generations)
 
-    def hashing_data(self):
-        for line in self._shared_file_content.split('\n'):
-            FileServer._shared_hash_map[line.strip()] = True
+    @staticmethod
+    def file_signature(stat: os.stat_result) -> Tuple[int, int, int]:
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
 
-    def update_file_content(self, content: str):
-        with self.lock:
-            FileServer._shared_file_content = content
-            FileServer._server_updated = True
-            self.hashing_data()
-        logging.debug(f"updating FileServer at FileServer ")
+    def build_snapshot(
+            self, content: str,
+            file_path: Optional[str] = None,
+            file_stat: Optional[Tuple[int, int, int]] = None
+    ) -> FileSnapshot:
+        generation = self.next_generation()
+        return FileSnapshot(
+            content, self.hashing_data(content), generation, file_path,
+            file_stat=file_stat)
+
+    def build_appended_snapshot(
+            self, base: FileSnapshot,
+            tail: str,
+            file_stat: Optional[Tuple[int, int, int]] = None
+    ) -> FileSnapshot:
+        # Only the appended lines are hashed, the base index is shared.
+        hash_map = base.hash_map
+        if not isinstance(hash_map, LayeredHashIndex):
+            hash_map = LayeredHashIndex((hash_map,))
+        new_lines = (line.strip() for line in tail.split('\n'))
+
+        generation = self.next_generation()
+        return FileSnapshot(
+            None,
+            hash_map.extend(new_lines),
+            generation,
+            base.file_path,
+            base.content_chunks() + (tail,),
+            file_stat)
+
+    def publish_snapshot(self, snapshot: FileSnapshot) -> bool:
+        with FileServer._publish_lock:
+            if snapshot.generation <= FileServer._snapshot.generation:
+                logging.debug("Dropping stale snapshot %d",
+                              snapshot.generation)
+                return False
+            FileServer._snapshot = snapshot
+        # Structures of older content are no longer handed out, they are
+        # freed once the queries still using them finish.
+        IndexRegistry.discard_older(snapshot.generation)
+        logging.debug("Published snapshot %d", snapshot.generation)
+        return True
+
+    def update_file_content(
+            self, content: str,
+            file_path: Optional[str] = None,
+            file_stat: Optional[Tuple[int, int, int]] = None
+    ) -> FileSnapshot:
+        snapshot = self.build_snapshot(content, file_path, file_stat)
+        self.publish_snapshot(snapshot)
+        return snapshot
+
+    def is_current(self, file_path: str) -> bool:
+        # One stat call instead of reading the file, the snapshot is
+        # current while the inode, size and mtime are unchanged.
+        snapshot = FileServer._snapshot
+        if snapshot.file_stat is None or snapshot.file_path != file_path:
+            return False
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        return self.file_signature(stat) == snapshot.file_stat
+
+    def get_snapshot(self) -> FileSnapshot:
+        return FileServer._snapshot
 
     def get_file_content(self):
-        with self.lock:
-            cont_len = len(self._shared_file_content)
-            logging.debug(F"The current file content ln is {cont_len}")
-            return self._shared_hash_map
+        snapshot = FileServer._snapshot
+        logging.debug("The current file content generation is %d",
+                      snapshot.generation)
+        return snapshot.hash_map
+
+    def get_generation(self) -> int:
+        return FileServer._snapshot.generation
 
     def is_file_server_updated(self) -> bool:
-        logging.debug(
-            f"is_file_server_updated?: {FileServer._server_updated} ")
-        return FileServer._shared_file_content
+        updated = FileServer._snapshot.generation > 0
+        logging.debug("is_file_server_updated?: %s", updated)
+        return updated
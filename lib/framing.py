@@ -0,0 +1,144 @@
+import asyncio
+import socket
+import struct
+from typing import Optional
+
+from lib.socket_exception import FramingError
+
+# First byte sent by a client that wants the framed protocol.
+# Legacy clients always start with '{' so the two never collide.
+FRAMED_PROTOCOL_MARKER = b'\x01'
+
+# Every frame is a 4 byte big-endian length followed by the payload.
+FRAME_HEADER = struct.Struct('!I')
+
+# Upper bound on a single frame, protects the server from bogus lengths.
+MAX_FRAME_SIZE = 1024 * 1024
+
+RECV_SIZE = 65536
+
+
+def encode_frame(payload: bytes) -> bytes:
+    """
+    Prefix a payload with its length so it can be sent as one frame.
+
+    Args:
+        payload (bytes): The payload to frame.
+
+    Returns:
+        bytes: The length-prefixed frame.
+    """
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def check_frame_size(size: int) -> None:
+    """
+    Reject frames that are larger than MAX_FRAME_SIZE.
+
+    Args:
+        size (int): The length read from a frame header.
+
+    Raises:
+        FramingError: If the frame is too large.
+    """
+    if size > MAX_FRAME_SIZE:
+        raise FramingError(
+            f"Frame of {size} bytes exceeds limit of {MAX_FRAME_SIZE}")
+
+
+class FrameReader:
+    """
+    Reads length-prefixed frames from a blocking socket.
+
+    Bytes that were already received (for example together with the
+    protocol marker) can be handed in so they are not lost.
+    """
+
+    def __init__(self, conn: socket.socket, initial_data: bytes = b''):
+        """
+        Initialize the FrameReader.
+
+        Args:
+            conn (socket.socket): The connected socket to read from.
+            initial_data (bytes): Bytes received before framing started.
+        """
+        self.conn = conn
+        self.buffer = bytearray(initial_data)
+
+    def _fill(self, size: int) -> bool:
+        """Receive until the buffer holds at least size bytes."""
+        while len(self.buffer) < size:
+            chunk = self.conn.recv(RECV_SIZE)
+            if not chunk:
+                return False
+            self.buffer += chunk
+        return True
+
+    def has_buffered_frame(self) -> bool:
+        """
+        Check whether a complete frame is already in the buffer.
+
+        Returns:
+            bool: True if read_frame() can return without blocking.
+        """
+        if len(self.buffer) < FRAME_HEADER.size:
+            return False
+        (size,) = FRAME_HEADER.unpack_from(self.buffer)
+        return len(self.buffer) >= FRAME_HEADER.size + size
+
+    def read_frame(self) -> Optional[bytes]:
+        """
+        Read the next frame payload.
+
+        Returns:
+            Optional[bytes]: The payload, or None when the peer closed the
+            connection between frames.
+
+        Raises:
+            FramingError: If the connection closes mid-frame or the frame
+            is too large.
+        """
+        if not self._fill(FRAME_HEADER.size):
+            if self.buffer:
+                raise FramingError("Connection closed inside frame header")
+            return None
+
+        (size,) = FRAME_HEADER.unpack_from(self.buffer)
+        check_frame_size(size)
+        end = FRAME_HEADER.size + size
+        if not self._fill(end):
+            raise FramingError("Connection closed inside frame payload")
+
+        payload = bytes(self.buffer[FRAME_HEADER.size:end])
+        del self.buffer[:end]
+        return payload
+
+
+async def read_frame_async(reader: asyncio.StreamReader) -> Optional[bytes]:
+    """
+    Read the next frame payload from an asyncio stream.
+
+    Args:
+        reader (asyncio.StreamReader): The stream to read from.
+
+    Returns:
+        Optional[bytes]: The payload, or None when the peer closed the
+        connection between frames.
+
+    Raises:
+        FramingError: If the connection closes mid-frame or the frame
+        is too large.
+    """
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise FramingError("Connection closed inside frame header")
+        return None
+
+    (size,) = FRAME_HEADER.unpack(header)
+    check_frame_size(size)
+    try:
+        return await reader.readexactly(size)
+    except asyncio.IncompleteReadError:
+        raise FramingError("Connection closed inside frame payload")
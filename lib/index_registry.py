@@ -0,0 +1,236 @@
+import collections
+import itertools
+import logging
+import sys
+import threading
+import time
+import types
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Containers larger than this are sized from a sample of their items.
+SIZE_SAMPLE = 1000
+# Objects walked before containers are sized from their first item.
+SIZE_NODE_BUDGET = 100000
+# Never followed when sizing, they are not part of a structure.
+UNSIZED_TYPES = (type, types.ModuleType, types.FunctionType,
+                 types.MethodType, types.BuiltinFunctionType, memoryview)
+# Sized by sys.getsizeof alone.
+FLAT_TYPES = (str, bytes, bytearray, int, float, complex, bool,
+              type(None), range)
+
+
+def estimate_size(obj: Any, seen: Optional[Set[int]] = None) -> int:
+    """
+    Estimate the memory reachable from an object.
+
+    NumPy arrays count their buffer. Containers with more than
+    SIZE_SAMPLE items are extrapolated from their first SIZE_SAMPLE
+    items, so a set of millions of lines is sized in microseconds.
+
+    The walk is iterative, so deep tries do not hit the recursion
+    limit. After SIZE_NODE_BUDGET objects every container is
+    extrapolated from its first item, a trie of millions of nodes is
+    then sized from one path below each branch still pending.
+
+    Args:
+        obj (Any): The object to size.
+        seen (Optional[Set[int]]): Ids of objects already counted,
+        they and anything only reachable through them count 0.
+
+    Returns:
+        int: The estimated size in bytes.
+    """
+    if seen is None:
+        seen = set()
+    total = 0.0
+    walked = 0
+    # Objects still to size, with how many objects each stands for.
+    stack: List[Tuple[Any, float]] = [(obj, 1.0)]
+    while stack:
+        obj, weight = stack.pop()
+        if id(obj) in seen or isinstance(obj, UNSIZED_TYPES):
+            continue
+        seen.add(id(obj))
+        walked += 1
+        if isinstance(obj, np.ndarray):
+            total += obj.nbytes * weight
+            continue
+        total += sys.getsizeof(obj) * weight
+        if isinstance(obj, FLAT_TYPES):
+            continue
+
+        if isinstance(obj, dict):
+            items: Iterable[Any] = itertools.chain.from_iterable(obj.items())
+            count, first_item = 2 * len(obj), 2
+        elif isinstance(obj, (list, tuple, set, frozenset, collections.deque)):
+            items, count, first_item = obj, len(obj), 1
+        else:
+            attributes = [getattr(obj, name) for name in _slot_names(obj)
+                          if hasattr(obj, name)]
+            instance_dict = getattr(obj, '__dict__', None)
+            if instance_dict is not None and id(instance_dict) not in seen:
+                # Attributes are all walked, unlike a dict's items.
+                seen.add(id(instance_dict))
+                total += sys.getsizeof(instance_dict) * weight
+                attributes.extend(
+                    itertools.chain.from_iterable(instance_dict.items()))
+            items, count = attributes, len(attributes)
+            first_item = count
+
+        limit = SIZE_SAMPLE if walked <= SIZE_NODE_BUDGET else first_item
+        sample = list(itertools.islice(items, limit))
+        if sample:
+            item_weight = weight * count / len(sample)
+            stack.extend((item, item_weight) for item in sample)
+    return int(total)
+
+
+def _slot_names(obj: Any) -> List[str]:
+    """Return the __slots__ of an object's class and its bases."""
+    names = []
+    for cls in type(obj).__mro__:
+        slots = cls.__dict__.get('__slots__', ())
+        names.extend((slots,) if isinstance(slots, str) else slots)
+    return names
+
+
+class IndexRegistry:
+    """
+    Holds ready-built search structures, keyed by
+    (file path, content generation, algorithm).
+
+    Each structure is built once per generation of the file content.
+    Concurrent queries for a structure that is still being built wait
+    for that build instead of starting their own, and structures of
+    older generations are dropped once a newer one is published.
+    """
+
+    _indexes: Dict[Tuple[str, int, str], Any] = {}
+    _build_locks: Dict[Tuple[str, int, str], threading.Lock] = {}
+    # Build time in milliseconds of every registered structure.
+    _build_ms: Dict[Tuple[str, int, str], float] = {}
+    # Estimated bytes, computed on the first call to stats().
+    _sizes: Dict[Tuple[str, int, str], int] = {}
+    _lock = threading.Lock()
+    # Newest published generation, older structures are not kept.
+    _current_generation = 0
+
+    @classmethod
+    def get_or_build(cls,
+                     file_path: str,
+                     generation: int,
+                     algorithm: str,
+                     builder: Callable[[], Any]) -> Any:
+        """
+        Return the structure for the key, building it if needed.
+
+        Args:
+            file_path (str): Path of the data file.
+            generation (int): Generation of the file content.
+            algorithm (str): Name of the search algorithm.
+            builder (Callable[[], Any]): Builds the structure.
+
+        Returns:
+            Any: The ready-built search structure.
+        """
+        key = (file_path, generation, algorithm)
+        index = cls._indexes.get(key)
+        if index is not None:
+            return index
+
+        with cls._lock:
+            build_lock = cls._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            index = cls._indexes.get(key)
+            if index is not None:
+                return index
+
+            start_time = time.time()
+            try:
+                index = builder()
+                build_ms = (time.time() - start_time) * 1000
+                logging.debug(
+                    "Built '%s' index for generation %d in %.2f ms",
+                    algorithm, generation, build_ms)
+
+                with cls._lock:
+                    # A query still holding an old snapshot may finish
+                    # its build after a reload, that structure is not
+                    # kept. Older structures stay until the publish, a
+                    # prebuilt generation is not live yet.
+                    if generation >= cls._current_generation:
+                        cls._indexes[key] = index
+                        cls._build_ms[key] = build_ms
+            finally:
+                # Also after a failed build, the next query retries.
+                with cls._lock:
+                    cls._build_locks.pop(key, None)
+
+        return index
+
+    @classmethod
+    def discard_older(cls, generation: int) -> None:
+        """
+        Drop structures built from content older than the generation.
+
+        Args:
+            generation (int): The generation that was just published.
+        """
+        with cls._lock:
+            cls._current_generation = max(cls._current_generation,
+                                          generation)
+            stale_keys = [key for key in cls._indexes
+                          if key[1] < generation]
+            for key in stale_keys:
+                del cls._indexes[key]
+                cls._build_ms.pop(key, None)
+                cls._sizes.pop(key, None)
+
+    @classmethod
+    def stats(cls, shared: Tuple[Any, ...] = ()) -> List[Dict[str, Any]]:
+        """
+        Describe every registered structure.
+
+        Sizes are estimated once per structure, walking at most about
+        SIZE_NODE_BUDGET of its objects.
+
+        Args:
+            shared (Tuple[Any, ...]): Objects the structures reference
+            but do not own, like the snapshot content, not counted.
+
+        Returns:
+            List[Dict[str, Any]]: File path, generation, algorithm,
+            build time in milliseconds and estimated bytes of each.
+        """
+        with cls._lock:
+            indexes = list(cls._indexes.items())
+            build_ms = dict(cls._build_ms)
+        stats = []
+        for key, index in indexes:
+            size = cls._sizes.get(key)
+            if size is None:
+                size = estimate_size(index, {id(item) for item in shared})
+                with cls._lock:
+                    if key in cls._indexes:
+                        cls._sizes[key] = size
+            file_path, generation, algorithm = key
+            stats.append({
+                'file_path': file_path,
+                'generation': generation,
+                'algorithm': algorithm,
+                'build_ms': build_ms.get(key),
+                'bytes': size,
+            })
+        return stats
+
+    @classmethod
+    def clear(cls) -> None:
+        """Drop every registered structure."""
+        with cls._lock:
+            cls._indexes.clear()
+            cls._build_ms.clear()
+            cls._sizes.clear()
+            cls._current_generation = 0
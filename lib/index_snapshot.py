@@ -0,0 +1,133 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import Optional, Tuple
+
+from lib.file_server import FileSnapshot
+from lib.shared_index import IndexLayout, SharedIndex
+
+INDEX_SNAPSHOT_MAGIC = b'SIDX'
+# Bump whenever the layout changes, older files are then rebuilt.
+INDEX_SNAPSHOT_VERSION = 2
+# magic, version, flags, sampled digest and full checksum of the
+# indexed bytes, length of the data file path that follows.
+FILE_HEADER = struct.Struct('!4sHH16s16sQ')
+# Set in flags when the indexed content ends with a newline.
+ENDS_WITH_NEWLINE = 1
+
+
+def index_snapshot_path(directory: str, data_file_path: str) -> str:
+    """
+    Return the index snapshot file for a data file.
+
+    Args:
+        directory (str): Directory holding index snapshots.
+        data_file_path (str): The indexed data file.
+
+    Returns:
+        str: Path of the index snapshot file.
+    """
+    absolute_path = os.path.abspath(data_file_path)
+    path_hash = hashlib.blake2b(
+        absolute_path.encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(
+        directory, f"{os.path.basename(absolute_path)}.{path_hash}.idx")
+
+
+def _index_offset(path_length: int) -> int:
+    """Offset of the index block, aligned to 8 bytes."""
+    return (FILE_HEADER.size + path_length + 7) & ~7
+
+
+def write_index_snapshot(
+        path: str,
+        snapshot: FileSnapshot,
+        sample: bytes,
+        checksum: bytes,
+        ends_with_newline: bool) -> None:
+    """
+    Persist a snapshot's content and index for the next start.
+
+    The file is written next to its final name and renamed over it,
+    so a crash never leaves a half written snapshot behind.
+
+    Args:
+        path (str): Path of the index snapshot file.
+        snapshot (FileSnapshot): The snapshot to persist.
+        sample (bytes): Sampled digest of the indexed bytes.
+        checksum (bytes): Digest of all of the indexed bytes.
+        ends_with_newline (bool): Whether the content ends with a newline.
+    """
+    start_time = time.time()
+    data_file_path = os.path.abspath(snapshot.file_path).encode('utf-8')
+    index_offset = _index_offset(len(data_file_path))
+    layout = IndexLayout(snapshot.content, snapshot.hash_map)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb+') as f:
+        f.truncate(index_offset + layout.size)
+        with mmap.mmap(f.fileno(), 0) as m:
+            FILE_HEADER.pack_into(
+                m, 0, INDEX_SNAPSHOT_MAGIC, INDEX_SNAPSHOT_VERSION,
+                ENDS_WITH_NEWLINE if ends_with_newline else 0,
+                sample, checksum, len(data_file_path))
+            m[FILE_HEADER.size:FILE_HEADER.size + len(data_file_path)] = \
+                data_file_path
+            with memoryview(m) as buf:
+                layout.write(
+                    buf[index_offset:], snapshot.generation,
+                    snapshot.file_stat)
+            m.flush()
+    os.replace(temp_path, path)
+    logging.debug("DEBUG: Index snapshot written to %s in %.2f ms",
+                  path, (time.time() - start_time) * 1000)
+
+
+def load_index_snapshot(
+        path: str,
+        data_file_path: str
+) -> Optional[Tuple[SharedIndex, bytes, bytes, bool]]:
+    """
+    Map an index snapshot file written for data_file_path.
+
+    Only the header is checked here, the caller decides whether the
+    data file still matches the indexed size and checksum.
+
+    Args:
+        path (str): Path of the index snapshot file.
+        data_file_path (str): The data file the index must be for.
+
+    Returns:
+        Optional[Tuple[SharedIndex, bytes, bytes, bool]]: The mapped
+        index, the sampled digest, the checksum and whether the
+        content ends with a newline, or None if there is no usable
+        snapshot.
+    """
+    try:
+        with open(path, 'rb') as f:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        magic, version, flags, sample, checksum, path_length = \
+            FILE_HEADER.unpack_from(m)
+        indexed_path = m[FILE_HEADER.size:FILE_HEADER.size + path_length]
+        if (magic != INDEX_SNAPSHOT_MAGIC
+                or version != INDEX_SNAPSHOT_VERSION
+                or indexed_path.decode('utf-8')
+                != os.path.abspath(data_file_path)):
+            logging.debug("DEBUG: Ignoring index snapshot %s", path)
+            m.close()
+            return None
+        index = SharedIndex(
+            memoryview(m)[_index_offset(path_length):], m)
+    except (struct.error, UnicodeDecodeError, ValueError):
+        m.close()
+        return None
+
+    return index, sample, checksum, bool(flags & ENDS_WITH_NEWLINE)
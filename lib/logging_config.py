@@ -0,0 +1,138 @@
+import atexit
+import itertools
+import logging
+import logging.handlers
+import queue
+from typing import Optional
+
+# Format of every log line, as the server always used.
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class QuerySampler:
+    """
+    Picks which queries get a per-query log line.
+
+    With a rate of 0.01 every 100th query is logged. The decision is
+    one counter increment, so unsampled queries pay next to nothing.
+    """
+
+    def __init__(self, rate: float = 0.0):
+        """
+        Initialize the sampler.
+
+        Args:
+            rate (float): Share of queries to log, 0 to log none.
+        """
+        self.counter = itertools.count()
+        self.every = 0
+        self.configure(rate)
+
+    def configure(self, rate: float) -> None:
+        """
+        Change the share of queries that are logged.
+
+        Args:
+            rate (float): Share of queries to log, 0 to log none.
+        """
+        self.every = round(1 / rate) if rate > 0 else 0
+
+    def sample(self) -> bool:
+        """
+        Decide whether to log the current query.
+
+        Returns:
+            bool: True for one query in every 1 / rate.
+        """
+        # next() on itertools.count is atomic under the GIL.
+        return bool(self.every) and next(self.counter) % self.every == 0
+
+
+# Shared by every handler of the process.
+query_sampler = QuerySampler()
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    A QueueHandler that leaves all formatting to the listener thread.
+
+    The stock QueueHandler formats every record before queueing it so
+    the record can be pickled. Records here never leave the process,
+    so the thread that logs only pays for creating the record.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+# The running listener of the process, if logging is queued.
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def stop_logging() -> None:
+    """Write the queued lines and stop the listener, if one runs."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def configure_logging(level: str = 'INFO',
+                      log_file: Optional[str] = None,
+                      use_queue: bool = True,
+                      query_sample_rate: float = 0.0
+                      ) -> Optional[logging.handlers.QueueListener]:
+    """
+    Set up the root logger of the process.
+
+    Replaces any handlers and listener already installed. Lines go to
+    log_file, or to stderr if it is not set or cannot be opened. With
+    use_queue a background thread formats and writes them, so
+    logging never blocks a query on disk I/O.
+
+    Args:
+        level (str): Level name, e.g. 'INFO' for production or
+        'DEBUG' to trace every query.
+        log_file (Optional[str]): File to append the log to.
+        use_queue (bool): Write from a background thread.
+        query_sample_rate (float): Share of queries logged with one
+        INFO line each, 0 to disable.
+
+    Returns:
+        Optional[logging.handlers.QueueListener]: The running
+        listener, stopped at exit, None without use_queue.
+    """
+    global _listener
+    stop_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(level.upper())
+
+    open_error = None
+    handler = logging.StreamHandler()
+    if log_file:
+        try:
+            handler = logging.FileHandler(log_file)
+        except OSError as e:
+            open_error = e
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    if use_queue:
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        root.addHandler(DeferredQueueHandler(log_queue))
+        # Stopping drains the queue, so the last lines are written.
+        _listener = logging.handlers.QueueListener(log_queue, handler)
+        _listener.start()
+    else:
+        root.addHandler(handler)
+
+    query_sampler.configure(query_sample_rate)
+    if open_error is not None:
+        logging.warning("Cannot open log file %s, logging to stderr: %s",
+                        log_file, open_error)
+    return _listener
@@ -5,6 +5,8 @@ import mmap
 import time
 from typing import Any, List, Optional, Type
 import concurrent.futures
+import os
+import threading
 
 import numpy as np
 
@@ -16,18 +18,15 @@ class FileReader:
     A class to handle file reading operations with mmap for efficient reading.
     '''
 
+    # Queries that find the file changed wait for one re-read
+    # instead of all reading it at once.
+    _reread_lock = threading.Lock()
+
     def __init__(self):
         self.cached_content: str = ""
         self.cached_lines: List[str] = []
         self.caching_done = False
 
-    def hashing_data(self, content_data):
-        hash_map = {}
-        for line in content_data.split('\n'):
-            hash_map[line.strip()] = True
-
-        return hash_map
-
     def read_file(self, file_path: str, args: Optional[Type] = None) -> Any:
         '''
         Reads the content of a file efficiently using mmap for large files.
@@ -40,31 +39,29 @@ class FileReader:
         '''
         try:
             start_time = time.time()
-            hash_map = {}
 
             with open(file_path, 'r+', encoding='utf-8') as file:
                 logging.debug("DEBUG: Reading the file with mmap")
+                # Taken before reading, a write racing the read leaves
+                # a stale signature and the next query reads again.
+                file_stat = FileServer.file_signature(
+                    os.fstat(file.fileno()))
                 with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as m:
                     self.cached_content = m.read().decode('utf-8')
-                    # Update the FileServer with new read file data
-                    file_server = FileServer()
-                    file_server.update_file_content(self.cached_content)
-                    is_updated = file_server.is_file_server_updated
-                    logging.debug("Data updated to FileServer at FileReader")
-                    logging.debug(
-                        f"is_file_server_updated?: {is_updated}")
-
-                    # Add data into a hash map
-                    hash_map = self.hashing_data(self.cached_content)
-                    self.cached_lines = self.cached_content
-                    logging.debug("Data added to Hash map at FileReader")
+
+            # Publish the new read file data as a FileServer snapshot,
+            # its hash map is built once, alongside the content.
+            snapshot = FileServer().update_file_content(
+                self.cached_content, file_path, file_stat)
+            self.cached_lines = self.cached_content
+            logging.debug("Data updated to FileServer at FileReader")
 
             self.caching_done = True
             elapsed_time = time.time() - start_time
             logging.debug(
-                f"Time taken to read and cache: {elapsed_time * 1000:.2f} ms")
+                "Time taken to read and cache: %.2f ms", elapsed_time * 1000)
 
-            return self.cached_content, hash_map
+            return snapshot.content, snapshot.hash_map
 
         except FileNotFoundError:
             raise FileNotFoundError(
@@ -73,6 +70,27 @@ class FileReader:
             raise IOError(
                 f"An I/O error occurred while reading file '{file_path}': {e}")
 
+    def revalidate(self, file_path: str) -> bool:
+        '''
+        Re-reads the file only if it changed since the current snapshot.
+
+        Args:
+            file_path (str): The path to the file to be checked.
+
+        Returns:
+            bool: True if the file was read again.
+        '''
+        file_server = FileServer()
+        if file_server.is_current(file_path):
+            return False
+
+        with FileReader._reread_lock:
+            # Another query may have read it while we waited.
+            if file_server.is_current(file_path):
+                return False
+            self.read_file(file_path)
+            return True
+
     def read_data(self, content_data: Optional[Type] = None) -> Any:
         '''
         Reads the content of a file efficiently .
@@ -86,23 +104,20 @@ class FileReader:
 
         try:
             start_time = time.time()
-            hash_map = {}
 
             logging.debug("Reading FileServer content at FileReader")
             # Get the preloaded or updated file contents from
-            # the FileServer.
-            file_server = FileServer()
+            # the current FileServer snapshot.
+            snapshot = FileServer().get_snapshot()
 
-            # Add data into a hash map
-            self.cached_content = file_server._shared_file_content
-            hash_map = file_server._shared_hash_map
+            self.cached_content = snapshot.content
             self.cached_lines = self.cached_content
 
             self.caching_done = True
             elapsed_time = time.time() - start_time
-            logging.debug(f"Time taken to read : {elapsed_time * 1000:.2f} ms")
+            logging.debug("Time taken to read : %.2f ms", elapsed_time * 1000)
 
-            return self.cached_content, hash_map
+            return snapshot.content, snapshot.hash_map
 
         except ValueError:
             raise ValueError(f"Problem accessing global shared data.")
@@ -0,0 +1,222 @@
+import bisect
+import logging
+import time
+from typing import FrozenSet, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Lines look like '3;0;1;28;0;7;5;0;': eight small integers, each
+# followed by a semicolon (the last one is optional).
+FIELD_COUNT = 8
+FIELD_BITS = 7
+FIELD_MAX = (1 << FIELD_BITS) - 1
+# Set when the line ends with a semicolon, above the packed fields.
+TRAILING_SEMICOLON = 1 << (FIELD_COUNT * FIELD_BITS)
+SEMICOLON = ord(';')
+NEWLINE = ord('\n')
+DIGIT_ZERO = ord('0')
+# The canonical spelling of every field value, anything else (leading
+# zeros, signs, values out of range) does not fit the schema.
+FIELD_VALUES = {str(value): value for value in range(FIELD_MAX + 1)}
+
+
+def pack_line(line: str) -> Optional[int]:
+    """
+    Pack a line in the record format into one integer key.
+
+    Only the canonical spelling is packed (no leading zeros, no
+    whitespace), so every packable string has exactly one key.
+
+    Args:
+        line (str): The line or query string.
+
+    Returns:
+        Optional[int]: The key, or None if the line does not fit the schema.
+    """
+    fields = line.split(';')
+    if len(fields) == FIELD_COUNT + 1 and not fields[FIELD_COUNT]:
+        key = TRAILING_SEMICOLON
+    elif len(fields) == FIELD_COUNT:
+        key = 0
+    else:
+        return None
+    # Unrolled, this runs for every query.
+    try:
+        return (key
+                | FIELD_VALUES[fields[0]] << 49
+                | FIELD_VALUES[fields[1]] << 42
+                | FIELD_VALUES[fields[2]] << 35
+                | FIELD_VALUES[fields[3]] << 28
+                | FIELD_VALUES[fields[4]] << 21
+                | FIELD_VALUES[fields[5]] << 14
+                | FIELD_VALUES[fields[6]] << 7
+                | FIELD_VALUES[fields[7]])
+    except KeyError:
+        return None
+
+
+def unpack_key(key: int) -> str:
+    """
+    Turn a key back into its canonical line.
+
+    Args:
+        key (int): A key made by pack_line.
+
+    Returns:
+        str: The line.
+    """
+    fields = [str((key >> ((FIELD_COUNT - 1 - i) * FIELD_BITS)) & FIELD_MAX)
+              for i in range(FIELD_COUNT)]
+    return ';'.join(fields) + (';' if key & TRAILING_SEMICOLON else '')
+
+
+class PackedKeyIndex:
+    """
+    A set of lines stored as a sorted uint64 array of packed keys.
+
+    Lines in the record format take 8 bytes each instead of a Python
+    string in a hash set. Lines that do not fit the schema are kept
+    as stripped strings in a small fallback set, so lookups answer
+    exactly like a frozenset of the stripped lines would.
+    """
+
+    __slots__ = ('keys', 'fallback', '_view')
+
+    def __init__(self, file_content: str):
+        """
+        Build the index from the file content.
+
+        Args:
+            file_content (str): The content of the file.
+        """
+        start_time = time.time()
+        data = np.frombuffer(file_content.encode('utf-8'), dtype=np.uint8)
+        keys, rejected = self._pack_all(data)
+
+        fallback = set()
+        packed = [keys]
+        for line in rejected:
+            # Lines with whitespace or odd spellings take the slow path.
+            line = line.strip()
+            key = pack_line(line)
+            if key is None:
+                fallback.add(line)
+            else:
+                packed.append(np.array([key], dtype=np.uint64))
+
+        keys = np.concatenate(packed)
+        keys.sort()
+        distinct = np.empty(len(keys), dtype=bool)
+        distinct[:1] = True
+        np.not_equal(keys[1:], keys[:-1], out=distinct[1:])
+        self.keys = keys[distinct]
+        # bisect on a memoryview avoids NumPy's per call overhead for
+        # single lookups.
+        self._view = memoryview(self.keys)
+        self.fallback: FrozenSet[str] = frozenset(fallback)
+        logging.debug(
+            "DEBUG: Packed %d keys, %d fallback lines in %.2f ms",
+            len(self.keys), len(self.fallback),
+            (time.time() - start_time) * 1000)
+
+    @staticmethod
+    def _pack_all(data: np.ndarray) -> Tuple[np.ndarray, List[str]]:
+        """
+        Pack every canonical line of the buffer with vectorized NumPy.
+
+        Args:
+            data (np.ndarray): The UTF-8 encoded content as uint8.
+
+        Returns:
+            Tuple[np.ndarray, List[str]]: The keys of canonical lines
+            and the decoded lines that need the slow path.
+        """
+        # A final newline ends the last line, and the zero padding lets
+        # the digit lookups below read past a line end.
+        buf = np.concatenate(
+            (data, np.array([NEWLINE, 0, 0], dtype=np.uint8)))
+        ends = np.flatnonzero(buf == NEWLINE)
+        starts = np.concatenate(([0], ends[:-1] + 1))
+
+        is_semicolon = buf == SEMICOLON
+        semicolons = np.flatnonzero(is_semicolon)
+        # Anything but digits, semicolons and newlines rules a line out.
+        others = np.flatnonzero(
+            (buf[:-2] - DIGIT_ZERO > 9) & ~is_semicolon[:-2]
+            & (buf[:-2] != NEWLINE))
+
+        first = np.searchsorted(semicolons, starts)
+        line_semicolons = np.searchsorted(semicolons, ends) - first
+        line_others = (np.searchsorted(others, ends)
+                       - np.searchsorted(others, starts))
+        trailing = is_semicolon[np.maximum(ends - 1, 0)] & (ends > starts)
+        candidate = (line_others == 0) & (
+            line_semicolons == FIELD_COUNT - 1 + trailing)
+
+        # Field boundaries of the candidate lines, one row per line.
+        separators = semicolons[
+            first[candidate][:, None] + np.arange(FIELD_COUNT - 1)]
+        field_starts = np.concatenate(
+            (starts[candidate][:, None], separators + 1), axis=1)
+        lengths = np.concatenate(
+            (separators, (ends - trailing)[candidate][:, None]),
+            axis=1) - field_starts
+
+        digits = [(buf[field_starts + i] - DIGIT_ZERO).astype(np.int16)
+                  for i in range(3)]
+        values = np.where(
+            lengths == 1, digits[0],
+            np.where(lengths == 2, digits[0] * 10 + digits[1],
+                     digits[0] * 100 + digits[1] * 10 + digits[2]))
+        valid = ((lengths >= 1) & (lengths <= 3) & (values <= FIELD_MAX)
+                 & ((lengths == 1) | (digits[0] != 0))).all(axis=1)
+
+        keys = np.where(trailing[candidate][valid],
+                        np.uint64(TRAILING_SEMICOLON), np.uint64(0))
+        for i in range(FIELD_COUNT):
+            keys |= values[valid, i].astype(np.uint64) << np.uint64(
+                (FIELD_COUNT - 1 - i) * FIELD_BITS)
+
+        rejected_lines = np.concatenate(
+            (np.flatnonzero(candidate)[~valid], np.flatnonzero(~candidate)))
+        raw = data.tobytes()
+        rejected = [raw[starts[i]:ends[i]].decode('utf-8')
+                    for i in rejected_lines.tolist()]
+        return keys, rejected
+
+    def __contains__(self, item: str) -> bool:
+        key = pack_line(item)
+        if key is None:
+            return item in self.fallback
+        view = self._view
+        i = bisect.bisect_left(view, key)
+        return i < len(view) and view[i] == key
+
+    def __len__(self) -> int:
+        return len(self.keys) + len(self.fallback)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.keys.tolist():
+            yield unpack_key(key)
+        yield from self.fallback
+
+    def contains_many(self, items: List[str]) -> List[bool]:
+        """
+        Look up many strings with one vectorized search.
+
+        Args:
+            items (List[str]): The strings to look up.
+
+        Returns:
+            List[bool]: One result per string, in order.
+        """
+        if not items or not len(self.keys):
+            return [item in self for item in items]
+
+        packed = [pack_line(item) for item in items]
+        keys = np.array([key or 0 for key in packed], dtype=np.uint64)
+        positions = np.minimum(
+            np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = (self.keys[positions] == keys).tolist()
+        return [item in self.fallback if key is None else hit
+                for item, key, hit in zip(items, packed, found)]
@@ -19,7 +19,8 @@ class DataPreloader:
             with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
                 shared_file_content = m.read().decode('utf-8')
                 file_server_instance = FileServer()
-                file_server_instance.update_file_content(shared_file_content)
+                file_server_instance.update_file_content(
+                    shared_file_content, pathname)
                 logging.debug("DEBUG: File content updated.")
 
         return file_server_instance.get_file_content()
@@ -0,0 +1,403 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import BinaryIO, Callable, List, Optional
+
+from lib.external_index import (
+    DEFAULT_CHUNK_BYTES,
+    ExternalSnapshot,
+    build_external_index,
+    load_external_index
+)
+from lib.file_server import FileServer, FileSnapshot
+from lib.index_snapshot import load_index_snapshot, write_index_snapshot
+from lib.search_engine import prebuild_indexes
+from lib.shared_index import SharedSnapshot
+
+# Bytes hashed at each end of the indexed region to detect rewrites.
+SAMPLE_SIZE = 65536
+
+
+def sample_digest(f: BinaryIO, size: int) -> bytes:
+    """
+    Hash the first and last SAMPLE_SIZE bytes of the first size bytes.
+
+    Args:
+        f (BinaryIO): The open file.
+        size (int): Length of the region to sample.
+
+    Returns:
+        bytes: The digest of the sampled region.
+    """
+    digest = hashlib.blake2b(str(size).encode('ascii'), digest_size=16)
+    f.seek(0)
+    digest.update(f.read(min(size, SAMPLE_SIZE)))
+    if size > SAMPLE_SIZE:
+        f.seek(max(SAMPLE_SIZE, size - SAMPLE_SIZE))
+        digest.update(f.read(size - f.tell()))
+    return digest.digest()
+
+
+def content_digest(f: BinaryIO, size: int) -> bytes:
+    """
+    Hash the first size bytes, like the checksum of a full reload.
+
+    Args:
+        f (BinaryIO): The open file.
+        size (int): Length of the region to hash.
+
+    Returns:
+        bytes: The digest of the region.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    f.seek(0)
+    remaining = size
+    while remaining > 0:
+        chunk = f.read(min(remaining, 1 << 24))
+        if not chunk:
+            break
+        digest.update(chunk)
+        remaining -= len(chunk)
+    return digest.digest()
+
+
+class ReloadScheduler:
+    """
+    Coalesces bursts of file change events into single reloads.
+
+    Every change event restarts a quiet window; the file is reloaded
+    once no event arrived for that long. Reloads run one at a time on
+    a single worker thread, and are skipped when the file content
+    checksum did not change since the last reload.
+
+    In incremental mode a pure append (same inode, larger size and an
+    unchanged sample of the previously indexed bytes) only reads and
+    indexes the new tail. Truncations and rewrites, or an append to a
+    file whose last indexed line had no newline, fall back to a full
+    rebuild.
+
+    With an index_snapshot_path, every full rebuild is also written to
+    disk, and the first reload maps that file instead of parsing the
+    data file when it still matches (or the data file only grew). The
+    indexed bytes are hashed in full to tell, which is still much
+    cheaper than parsing them.
+
+    With an external_index_path the file is never loaded: every change
+    rebuilds an on-disk sorted index in bounded memory, and queries
+    are answered from the mapped index. An index that still matches
+    is mapped at startup instead of being rebuilt.
+    """
+
+    def __init__(self,
+                 file_path: str,
+                 prebuild_algorithms: Optional[List[str]] = None,
+                 quiet_window: float = 0.2,
+                 incremental: bool = True,
+                 on_reload: Optional[Callable[[FileSnapshot], None]] = None,
+                 index_snapshot_path: Optional[str] = None,
+                 external_index_path: Optional[str] = None,
+                 out_of_core_chunk_bytes: int = DEFAULT_CHUNK_BYTES):
+        """
+        Initialize the scheduler and start its worker thread.
+
+        Args:
+            file_path (str): The data file to reload.
+            prebuild_algorithms (Optional[List[str]]): Algorithms whose
+            search structures are built before a reload is published.
+            quiet_window (float): Seconds without events before reloading.
+            incremental (bool): Only index appended lines when possible.
+            on_reload (Optional[Callable[[FileSnapshot], None]]): Called
+            with every snapshot after it is published.
+            index_snapshot_path (Optional[str]): File to persist the
+            index to and load it from at startup.
+            external_index_path (Optional[str]): File of the out-of-core
+            index, None to load the file into memory.
+            out_of_core_chunk_bytes (int): Bytes of the file sorted in
+            memory at a time when building the out-of-core index.
+        """
+        self.file_path = file_path
+        self.prebuild_algorithms = prebuild_algorithms or []
+        self.quiet_window = quiet_window
+        self.incremental = incremental
+        self.on_reload = on_reload
+        self.index_snapshot_path = index_snapshot_path
+        self.external_index_path = external_index_path
+        self.out_of_core_chunk_bytes = out_of_core_chunk_bytes
+
+        self.condition = threading.Condition()
+        self.reload_lock = threading.Lock()
+        self.pending = False
+        self.last_event_time = 0.0
+        self.last_checksum: Optional[bytes] = None
+
+        # What the published snapshot was built from.
+        self.indexed_inode: Optional[int] = None
+        self.indexed_size = 0
+        self.indexed_mtime_ns = 0
+        self.indexed_sample: Optional[bytes] = None
+        self.ends_with_newline = False
+
+        self.events_received = 0
+        self.reload_count = 0
+        self.skipped_reloads = 0
+        self.incremental_reloads = 0
+        # Milliseconds the latest published reload took.
+        self.last_reload_ms: Optional[float] = None
+
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def notify(self) -> None:
+        """Record a change event and (re)start the quiet window."""
+        with self.condition:
+            self.pending = True
+            self.last_event_time = time.monotonic()
+            self.events_received += 1
+            self.condition.notify()
+
+    def _run(self) -> None:
+        """Wait for a quiet window after events, then reload."""
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+
+                # Keep waiting while events are still arriving.
+                while True:
+                    remaining = (self.last_event_time + self.quiet_window
+                                 - time.monotonic())
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                self.pending = False
+
+            try:
+                self.reload_now()
+            except Exception as e:
+                logging.error("Error reloading %s: %s", self.file_path, e)
+
+    def reload_now(self) -> bool:
+        """
+        Reload the file right away, unless its content is unchanged.
+
+        Returns:
+            bool: True if a new snapshot was published.
+        """
+        with self.reload_lock:
+            start_time = time.time()
+            with open(self.file_path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+
+                if self.external_index_path:
+                    return self._reload_external(f, stat, start_time)
+
+                if (self.indexed_inode is None and self.index_snapshot_path
+                        and self._load_index_snapshot(f, stat)):
+                    if self._is_unchanged(f, stat):
+                        self.last_reload_ms = \
+                            (time.time() - start_time) * 1000
+                        logging.debug(
+                            "DEBUG: Loaded index snapshot of %s in "
+                            "%.2f ms", self.file_path, self.last_reload_ms)
+                        return True
+
+                if self.incremental and self._is_unchanged(f, stat):
+                    self.skipped_reloads += 1
+                    logging.debug("DEBUG: %s unchanged", self.file_path)
+                    return False
+
+                base = FileServer().get_snapshot()
+                if self.incremental and self._is_append(f, stat, base):
+                    published = self._reload_tail(f, stat, base)
+                    reload_ms = (time.time() - start_time) * 1000
+                    if published:
+                        self.last_reload_ms = reload_ms
+                    logging.debug("DEBUG: Appended to %s in %.2f ms",
+                                  self.file_path, reload_ms)
+                    return published
+
+                f.seek(0)
+                data = f.read()
+                sample = sample_digest(f, len(data))
+
+            checksum = hashlib.blake2b(data, digest_size=16).digest()
+            if checksum == self.last_checksum:
+                self._remember(stat, len(data), data.endswith(b'\n'),
+                               sample)
+                self.skipped_reloads += 1
+                logging.debug("DEBUG: %s unchanged, skipped",
+                              self.file_path)
+                return False
+
+            # Build the new snapshot and its search structures off to
+            # the side, queries keep using the current one meanwhile.
+            file_server = FileServer()
+            snapshot = file_server.build_snapshot(
+                data.decode('utf-8'), self.file_path,
+                FileServer.file_signature(stat))
+            published = self._publish(snapshot)
+            # Only now, a failed decode or build is retried on the
+            # next event instead of being taken for unchanged content.
+            self._remember(stat, len(data), data.endswith(b'\n'), sample)
+            self._write_index_snapshot(snapshot, checksum)
+
+            self.last_checksum = checksum
+            reload_ms = (time.time() - start_time) * 1000
+            if published:
+                self.last_reload_ms = reload_ms
+            logging.debug("DEBUG: Reloaded %s in %.2f ms",
+                          self.file_path, reload_ms)
+            return published
+
+    def _publish(self, snapshot) -> bool:
+        """Prebuild the configured structures and publish the snapshot."""
+        prebuild_indexes(self.file_path, self.prebuild_algorithms, snapshot)
+        published = FileServer().publish_snapshot(snapshot)
+        self.reload_count += 1
+        if published and self.on_reload is not None:
+            self.on_reload(snapshot)
+        return published
+
+    def _reload_external(self, f: BinaryIO, stat: os.stat_result,
+                         start_time: float) -> bool:
+        """Map or rebuild the out-of-core index of the file."""
+        loaded = (self.indexed_inode is None
+                  and self._load_external_index(f, stat))
+        if self._is_unchanged(f, stat):
+            if not loaded:
+                self.skipped_reloads += 1
+                logging.debug("DEBUG: %s unchanged", self.file_path)
+                return False
+            self.last_reload_ms = (time.time() - start_time) * 1000
+            logging.debug("DEBUG: Mapped out-of-core index of %s in "
+                          "%.2f ms", self.file_path, self.last_reload_ms)
+            return True
+
+        sample = sample_digest(f, stat.st_size)
+        index = build_external_index(
+            self.external_index_path, f, stat.st_size, self.file_path,
+            FileServer.file_signature(stat), sample,
+            self.out_of_core_chunk_bytes)
+        published = self._publish(ExternalSnapshot(
+            index, FileServer().next_generation(), self.file_path))
+        self._remember(stat, stat.st_size, True, sample)
+        self.last_checksum = None
+        if published:
+            self.last_reload_ms = (time.time() - start_time) * 1000
+        return published
+
+    def _load_external_index(self, f: BinaryIO,
+                             stat: os.stat_result) -> bool:
+        """Publish the out-of-core index if it is for this content."""
+        loaded = load_external_index(self.external_index_path,
+                                     self.file_path)
+        if loaded is None:
+            return False
+
+        index, sample = loaded
+        inode, size, mtime_ns = index.file_stat
+        if (inode != stat.st_ino or size != stat.st_size
+                or mtime_ns != stat.st_mtime_ns
+                or sample_digest(f, size) != sample):
+            logging.debug("DEBUG: Out-of-core index of %s is out of date",
+                          self.file_path)
+            index.close()
+            return False
+
+        self._publish(ExternalSnapshot(
+            index, FileServer().next_generation(), self.file_path))
+        self._remember(stat, size, True, sample)
+        return True
+
+    def _remember(self, stat: os.stat_result, size: int,
+                  ends_with_newline: bool, sample: bytes) -> None:
+        """Record which bytes of the file the snapshot was built from."""
+        self.indexed_inode = stat.st_ino
+        self.indexed_size = size
+        self.indexed_mtime_ns = stat.st_mtime_ns
+        self.ends_with_newline = ends_with_newline or size == 0
+        self.indexed_sample = sample
+
+    def _load_index_snapshot(self, f: BinaryIO,
+                             stat: os.stat_result) -> bool:
+        """Publish the on-disk index if the file still starts with it."""
+        loaded = load_index_snapshot(self.index_snapshot_path, self.file_path)
+        if loaded is None:
+            return False
+
+        index, sample, checksum, ends_with_newline = loaded
+        inode, size, mtime_ns = index.file_stat
+        # The sample alone misses edits in the middle of the file.
+        if (inode != stat.st_ino or size > stat.st_size
+                or content_digest(f, size) != checksum):
+            logging.debug("DEBUG: Index snapshot of %s is out of date",
+                          self.file_path)
+            index.close()
+            return False
+
+        file_server = FileServer()
+        self._publish(SharedSnapshot(
+            index, file_server.next_generation(), self.file_path))
+        self.indexed_inode = inode
+        self.indexed_size = size
+        self.indexed_mtime_ns = mtime_ns
+        self.indexed_sample = sample
+        self.ends_with_newline = ends_with_newline
+        if size == stat.st_size:
+            self.last_checksum = checksum
+        return True
+
+    def _write_index_snapshot(self, snapshot: FileSnapshot,
+                              checksum: bytes) -> None:
+        """Persist a full rebuild so the next start can map it."""
+        if not self.index_snapshot_path:
+            return
+        try:
+            write_index_snapshot(
+                self.index_snapshot_path, snapshot, self.indexed_sample,
+                checksum, self.ends_with_newline)
+        except OSError as e:
+            logging.error("Error writing index snapshot: %s", e)
+
+    def _is_unchanged(self, f: BinaryIO, stat: os.stat_result) -> bool:
+        """Check whether the file is still what was last indexed."""
+        return (stat.st_ino == self.indexed_inode
+                and stat.st_size == self.indexed_size
+                and stat.st_mtime_ns == self.indexed_mtime_ns
+                and sample_digest(f, stat.st_size) == self.indexed_sample)
+
+    def _is_append(self, f: BinaryIO, stat: os.stat_result,
+                   base: FileSnapshot) -> bool:
+        """Check whether the file only grew since it was last indexed."""
+        # A query revalidating under reread_on_query may have published
+        # a snapshot of more of the file, appending to it would index
+        # the tail twice.
+        return (base.file_stat == (self.indexed_inode, self.indexed_size,
+                                   self.indexed_mtime_ns)
+                and stat.st_ino == self.indexed_inode
+                and stat.st_size > self.indexed_size
+                and self.ends_with_newline
+                and sample_digest(f, self.indexed_size)
+                == self.indexed_sample)
+
+    def _reload_tail(self, f: BinaryIO, stat: os.stat_result,
+                     base: FileSnapshot) -> bool:
+        """Index only the bytes appended since the last reload."""
+        f.seek(self.indexed_size)
+        tail = f.read(stat.st_size - self.indexed_size)
+
+        file_server = FileServer()
+        snapshot = file_server.build_appended_snapshot(
+            base, tail.decode('utf-8'),
+            FileServer.file_signature(stat))
+        published = self._publish(snapshot)
+
+        size = self.indexed_size + len(tail)
+        self._remember(stat, size, tail.endswith(b'\n'),
+                       sample_digest(f, size))
+        # The full checksum is not known without reading everything.
+        self.last_checksum = None
+        self.incremental_reloads += 1
+        return published
@@ -0,0 +1,130 @@
+import collections
+import sys
+import threading
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+# Rough memory of one entry besides its query string: the ordered
+# dict node, the key tuple and the cached result.
+ENTRY_OVERHEAD = 200
+
+
+class ResultCache:
+    """
+    An LRU cache of query results for the current content generation.
+
+    Entries are keyed by (algorithm, query string) and belong to one
+    content generation. The first lookup or store for a newer
+    generation drops every entry at once, results of an older
+    generation are never returned or stored. The cache is bounded by
+    both its entry count and an estimate of its memory use.
+    """
+
+    def __init__(self, max_entries: int = 10000,
+                 max_bytes: int = 16 * 1024 * 1024):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_entries (int): Maximum number of cached results.
+            max_bytes (int): Maximum estimated memory of the entries.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # (algorithm, query) -> (result, estimated size)
+        self.entries: Dict[Tuple[str, Hashable], Tuple[Any, int]] = \
+            collections.OrderedDict()
+        self.generation = 0
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _switch_generation(self, generation: int) -> bool:
+        """Drop every entry for a newer generation, caller holds the lock.
+
+        Returns:
+            bool: False if generation is older than the cached one.
+        """
+        if generation > self.generation:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.bytes = 0
+            self.generation = generation
+        return generation == self.generation
+
+    def get(self, generation: int, algorithm: str,
+            query: Hashable) -> Optional[Any]:
+        """
+        Return the cached result of a query.
+
+        Args:
+            generation (int): Generation the query is answered from.
+            algorithm (str): The algorithm of the query.
+            query (Hashable): The query string.
+
+        Returns:
+            Optional[Any]: The cached result, None on a miss.
+        """
+        key = (algorithm, query)
+        with self.lock:
+            if self._switch_generation(generation):
+                entry = self.entries.get(key)
+                if entry is not None:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+            self.misses += 1
+            return None
+
+    def put(self, generation: int, algorithm: str, query: Hashable,
+            result: Any) -> None:
+        """
+        Store the result of a query, evicting the least recently used.
+
+        Args:
+            generation (int): Generation the result was computed from.
+            algorithm (str): The algorithm of the query.
+            query (Hashable): The query string.
+            result (Any): The search result.
+        """
+        key = (algorithm, query)
+        size = sys.getsizeof(query) + ENTRY_OVERHEAD
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        with self.lock:
+            if not self._switch_generation(generation):
+                return
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self.entries[key] = (result, size)
+            self.bytes += size
+            while (len(self.entries) > self.max_entries
+                   or self.bytes > self.max_bytes):
+                self.bytes -= self.entries.popitem(last=False)[1][1]
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the cache size and counters.
+
+        Returns:
+            Dict[str, Any]: Entries, bytes, hits, misses, evictions,
+            invalidations and the hit rate.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'generation': self.generation,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
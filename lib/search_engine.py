@@ -1,8 +1,12 @@
+import itertools
 import os
 import logging
-from typing import Dict, Optional, Tuple, Any, Union
+import time
+from typing import Dict, List, Optional, Tuple, Any, Union
 from lib.algorithms.binary_search import BinarySearch
+from lib.bloom_filter import BloomFilter
 from lib.algorithms.exponential_search import ExponentialSearch
+from lib.external_index import ExternalSnapshot
 from lib.algorithms.fibonacci_search import FibonacciSearch
 from lib.algorithms.graph_search import GraphBasedSearch
 from lib.algorithms.hash_search import HashTableSearch
@@ -12,14 +16,25 @@ from lib.algorithms.jump_search import JumpSearch
 from lib.algorithms.linear_search import LinearSearch
 from lib.algorithms.shell_search import ShellSearch
 from lib.algorithms.ternary_search import TernarySearch
-from lib.file_server import FileServer
+from lib.file_server import FileServer, FileSnapshot, LayeredHashIndex
 from lib.hash_map_search import HashSearch
+from lib.index_registry import IndexRegistry
 from lib.optimized_file_reader import FileReader
+from lib.sorted_index import SortedIndex
 from lib.tim_search import TimSortSearch
 from lib.algorithms.trie_search import TrieSearch
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Algorithms that probe the shared SortedIndex instead of sorting
+# their own copy of the lines.
+SORTED_ALGORITHMS = frozenset(
+    {'binary', 'ternary', 'exponential', 'jump', 'fibonacci', 'tim'})
+
+# Algorithms that only ever match a stripped line or a whitespace
+# separated token of the file, so a Bloom filter negative is final.
+# interpolation compares raw splitlines() segments, and default is
+# a hash lookup already.
+FILTERED_ALGORITHMS = SORTED_ALGORITHMS | frozenset(
+    {'shell', 'graph', 'linear', 'trie', 'hash_table', 'inverted_index'})
 
 
 class SearchEngine:
@@ -28,7 +43,11 @@ class SearchEngine:
     a target string in specified files or data structures.
     """
 
-    _class_cache = {}
+    # Target false positive rate of the Bloom filter consulted before
+    # FILTERED_ALGORITHMS, None disables the filter.
+    bloom_filter_fpr: Optional[float] = None
+    # The most recently built filter, for statistics.
+    latest_bloom_filter: Optional[Tuple[int, BloomFilter]] = None
 
     def __init__(
             self,
@@ -46,56 +65,188 @@ class SearchEngine:
         self.file_path = file_path
         self.shared_file_content = shared_file_content
 
-    def load_file_content(self) -> str:
+    def load_snapshot(self) -> FileSnapshot:
         """
-        Loads the file content, either from cache or by reading it again.
+        Loads the current FileServer snapshot, reading the file first
+        if nothing has been loaded yet.
+
+        With reread_on_query the file is revalidated with a stat call
+        and only read again if its inode, size or mtime changed.
+
+        The snapshot is kept in self.snapshot, so the content, hash map
+        and generation used by one query always belong together.
 
         Returns:
-            str: The content of the file.
+            FileSnapshot: The snapshot to answer the query from.
 
         Raises:
             ValueError: If error occurs when loading file content.
         """
         try:
-            file_data = None
             file_reader = FileReader()
             file_server = FileServer()
-            file_server_updated = file_server.is_file_server_updated()
-
-            if not file_server_updated:
-                file_data = file_reader.read_file(
-                    self.file_path, self.reread_on_query)
-            else:
-                file_data = file_reader.read_data(
-                    self.shared_file_content)
-
-            if self.reread_on_query:
-                logging.debug("Rereading file content")
-                return file_data
-            else:
-                if self.file_path not in SearchEngine._class_cache:
-                    logging.debug("Caching file content")
-                    self._class_cache[self.file_path] = (
-                        file_server._shared_file_content
-                    )
-
-                    self._class_cache["hash_map"] = (
-                        file_server._shared_hash_map
-                    )
-                    return (self._class_cache[self.file_path],
-                            self._class_cache["hash_map"])
-                else:
-                    logging.debug("Returning cached content")
-                    return (self._class_cache[self.file_path],
-                            self._class_cache["hash_map"])
+
+            if not file_server.is_file_server_updated():
+                file_reader.read_file(self.file_path, self.reread_on_query)
+            elif self.reread_on_query and not isinstance(
+                    file_server.get_snapshot(), ExternalSnapshot):
+                # An out-of-core index is only ever rebuilt by the
+                # reload scheduler, never by reading the whole file.
+                file_reader.revalidate(self.file_path)
+
+            self.snapshot = file_server.get_snapshot()
+            self.generation = self.snapshot.generation
+            return self.snapshot
 
         except Exception as e:
             message = f"Error in FileReader problem loading file content: {e}"
             logging.debug(message)
             raise ValueError(message)
 
+    def load_file_content(self) -> str:
+        """
+        Loads the file content and hash map of the current snapshot.
+
+        Returns:
+            str: The content of the file.
+        """
+        snapshot = self.load_snapshot()
+        return snapshot.content, snapshot.hash_map
+
+    def get_bloom_filter(
+            self, snapshot: Optional[FileSnapshot] = None
+    ) -> Optional[BloomFilter]:
+        """
+        Returns the Bloom filter of a snapshot, if enabled.
+
+        Args:
+            snapshot (Optional[FileSnapshot]): The snapshot the query
+            is answered from, loaded if not given.
+
+        Returns:
+            Optional[BloomFilter]: The filter, None if disabled.
+        """
+        if SearchEngine.bloom_filter_fpr is None:
+            return None
+        if snapshot is None:
+            snapshot = self.load_snapshot()
+        return get_bloom_filter(
+            self.file_path, snapshot, SearchEngine.bloom_filter_fpr)
+
+    def get_search_instance(
+            self, algorithm: str, search_class: type,
+            snapshot: Optional[FileSnapshot] = None) -> Any:
+        """
+        Returns a ready-built search instance for a snapshot's content.
+
+        The instance is built once per content generation and shared
+        by every query until the file changes.
+
+        Args:
+            algorithm (str): The name of the search algorithm.
+            search_class (type): The class implementing the algorithm.
+            snapshot (Optional[FileSnapshot]): The snapshot the query
+            is answered from, loaded if not given.
+
+        Returns:
+            Any: The search instance.
+        """
+        if snapshot is None:
+            snapshot = self.load_snapshot()
+        file_content = (snapshot.content, snapshot.hash_map)
+        if algorithm not in SORTED_ALGORITHMS:
+            return IndexRegistry.get_or_build(
+                self.file_path,
+                snapshot.generation,
+                algorithm,
+                lambda: search_class(self.file_path, file_content))
+
+        sorted_index = get_sorted_index(
+            self.file_path, snapshot.generation, file_content[0])
+        return IndexRegistry.get_or_build(
+            self.file_path,
+            snapshot.generation,
+            algorithm,
+            lambda: search_class(
+                self.file_path, file_content, sorted_index=sorted_index))
+
+    def search_class(self, algorithm: str) -> type:
+        """
+        Returns the class implementing the given algorithm.
+
+        Args:
+            algorithm (str): The name of the search algorithm.
+
+        Returns:
+            type: The search class, constructed with
+            (file_path, file_content).
+        """
+        return {
+            'binary': BinarySearch,
+            'inverted_index': InvertedIndexSearch,
+            'linear': LinearSearch,
+            'jump': JumpSearch,
+            'ternary': TernarySearch,
+            'hash_table': HashTableSearch,
+            'graph': GraphBasedSearch,
+            'exponential': ExponentialSearch,
+            'interpolation': InterpolationSearch,
+            'fibonacci': FibonacciSearch,
+            'tim': TimSortSearch,
+            'trie': TrieSearch,
+            'shell': ShellSearch,
+        }[algorithm]
+
+    def batch_search(self, algorithm: str,
+                     target_strings: List[str]) -> List[bool]:
+        """
+        Looks up many target strings with a single algorithm instance.
+
+        The prebuilt search structure is fetched once, then every
+        target is checked against it in a tight loop.
+
+        Args:
+            algorithm (str): The name of the search algorithm.
+            target_strings (List[str]): The strings to search for.
+
+        Returns:
+            List[bool]: One result per target string, in order.
+        """
+        # The filter and the search answer from the same snapshot.
+        snapshot = self.load_snapshot()
+        bloom_filter = (self.get_bloom_filter(snapshot)
+                        if algorithm in FILTERED_ALGORITHMS else None)
+        if bloom_filter is None:
+            return self._search_many(algorithm, target_strings, snapshot)
+
+        # Only the targets the filter cannot rule out are searched.
+        maybe = [bloom_filter.might_contain(target.strip())
+                 for target in target_strings]
+        found = iter(self._search_many(algorithm, [
+            target for target, hit in zip(target_strings, maybe) if hit],
+            snapshot))
+        return [hit and next(found) for hit in maybe]
+
+    def _search_many(self, algorithm: str, target_strings: List[str],
+                     snapshot: FileSnapshot) -> List[bool]:
+        """Look up every target string with the algorithm itself."""
+        if algorithm == 'default' or isinstance(snapshot, ExternalSnapshot):
+            hash_map = snapshot.hash_map
+            return [target in hash_map for target in target_strings]
+
+        search_instance = self.get_search_instance(
+            algorithm, self.search_class(algorithm), snapshot)
+        sorted_index = getattr(search_instance, 'sorted_index', None)
+        if isinstance(sorted_index, SortedIndex):
+            # One vectorized np.searchsorted call for the whole batch.
+            return sorted_index.contains_many(target_strings)
+
+        search = search_instance.search
+        return [bool(search(target)) for target in target_strings]
+
     def default_search(self, target_string: str) -> Tuple[bool, str]:
-        search_instance = HashSearch(self.load_file_content())
+        # Only the hash map is needed, the content is not touched.
+        search_instance = HashSearch((None, self.load_snapshot().hash_map))
         return search_instance.search(target_string)
 
     def binary_search(self, target_string: str) -> Tuple[bool, str]:
@@ -108,8 +259,8 @@ class SearchEngine:
         Returns:
             Tuple[bool, str]: Search result as a tuple of success & result.
         """
-        search_instance = BinarySearch(
-            self.file_path, self.load_file_content())
+        search_instance = self.get_search_instance(
+            'binary', BinarySearch)
         return search_instance.search(target_string)
 
     def inverted_index_search(self, target_string: str) -> Tuple[bool, str]:
@@ -122,8 +273,8 @@ class SearchEngine:
         Returns:
             Tuple[bool, str]: Search result as a tuple of success & result.
         """
-        search_instance = InvertedIndexSearch(self.file_path,
-                                              self.load_file_content())
+        search_instance = self.get_search_instance(
+            'inverted_index', InvertedIndexSearch)
         return search_instance.search(target_string)
 
     def linear_search(self, target_string: str) -> Tuple[bool, str]:
@@ -136,8 +287,8 @@ class SearchEngine:
         Returns:
             Tuple[bool, str]: Search result as a tuple of success & result.
         """
-        search_instance = LinearSearch(
-            self.file_path, self.load_file_content())
+        search_instance = self.get_search_instance(
+            'linear', LinearSearch)
         return search_instance.search(target_string)
 
     def jump_search(self, target_string: str) -> Tuple[bool, str]:
@@ -150,7 +301,8 @@ class SearchEngine:
         Returns:
             Tuple[bool, str]: Search result as a tuple of success & result.
         """
-        search_instance = JumpSearch(self.file_path, self.load_file_content())
+        search_instance = self.get_search_instance(
+            'jump', JumpSearch)
         return search_instance.search(target_string)
 
     def ternary_search(self, target_string: str) -> Tuple[bool, str]:
@@ -163,8 +315,8 @@ class SearchEngine:
         Returns:
             Tuple[bool, str]: Search result as a tuple of success & result.
         """
-        search_instance = TernarySearch(
-            self.file_path, self.load_file_content())
+        search_instance = self.get_search_instance(
+            'ternary', TernarySearch)
         return search_instance.search(target_string)
 
     def hash_table_search(self, target_string: str) -> Tuple[bool, str]:
@@ -177,8 +329,8 @@ class SearchEngine:
         Returns:
             Tuple[bool, str]: Search result as a tuple of success & result.
         """
-        search_instance = HashTableSearch(self.file_path,
-                                          self.load_file_content())
+        search_instance = self.get_search_instance(
+            'hash_table', HashTableSearch)
         return search_instance.search(target_string)
 
     def graph_search(self, target_string: str) -> bool:
@@ -191,8 +343,8 @@ class SearchEngine:
         Returns:
             bool: Search result as a success flag.
         """
-        search_instance = GraphBasedSearch(self.file_path,
-                                           self.load_file_content())
+        search_instance = self.get_search_instance(
+            'graph', GraphBasedSearch)
         return search_instance.search(target_string)
 
     def exponential_search(self, target_string: str) -> bool:
@@ -205,8 +357,8 @@ class SearchEngine:
         Returns:
             bool: Search result as a success flag.
         """
-        search_instance = ExponentialSearch(self.file_path,
-                                            self.load_file_content())
+        search_instance = self.get_search_instance(
+            'exponential', ExponentialSearch)
         return search_instance.search(target_string)
 
     def interpolation_search(self, target_string: str) -> bool:
@@ -219,8 +371,8 @@ class SearchEngine:
         Returns:
             bool: Search result as a success flag.
         """
-        search_instance = InterpolationSearch(self.file_path,
-                                              self.load_file_content())
+        search_instance = self.get_search_instance(
+            'interpolation', InterpolationSearch)
         return search_instance.search(target_string)
 
     def fibonacci_search(self, target_string: str) -> bool:
@@ -233,8 +385,8 @@ class SearchEngine:
         Returns:
             bool: Search result as a success flag.
         """
-        search_instance = FibonacciSearch(
-            self.file_path, self.load_file_content())
+        search_instance = self.get_search_instance(
+            'fibonacci', FibonacciSearch)
         return search_instance.search(target_string)
 
     def tim_search(self, target_string: str) -> bool:
@@ -247,8 +399,8 @@ class SearchEngine:
         Returns:
             bool: Search result as a success flag.
         """
-        search_instance = TimSortSearch(
-            self.file_path, self.load_file_content())
+        search_instance = self.get_search_instance(
+            'tim', TimSortSearch)
         return search_instance.search(target_string)
 
     def trie_search(self, target_string: str) -> bool:
@@ -261,7 +413,8 @@ class SearchEngine:
         Returns:
             bool: Search result as a success flag.
         """
-        search_instance = TrieSearch(self.file_path, self.load_file_content())
+        search_instance = self.get_search_instance(
+            'trie', TrieSearch)
         return search_instance.search(target_string)
 
     def shell_search(self, target_string: str) -> bool:
@@ -274,16 +427,89 @@ class SearchEngine:
         Returns:
             bool: Search result as a success flag.
         """
-        search_instance = ShellSearch(self.file_path, self.load_file_content())
+        search_instance = self.get_search_instance(
+            'shell', ShellSearch)
         return search_instance.search(target_string)
 
 
+def get_sorted_index(file_path: str, generation: int,
+                     file_content: str) -> SortedIndex:
+    """
+    Returns the SortedIndex shared by the sorted algorithms.
+
+    Args:
+        file_path (str): The path to the file to search.
+        generation (int): Generation of file_content.
+        file_content (str): The content of the file.
+
+    Returns:
+        SortedIndex: The index, built once per generation.
+    """
+    return IndexRegistry.get_or_build(
+        file_path, generation, 'sorted_index',
+        lambda: SortedIndex(file_content))
+
+
+def get_bloom_filter(file_path: str, snapshot: FileSnapshot,
+                     false_positive_rate: float) -> BloomFilter:
+    """
+    Returns the Bloom filter of a snapshot, built once per generation.
+
+    The filter holds every stripped line and, for lines with inner
+    whitespace, their whitespace separated tokens.
+
+    Args:
+        file_path (str): The path to the file to search.
+        snapshot (FileSnapshot): The snapshot to filter.
+        false_positive_rate (float): Target false positive rate.
+
+    Returns:
+        BloomFilter: The filter.
+    """
+    def build() -> BloomFilter:
+        lines = snapshot.hash_map
+        if not isinstance(lines, (frozenset, LayeredHashIndex)):
+            # Mapped and packed indexes are slow to iterate.
+            lines = frozenset(
+                line.strip() for line in snapshot.content.split('\n'))
+        tokens = [token for line in lines
+                  for token in (line.split() if ' ' in line
+                                or '\t' in line else ())]
+        bloom_filter = BloomFilter(
+            itertools.chain(lines, tokens), len(lines) + len(tokens),
+            false_positive_rate)
+        latest = SearchEngine.latest_bloom_filter
+        if latest is None or latest[0] <= snapshot.generation:
+            SearchEngine.latest_bloom_filter = (
+                snapshot.generation, bloom_filter)
+        return bloom_filter
+
+    return IndexRegistry.get_or_build(
+        file_path, snapshot.generation, 'bloom_filter', build)
+
+
+def bloom_filter_stats() -> Dict[str, Any]:
+    """
+    Returns the statistics of the most recently built Bloom filter.
+
+    Returns:
+        Dict[str, Any]: BloomFilter.stats() plus the generation, empty
+        if no filter was built.
+    """
+    latest = SearchEngine.latest_bloom_filter
+    if latest is None:
+        return {}
+    generation, bloom_filter = latest
+    return dict(bloom_filter.stats(), generation=generation)
+
+
 def search_alg_setup(
     algorithm: str,
     reread_on_query: bool,
     file_path: str,
     target_string: str,
-    shared_file_content: Optional[Union[str, bytes]] = None
+    shared_file_content: Optional[Union[str, bytes]] = None,
+    timings: Optional[Dict[str, float]] = None
 ) -> Tuple[bool, str]:
     """
     Sets up the search algorithm and runs it to locate the target string.
@@ -293,6 +519,9 @@ def search_alg_setup(
         reread_on_query (bool): Whether to re-read the file on each query.
         file_path (str): The path to the file to search.
         target_string (str): The string to search for.
+        timings (Optional[Dict[str, float]]): Receives the milliseconds
+        spent on 'index_acquire' (snapshot, Bloom filter and search
+        structure) and on 'search'.
 
     Returns:
         Tuple[bool, str]: The result of the search, and if the target was found
@@ -300,14 +529,115 @@ def search_alg_setup(
     """
     # try:
     logging.debug(
-        f"Using '{algorithm}' algorithm to find '{target_string}'")
-    algorithm_name = f"{algorithm}_search"
+        "Using '%s' algorithm to find '%s'", algorithm, target_string)
+    start_time = time.perf_counter()
     search_engine = SearchEngine(
         reread_on_query,
         file_path,
         shared_file_content)
-    search_method = getattr(search_engine, algorithm_name)
-    return search_method(target_string)
+    # Loaded once, so the filter and the search see the same content
+    # and reread_on_query costs one stat call.
+    snapshot = search_engine.load_snapshot()
+    if algorithm in FILTERED_ALGORITHMS:
+        bloom_filter = search_engine.get_bloom_filter(snapshot)
+        if (bloom_filter is not None
+                and not bloom_filter.might_contain(target_string.strip())):
+            logging.debug("Ruled out by the Bloom filter")
+            if timings is not None:
+                timings['index_acquire'] = \
+                    (time.perf_counter() - start_time) * 1000
+            return False
+    if algorithm == 'default' or isinstance(snapshot, ExternalSnapshot):
+        # Only the hash map is needed, the content is not touched. An
+        # out-of-core snapshot has no content, every algorithm is a
+        # binary search over its on-disk index.
+        search_instance = HashSearch((None, snapshot.hash_map))
+    else:
+        search_instance = search_engine.get_search_instance(
+            algorithm, search_engine.search_class(algorithm), snapshot)
+    acquired_time = time.perf_counter()
+    result = search_instance.search(target_string)
+    if timings is not None:
+        timings['index_acquire'] = (acquired_time - start_time) * 1000
+        timings['search'] = (time.perf_counter() - acquired_time) * 1000
+    return result
     # except Exception as error:
     #     logging.debug(f"Error in SearchEngine Search_alg_setup: {error} ")
     #     raise
+
+
+def prebuild_indexes(
+    file_path: str,
+    algorithms: List[str],
+    snapshot: Optional[FileSnapshot] = None
+) -> None:
+    """
+    Builds the search structures of the given algorithms ahead of queries.
+
+    Args:
+        file_path (str): The path to the file to search.
+        algorithms (List[str]): The algorithms whose structures to build.
+        snapshot (Optional[FileSnapshot]): The snapshot to build them for,
+        which may not be published yet. Defaults to the current one.
+    """
+    if snapshot is None:
+        snapshot = FileServer().get_snapshot()
+    if isinstance(snapshot, ExternalSnapshot):
+        # Queries are answered from its on-disk index alone.
+        return
+    if SearchEngine.bloom_filter_fpr is not None:
+        # Rebuilt for every reload, before the snapshot is published.
+        get_bloom_filter(file_path, snapshot, SearchEngine.bloom_filter_fpr)
+    file_content = (snapshot.content, snapshot.hash_map)
+    search_engine = SearchEngine(False, file_path, None)
+
+    for algorithm in algorithms:
+        if algorithm == 'default':
+            # The default hash map is built with the snapshot itself.
+            continue
+        search_class = search_engine.search_class(algorithm)
+        kwargs = {}
+        if algorithm in SORTED_ALGORITHMS:
+            kwargs['sorted_index'] = get_sorted_index(
+                file_path, snapshot.generation, snapshot.content)
+        IndexRegistry.get_or_build(
+            file_path,
+            snapshot.generation,
+            algorithm,
+            lambda: search_class(file_path, file_content, **kwargs))
+
+
+def search_alg_setup_batch(
+    algorithm: str,
+    reread_on_query: bool,
+    file_path: str,
+    target_strings: List[str],
+    shared_file_content: Optional[Union[str, bytes]] = None,
+    timings: Optional[Dict[str, float]] = None
+) -> List[bool]:
+    """
+    Sets up the search algorithm and looks up many target strings at once.
+
+    Args:
+        algorithm (str): The name of the search algorithm to use.
+        reread_on_query (bool): Whether to re-read the file on each query.
+        file_path (str): The path to the file to search.
+        target_strings (List[str]): The strings to search for.
+        timings (Optional[Dict[str, float]]): Receives the milliseconds
+        spent on 'search', including loading the search structure.
+
+    Returns:
+        List[bool]: One result per target string, in order.
+    """
+    logging.debug(
+        "Using '%s' algorithm to find %d strings",
+        algorithm, len(target_strings))
+    start_time = time.perf_counter()
+    search_engine = SearchEngine(
+        reread_on_query,
+        file_path,
+        shared_file_content)
+    result = search_engine.batch_search(algorithm, target_strings)
+    if timings is not None:
+        timings['search'] = (time.perf_counter() - start_time) * 1000
+    return result
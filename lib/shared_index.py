@@ -0,0 +1,333 @@
+import logging
+import os
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from lib.file_server import FileServer, FileSnapshot
+
+# generation, content size, record count, record width,
+# and the (inode, size, mtime_ns) the content was read from.
+INDEX_HEADER = struct.Struct('!QQQQQQQ')
+# seq, generation, index segment name. seq is odd while the pointer
+# is being rewritten, readers retry until they see an even value.
+POINTER_HEADER = struct.Struct('!QQ64s')
+
+
+class IndexLayout:
+    """
+    The encoded content and sorted records of an index, ready to be
+    written into a buffer of exactly size bytes.
+    """
+
+    def __init__(self, content: str, lines: Iterable[str]):
+        """
+        Encode the content and sort the distinct lines.
+
+        Args:
+            content (str): The file content.
+            lines (Iterable[str]): The distinct lines to index.
+        """
+        self.content = content.encode('utf-8')
+        self.records: List[bytes] = sorted(
+            line.encode('utf-8') for line in lines)
+        self.width = max(
+            (len(record) for record in self.records), default=1) or 1
+        self.records_offset = INDEX_HEADER.size + len(self.content)
+        self.size = self.records_offset + self.width * len(self.records)
+
+    def write(self, buf: memoryview, generation: int,
+              file_stat: Optional[Tuple[int, int, int]] = None) -> None:
+        """
+        Write the index into buf.
+
+        Args:
+            buf (memoryview): Writable buffer of at least size bytes.
+            generation (int): Generation of the content.
+            file_stat (Optional[Tuple[int, int, int]]): The (inode, size,
+            mtime_ns) the content was read from.
+        """
+        width = self.width
+        INDEX_HEADER.pack_into(
+            buf, 0, generation, len(self.content), len(self.records),
+            width, *(file_stat or (0, 0, 0)))
+        buf[INDEX_HEADER.size:self.records_offset] = self.content
+        for i, record in enumerate(self.records):
+            offset = self.records_offset + i * width
+            buf[offset:offset + width] = record.ljust(width, b'\0')
+
+
+class SharedIndex:
+    """
+    A read-only line index in shared or memory-mapped memory.
+
+    The buffer holds the file content followed by the distinct lines
+    as sorted fixed-width records, padded with NUL bytes. Processes
+    mapping it share the same physical pages, and membership is a
+    binary search over the records.
+    """
+
+    def __init__(self, buf: memoryview, owner: Any = None):
+        """
+        Wrap an existing index.
+
+        Args:
+            buf (memoryview): The buffer starting with INDEX_HEADER.
+            owner (Any): The shared memory segment or mmap backing buf,
+            kept alive as long as the index.
+        """
+        self.buf = buf
+        self.owner = owner
+        (self.generation, self.content_size, self.record_count,
+         self.record_width, inode, size, mtime_ns) = \
+            INDEX_HEADER.unpack_from(buf)
+        self.file_stat = (inode, size, mtime_ns)
+        self.records_offset = INDEX_HEADER.size + self.content_size
+
+    @classmethod
+    def attach(cls, name: str) -> 'SharedIndex':
+        """
+        Attach to an index segment created by another process.
+
+        Args:
+            name (str): Name of the shared memory segment.
+
+        Returns:
+            SharedIndex: The index backed by the segment.
+        """
+        segment = shared_memory.SharedMemory(name=name)
+        return cls(segment.buf, segment)
+
+    @classmethod
+    def create(cls, name: str, content: str, lines: Iterable[str],
+               generation: int,
+               file_stat: Optional[Tuple[int, int, int]] = None
+               ) -> 'SharedIndex':
+        """
+        Build a new index segment.
+
+        Args:
+            name (str): Name of the shared memory segment.
+            content (str): The file content.
+            lines (Iterable[str]): The distinct lines to index.
+            generation (int): Generation of the content.
+            file_stat (Optional[Tuple[int, int, int]]): The (inode, size,
+            mtime_ns) the content was read from.
+
+        Returns:
+            SharedIndex: The index backed by the new segment.
+        """
+        layout = IndexLayout(content, lines)
+        segment = shared_memory.SharedMemory(
+            name=name, create=True, size=layout.size)
+        layout.write(segment.buf, generation, file_stat)
+        return cls(segment.buf, segment)
+
+    def close(self) -> None:
+        """Release the buffer and close the backing memory."""
+        self.buf.release()
+        self.owner.close()
+
+    def __contains__(self, item: str) -> bool:
+        key = item.encode('utf-8')
+        width = self.record_width
+        if len(key) > width:
+            return False
+        key = key.ljust(width, b'\0')
+
+        buf = self.buf
+        low, high = 0, self.record_count
+        while low < high:
+            mid = (low + high) // 2
+            offset = self.records_offset + mid * width
+            record = bytes(buf[offset:offset + width])
+            if record < key:
+                low = mid + 1
+            elif record > key:
+                high = mid
+            else:
+                return True
+        return False
+
+    def __len__(self) -> int:
+        return self.record_count
+
+    def __iter__(self) -> Iterator[str]:
+        width = self.record_width
+        for i in range(self.record_count):
+            offset = self.records_offset + i * width
+            yield bytes(self.buf[offset:offset + width]).rstrip(
+                b'\0').decode('utf-8')
+
+    def content(self) -> str:
+        """Decode a private copy of the file content."""
+        return bytes(self.buf[
+            INDEX_HEADER.size:self.records_offset]).decode('utf-8')
+
+
+class SharedSnapshot(FileSnapshot):
+    """
+    A FileSnapshot whose hash index lives in shared or mapped memory.
+
+    The content is only copied out of the segment when an algorithm
+    other than the default lookup first needs it.
+    """
+
+    __slots__ = ('index',)
+
+    def __init__(self, index: SharedIndex, generation: int,
+                 file_path: Optional[str] = None):
+        super().__init__(None, index, generation, file_path,
+                         file_stat=index.file_stat)
+        self.index = index
+
+    @property
+    def content(self) -> str:
+        if self._content is None:
+            self._content = self.index.content()
+        return self._content
+
+    def content_chunks(self) -> Tuple[str, ...]:
+        return (self.content,)
+
+
+class SharedIndexPublisher:
+    """
+    Publishes FileServer snapshots as shared index segments.
+
+    Runs in the supervisor. A small pointer segment names the current
+    index segment, worker processes poll it to follow reloads. Older
+    index segments are unlinked on publish; workers still using them
+    keep their mapping until they switch.
+    """
+
+    def __init__(self, pointer_name: Optional[str] = None):
+        """
+        Create the pointer segment.
+
+        Args:
+            pointer_name (Optional[str]): Name of the pointer segment.
+        """
+        self.pointer_name = pointer_name or f"search_index_{os.getpid()}"
+        self.pointer = shared_memory.SharedMemory(
+            name=self.pointer_name, create=True, size=POINTER_HEADER.size)
+        POINTER_HEADER.pack_into(self.pointer.buf, 0, 0, 0, b'')
+        self.index: Optional[SharedIndex] = None
+        self.lock = threading.Lock()
+
+    def publish(self, snapshot: FileSnapshot) -> None:
+        """
+        Copy a snapshot into a new index segment and point workers at it.
+
+        Args:
+            snapshot (FileSnapshot): The published snapshot.
+        """
+        start_time = time.time()
+        with self.lock:
+            name = f"{self.pointer_name}_{snapshot.generation}"
+            index = SharedIndex.create(
+                name, snapshot.content, snapshot.hash_map,
+                snapshot.generation, snapshot.file_stat)
+
+            seq = POINTER_HEADER.unpack_from(self.pointer.buf)[0]
+            POINTER_HEADER.pack_into(
+                self.pointer.buf, 0, seq + 1, snapshot.generation,
+                name.encode('ascii'))
+            POINTER_HEADER.pack_into(
+                self.pointer.buf, 0, seq + 2, snapshot.generation,
+                name.encode('ascii'))
+
+            old_index, self.index = self.index, index
+        if old_index is not None:
+            old_index.close()
+            old_index.owner.unlink()
+        logging.debug("DEBUG: Shared index %s published in %.2f ms",
+                      name, (time.time() - start_time) * 1000)
+
+    def close(self) -> None:
+        """Unlink the index and pointer segments."""
+        with self.lock:
+            if self.index is not None:
+                self.index.close()
+                self.index.owner.unlink()
+                self.index = None
+            self.pointer.close()
+            self.pointer.unlink()
+
+
+class SharedIndexFollower:
+    """
+    Keeps a worker process's FileServer on the current shared index.
+
+    Polls the supervisor's pointer segment and publishes a
+    SharedSnapshot whenever it names a newer index segment.
+    """
+
+    def __init__(self, pointer_name: str, file_path: str,
+                 poll_interval: float = 0.05):
+        """
+        Attach to the pointer segment.
+
+        Args:
+            pointer_name (str): Name of the supervisor's pointer segment.
+            file_path (str): The indexed data file.
+            poll_interval (float): Seconds between pointer checks.
+        """
+        self.pointer = shared_memory.SharedMemory(name=pointer_name)
+        self.file_path = file_path
+        self.poll_interval = poll_interval
+        self.generation = 0
+
+    def read_pointer(self) -> Tuple[int, str]:
+        """
+        Read a consistent (generation, segment name) pair.
+
+        Returns:
+            Tuple[int, str]: The current generation and segment name.
+        """
+        while True:
+            seq, generation, name = POINTER_HEADER.unpack_from(
+                self.pointer.buf)
+            if seq % 2 == 0 and POINTER_HEADER.unpack_from(
+                    self.pointer.buf)[0] == seq:
+                return generation, name.rstrip(b'\0').decode('ascii')
+            time.sleep(0)
+
+    def sync(self) -> bool:
+        """
+        Switch to the current index segment if it changed.
+
+        Returns:
+            bool: True if a new snapshot was published.
+        """
+        generation, name = self.read_pointer()
+        if generation == self.generation or not name:
+            return False
+        try:
+            index = SharedIndex.attach(name)
+        except FileNotFoundError:
+            # Replaced and unlinked meanwhile, the next poll sees
+            # the newer one.
+            return False
+
+        file_server = FileServer()
+        snapshot = SharedSnapshot(
+            index, file_server.next_generation(), self.file_path)
+        self.generation = generation
+        return file_server.publish_snapshot(snapshot)
+
+    def start(self) -> None:
+        """Sync once, then keep following reloads in a daemon thread."""
+        self.sync()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self) -> None:
+        """Poll the pointer segment until the process exits."""
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.sync()
+            except Exception as e:
+                logging.error("Error following shared index: %s", e)
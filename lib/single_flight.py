@@ -0,0 +1,69 @@
+import concurrent.futures
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent computations into one.
+
+    The first caller for a key starts the computation, callers with
+    the same key arriving before it finishes get the same future
+    instead of starting their own. The key is forgotten as soon as
+    the future is done, so later callers compute a fresh result.
+    """
+
+    def __init__(self):
+        """Initialize with nothing in flight."""
+        self.lock = threading.Lock()
+        self.in_flight: Dict[Hashable, concurrent.futures.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def run(self, key: Hashable,
+            start: Callable[[], concurrent.futures.Future]
+            ) -> Tuple[concurrent.futures.Future, bool]:
+        """
+        Join the computation for key, starting it if none is in flight.
+
+        Args:
+            key (Hashable): Identifies identical computations.
+            start (Callable[[], concurrent.futures.Future]): Starts the
+            computation, only called if none is in flight. Exceptions
+            it raises are passed on and nothing is remembered.
+
+        Returns:
+            Tuple[concurrent.futures.Future, bool]: The future and
+            whether it was started by an earlier caller.
+        """
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, True
+            future = start()
+            self.in_flight[key] = future
+            self.leaders += 1
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future, False
+
+    def _forget(self, key: Hashable,
+                future: concurrent.futures.Future) -> None:
+        """Drop key once its computation is done."""
+        with self.lock:
+            if self.in_flight.get(key) is future:
+                del self.in_flight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return how many computations ran and how many were shared.
+
+        Returns:
+            Dict[str, Any]: In flight, leader and coalesced counts.
+        """
+        with self.lock:
+            return {
+                'in_flight': len(self.in_flight),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+            }
@@ -2,3 +2,21 @@ class SocketCommunicationError(Exception):
     """Custom exception for socket communication errors."""
     def __init__(self, message):
         super().__init__(message)
+
+
+class FramingError(Exception):
+    """Custom exception for malformed length-prefixed frames."""
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class InvalidQueryError(Exception):
+    """Custom exception for well-formed JSON that is not a valid query."""
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class ServerBusyError(Exception):
+    """Custom exception for queries rejected because the server is full."""
+    def __init__(self, message):
+        super().__init__(message)
@@ -0,0 +1,95 @@
+import logging
+import time
+from typing import List
+
+import numpy as np
+
+
+class SortedIndex:
+    """
+    The distinct stripped lines of a file as one sorted NumPy byte array.
+
+    Lines are stored UTF-8 encoded in a contiguous fixed-width S<n>
+    array instead of a list of Python strings, which takes a few times
+    less memory per line. Lookups use np.searchsorted, and many keys
+    can be looked up in a single vectorized call.
+
+    The sorted search algorithms share one instance per content
+    generation, each probing it with its own strategy.
+    """
+
+    def __init__(self, file_content: str):
+        """
+        Build the index from the file content.
+
+        Args:
+            file_content (str): The content of the file.
+        """
+        start_time = time.time()
+        lines = np.array(
+            [line.strip() for line in file_content.encode('utf-8').split(
+                b'\n')])
+        # Sorting the fixed-width array in NumPy is much faster than
+        # sorting a list of Python strings.
+        lines.sort()
+        distinct = np.empty(len(lines), dtype=bool)
+        distinct[:1] = True
+        np.not_equal(lines[1:], lines[:-1], out=distinct[1:])
+        self.keys = lines[distinct]
+        self.width = self.keys.itemsize
+        logging.debug("DEBUG: Sorted index of %d lines built in %.2f ms",
+                      len(self.keys), (time.time() - start_time) * 1000)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def encode(self, target_string: str) -> bytes:
+        """
+        Encode a query the way lines are stored.
+
+        Args:
+            target_string (str): The string to search for.
+
+        Returns:
+            bytes: The stripped UTF-8 key.
+        """
+        return target_string.strip().encode('utf-8')
+
+    def contains(self, target_string: str) -> bool:
+        """
+        Check whether a line equals target_string.
+
+        Args:
+            target_string (str): The string to search for.
+
+        Returns:
+            bool: True if the line exists.
+        """
+        key = self.encode(target_string)
+        if len(key) > self.width:
+            return False
+        i = np.searchsorted(self.keys, key)
+        return bool(i < len(self.keys) and self.keys[i] == key)
+
+    def contains_many(self, target_strings: List[str]) -> List[bool]:
+        """
+        Check many target strings in one vectorized lookup.
+
+        Args:
+            target_strings (List[str]): The strings to search for.
+
+        Returns:
+            List[bool]: One result per target string, in order.
+        """
+        if not target_strings or not len(self.keys):
+            return [False] * len(target_strings)
+
+        encoded = [self.encode(target) for target in target_strings]
+        # Wider keys would be truncated to a shorter, possibly
+        # existing line, so they are masked out.
+        fits = np.fromiter((len(key) <= self.width for key in encoded),
+                           dtype=bool, count=len(encoded))
+        keys = np.array(encoded, dtype=f'S{self.width}')
+        positions = np.searchsorted(self.keys, keys)
+        found = self.keys[np.minimum(positions, len(self.keys) - 1)] == keys
+        return (found & fits & (positions < len(self.keys))).tolist()
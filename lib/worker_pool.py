@@ -0,0 +1,161 @@
+import collections
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Optional
+
+from lib.socket_exception import ServerBusyError
+
+
+class WorkerPool:
+    """
+    A fixed size pool of worker threads with admission control.
+
+    At most queue_depth tasks wait for a worker, further submissions
+    are rejected right away with ServerBusyError instead of piling up.
+    Algorithms listed in algorithm_limits never use more than their
+    number of workers at once, so slow algorithms cannot occupy the
+    whole pool; their queued tasks wait while other work runs.
+
+    Every future gets queue_wait_ms and exec_time_ms attributes once
+    it is done, so the time spent waiting for a worker can be
+    recorded separately from the search itself.
+    """
+
+    def __init__(self,
+                 workers: int = 4,
+                 queue_depth: int = 256,
+                 algorithm_limits: Optional[Dict[str, int]] = None):
+        """
+        Initialize the pool and start its worker threads.
+
+        Args:
+            workers (int): Number of worker threads.
+            queue_depth (int): Maximum number of tasks waiting for a worker.
+            algorithm_limits (Optional[Dict[str, int]]): Maximum number
+            of workers each listed algorithm may use at once.
+        """
+        self.queue_depth = queue_depth
+        self.algorithm_limits = dict(algorithm_limits or {})
+
+        self.condition = threading.Condition()
+        # One FIFO per algorithm, so a capped algorithm at its limit
+        # does not block the tasks queued behind it.
+        self.queues: Dict[str, Deque] = collections.OrderedDict()
+        self.queued = 0
+        self.running: Dict[str, int] = collections.Counter()
+        self.shutting_down = False
+
+        self.rejected = 0
+        self.completed = 0
+
+        self.workers = [
+            threading.Thread(target=self._run, daemon=True)
+            for _ in range(workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, algorithm: str, fn: Callable,
+               *args: Any) -> concurrent.futures.Future:
+        """
+        Queue fn(*args) for a worker.
+
+        Args:
+            algorithm (str): The algorithm the task runs, used for caps.
+            fn (Callable): The function to run.
+            *args (Any): Arguments passed to fn.
+
+        Returns:
+            concurrent.futures.Future: The future for the result.
+
+        Raises:
+            ServerBusyError: If the queue is full or the pool shut down.
+        """
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self.condition:
+            if self.shutting_down or self.queued >= self.queue_depth:
+                self.rejected += 1
+                raise ServerBusyError(
+                    f"Worker queue full, rejected {algorithm} query")
+            self.queues.setdefault(algorithm, collections.deque()).append(
+                (future, fn, args, time.perf_counter()))
+            self.queued += 1
+            self.condition.notify()
+        return future
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the current queue and worker usage.
+
+        Returns:
+            Dict[str, Any]: Queued, running, rejected and completed counts.
+        """
+        with self.condition:
+            return {
+                'queued': self.queued,
+                'running': dict(self.running),
+                'rejected': self.rejected,
+                'completed': self.completed,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop accepting tasks and stop the workers once the queue drains.
+
+        Args:
+            wait (bool): Wait for the workers to finish.
+        """
+        with self.condition:
+            self.shutting_down = True
+            self.condition.notify_all()
+        if wait:
+            for worker in self.workers:
+                worker.join()
+
+    def _next_task(self) -> Optional[tuple]:
+        """Pop the oldest task whose algorithm is below its cap."""
+        for algorithm, queue in self.queues.items():
+            limit = self.algorithm_limits.get(algorithm)
+            if queue and (limit is None or self.running[algorithm] < limit):
+                self.queued -= 1
+                self.running[algorithm] += 1
+                # Rotate so other algorithms get their turn next.
+                self.queues.move_to_end(algorithm)
+                return (algorithm,) + queue.popleft()
+        return None
+
+    def _run(self) -> None:
+        """Worker loop running queued tasks until shutdown."""
+        while True:
+            with self.condition:
+                while (task := self._next_task()) is None:
+                    if self.shutting_down and not self.queued:
+                        return
+                    self.condition.wait()
+
+            algorithm, future, fn, args, queued_at = task
+            start_time = time.perf_counter()
+            future.queue_wait_ms = (start_time - queued_at) * 1000
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = fn(*args)
+                except BaseException as e:
+                    future.exec_time_ms = (
+                        time.perf_counter() - start_time) * 1000
+                    future.set_exception(e)
+                else:
+                    future.exec_time_ms = (
+                        time.perf_counter() - start_time) * 1000
+                    future.set_result(result)
+
+            with self.condition:
+                self.running[algorithm] -= 1
+                self.completed += 1
+                # A capped algorithm may have freed a slot for a task
+                # another worker skipped.
+                self.condition.notify_all()
+            logging.debug(
+                "DEBUG: %s task waited %.2f ms in the queue",
+                algorithm, future.queue_wait_ms)
@@ -0,0 +1,441 @@
+"""
+In-process benchmark of every search algorithm.
+
+Drives lib.search_engine directly, without sockets, over generated
+files of 10k to 10M lines. For every file the load, for every
+algorithm the build of its search structure and, separately, the
+latency of queries that hit and queries that miss are measured, with
+reread_on_query off and on. The results are written as JSON together
+with the environment they were measured in, so runs can be compared.
+
+Run from the repository root:
+
+    python -m metrics.benchmark --sizes 10000 100000 --output run.json
+
+Generated files are kept in --data-dir and reused by later runs with
+the same size and seed. At 10M lines the structures of trie, graph and
+inverted_index take several GB, --algorithms selects a subset.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from lib.file_server import FileServer
+from lib.index_registry import IndexRegistry, estimate_size
+from lib.optimized_file_reader import FileReader
+from lib.search_engine import (SORTED_ALGORITHMS, SearchEngine,
+                               get_sorted_index, search_alg_setup)
+from metrics.file_generator import generate_test_file
+from metrics.registry import Histogram
+
+# Version of the result format, bumped when fields change meaning.
+BENCHMARK_FORMAT = 2
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ALGORITHMS_FILE = os.path.join(
+    REPO_DIR, 'lib', 'algorithms', 'algorithms_list.json')
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+# Queries run before timing, so first-use costs are not measured.
+WARMUP_QUERIES = 5
+
+
+def load_algorithms(path: str = ALGORITHMS_FILE) -> List[str]:
+    """
+    Load the algorithm names the server accepts.
+
+    Args:
+        path (str): The algorithms_list.json file.
+
+    Returns:
+        List[str]: The algorithm names, in file order.
+    """
+    with open(path, 'r') as file:
+        return json.load(file)['algorithms']
+
+
+def git_revision() -> Optional[str]:
+    """Return the checked out commit, with '-dirty' for local edits."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=REPO_DIR, capture_output=True, text=True,
+            check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if status.strip() else '')
+
+
+def environment() -> Dict[str, Any]:
+    """
+    Describe the machine and software the benchmark runs on.
+
+    Returns:
+        Dict[str, Any]: Python, platform, CPU and library details.
+    """
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': numpy_version,
+        'git_revision': git_revision(),
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+
+
+def ensure_data_file(data_dir: str, lines: int, seed: int) -> str:
+    """
+    Return a generated file of the given size, generating it if needed.
+
+    Args:
+        data_dir (str): Directory the files are kept in.
+        lines (int): Number of lines of the file.
+        seed (int): Seed of the generator.
+
+    Returns:
+        str: The path of the file.
+    """
+    path = os.path.join(data_dir, f'benchmark_{lines}_{seed}.txt')
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        # Generated next to the file, an interrupted run leaves no
+        # truncated file behind.
+        partial = path + '.partial'
+        generate_test_file(partial, lines, seed)
+        os.replace(partial, path)
+    return path
+
+
+def pick_queries(file_path: str, lines: int, count: int,
+                 seed: int) -> Tuple[List[str], List[str]]:
+    """
+    Pick lines of the file to search for, and lines that are not in it.
+
+    The file is streamed, so only the picked lines are held in memory.
+
+    Args:
+        file_path (str): The data file.
+        lines (int): Number of lines of the file.
+        count (int): Number of hits and of misses to pick.
+        seed (int): Seed of the choice.
+
+    Returns:
+        Tuple[List[str], List[str]]: Candidate hits and misses. The
+        misses still have to be checked against the file.
+    """
+    rng = random.Random(seed)
+    wanted = set(rng.sample(range(lines), min(count, lines)))
+    hits = []
+    with open(file_path, 'r') as file:
+        for number, line in enumerate(file):
+            if number in wanted:
+                hits.append(line.strip())
+    rng.shuffle(hits)
+    # The generator only writes values up to 50.
+    misses = [';'.join(str(rng.randint(51, 99)) for _ in range(8))
+              for _ in range(count)]
+    return hits, misses
+
+
+class QuerySeries:
+    """
+    The latencies of one kind of query over all trials.
+
+    Every trial adds to one histogram for the percentiles of the whole
+    series, and keeps its own exact median and mean, whose spread
+    across trials tells metrics.compare_benchmarks how noisy they are.
+    """
+
+    def __init__(self):
+        """Initialize with no trials."""
+        self.histogram = Histogram(max_samples=0)
+        self.found = 0
+        self.trials: List[Dict[str, float]] = []
+
+    def add_trial(self, latencies: List[float], found: int) -> None:
+        """
+        Add the latencies of one trial.
+
+        Args:
+            latencies (List[float]): Milliseconds per query.
+            found (int): How many of the queries were found.
+        """
+        for latency in latencies:
+            self.histogram.add(latency)
+        self.found = found
+        self.trials.append({
+            'median_ms': statistics.median(latencies),
+            'mean_ms': statistics.fmean(latencies),
+        })
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Return the series for the JSON report.
+
+        Returns:
+            Dict[str, Any]: The histogram summary in milliseconds, the
+            queries found in the last trial and the trials.
+        """
+        return dict(self.histogram.summary(), found=self.found,
+                    trials=self.trials)
+
+
+def time_queries(algorithm: str, reread_on_query: bool, file_path: str,
+                 queries: List[str], time_budget: float,
+                 series: QuerySeries) -> None:
+    """
+    Time search_alg_setup for each query, one at a time, as one trial.
+
+    Args:
+        algorithm (str): The algorithm to search with.
+        reread_on_query (bool): Revalidate the file on every query.
+        file_path (str): The data file.
+        queries (List[str]): The strings to search for.
+        time_budget (float): Seconds after which the remaining queries
+        are skipped, at least one query is always timed.
+        series (QuerySeries): Receives the trial.
+    """
+    if not queries:
+        return
+    for query in queries[:WARMUP_QUERIES]:
+        search_alg_setup(algorithm, reread_on_query, file_path, query)
+    gc.collect()
+    latencies = []
+    found = 0
+    perf_counter = time.perf_counter
+    deadline = perf_counter() + time_budget
+    for query in queries:
+        start_time = perf_counter()
+        result = search_alg_setup(
+            algorithm, reread_on_query, file_path, query)
+        end_time = perf_counter()
+        latencies.append((end_time - start_time) * 1000)
+        found += bool(result)
+        if end_time > deadline:
+            break
+    series.add_trial(latencies, found)
+
+
+def build_index(file_path: str, algorithm: str) -> Tuple[float, int]:
+    """
+    Build the search structure of an algorithm for the current snapshot.
+
+    Args:
+        file_path (str): The data file.
+        algorithm (str): The algorithm.
+
+    Returns:
+        Tuple[float, int]: The build time in milliseconds and the
+        estimated size of the structure in bytes.
+    """
+    if algorithm == 'default':
+        # The default hash map is built with the snapshot itself.
+        return 0.0, 0
+    search_engine = SearchEngine(False, file_path, None)
+    search_engine.load_snapshot()
+    start_time = time.perf_counter()
+    search_instance = search_engine.get_search_instance(
+        algorithm, search_engine.search_class(algorithm))
+    build_ms = (time.perf_counter() - start_time) * 1000
+    # The shared SortedIndex is measured once per file instead.
+    shared = getattr(search_instance, 'sorted_index', None)
+    seen = {id(shared)} if shared is not None else set()
+    return build_ms, estimate_size(search_instance, seen)
+
+
+def benchmark_file(file_path: str, lines: int, algorithms: List[str],
+                   hits: List[str], misses: List[str],
+                   reread_modes: List[bool], time_budget: float,
+                   trials: int = 1
+                   ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Benchmark every algorithm on one file.
+
+    The trials run one after another over all algorithms, so a slow
+    spell of the machine spreads over every series instead of
+    skewing one.
+
+    Args:
+        file_path (str): The data file.
+        lines (int): Number of lines of the file.
+        algorithms (List[str]): The algorithms to benchmark.
+        hits (List[str]): Strings in the file.
+        misses (List[str]): Candidate strings not in the file.
+        reread_modes (List[bool]): reread_on_query values to run.
+        time_budget (float): Seconds per algorithm, mode, kind and
+        trial.
+        trials (int): How often every series is timed.
+
+    Returns:
+        Tuple[Dict[str, Any], List[Dict[str, Any]]]: The file entry and
+        one result per algorithm and reread mode.
+    """
+    IndexRegistry.clear()
+    gc.collect()
+    start_time = time.perf_counter()
+    snapshot = FileReader().read_file(file_path)
+    load_ms = (time.perf_counter() - start_time) * 1000
+    hash_map = snapshot[1]
+    misses = [miss for miss in misses if miss not in hash_map]
+
+    file_entry = {
+        'lines': lines,
+        'bytes': os.path.getsize(file_path),
+        'load_ms': load_ms,
+        'sorted_index_ms': None,
+        'hits': len(hits),
+        'misses': len(misses),
+    }
+    if SORTED_ALGORITHMS.intersection(algorithms):
+        start_time = time.perf_counter()
+        get_sorted_index(
+            file_path, FileServer().get_generation(), snapshot[0])
+        file_entry['sorted_index_ms'] = \
+            (time.perf_counter() - start_time) * 1000
+    del snapshot, hash_map
+
+    results = []
+    for algorithm in algorithms:
+        build_ms, index_bytes = build_index(file_path, algorithm)
+        for reread_on_query in reread_modes:
+            results.append({
+                'lines': lines,
+                'algorithm': algorithm,
+                'reread_on_query': reread_on_query,
+                'build_ms': build_ms,
+                'index_bytes': index_bytes,
+                'hit': QuerySeries(),
+                'miss': QuerySeries(),
+            })
+    for _ in range(trials):
+        for result in results:
+            for kind, queries in (('hit', hits), ('miss', misses)):
+                time_queries(result['algorithm'], result['reread_on_query'],
+                             file_path, queries, time_budget, result[kind])
+    for result in results:
+        result['hit'] = result['hit'].to_dict()
+        result['miss'] = result['miss'].to_dict()
+        print_result(result)
+    IndexRegistry.clear()
+    return file_entry, results
+
+
+def run_benchmark(sizes: List[int], algorithms: List[str], data_dir: str,
+                  queries: int = 1000, seed: int = 1,
+                  reread_modes: Optional[List[bool]] = None,
+                  time_budget: float = 5.0,
+                  trials: int = 3) -> Dict[str, Any]:
+    """
+    Benchmark the algorithms on generated files of the given sizes.
+
+    Args:
+        sizes (List[int]): Line counts of the files.
+        algorithms (List[str]): The algorithms to benchmark.
+        data_dir (str): Directory of the generated files.
+        queries (int): Number of hits and of misses per file.
+        seed (int): Seed of the files and the queries.
+        reread_modes (Optional[List[bool]]): reread_on_query values to
+        run, both by default.
+        time_budget (float): Seconds per algorithm, mode, kind and
+        trial.
+        trials (int): How often every series is timed.
+
+    Returns:
+        Dict[str, Any]: The environment, parameters, files and results.
+    """
+    if reread_modes is None:
+        reread_modes = [False, True]
+    report = {
+        'format': BENCHMARK_FORMAT,
+        'environment': environment(),
+        'parameters': {
+            'sizes': sizes,
+            'algorithms': algorithms,
+            'queries': queries,
+            'seed': seed,
+            'reread_modes': reread_modes,
+            'time_budget_s': time_budget,
+            'trials': trials,
+        },
+        'files': [],
+        'results': [],
+    }
+    for lines in sizes:
+        file_path = ensure_data_file(data_dir, lines, seed)
+        hits, misses = pick_queries(file_path, lines, queries, seed)
+        file_entry, results = benchmark_file(
+            file_path, lines, algorithms, hits, misses, reread_modes,
+            time_budget, trials)
+        report['files'].append(file_entry)
+        report['results'].extend(results)
+    return report
+
+
+def print_result(result: Dict[str, Any]) -> None:
+    """Print one result as a table row, latencies in microseconds."""
+    def us(summary: Dict[str, Any], key: str) -> str:
+        value = summary.get(key)
+        return '-' if value is None else f'{value * 1000:.1f}'
+
+    print(f"{result['lines']:>10} {result['algorithm']:<15}"
+          f"{'on' if result['reread_on_query'] else 'off':>4}"
+          f"{result['build_ms']:>11.1f}"
+          f"{us(result['hit'], 'p50_ms'):>10}"
+          f"{us(result['hit'], 'p99_ms'):>10}"
+          f"{us(result['miss'], 'p50_ms'):>10}"
+          f"{us(result['miss'], 'p99_ms'):>10}", flush=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=DEFAULT_SIZES, help='lines per file')
+    parser.add_argument('--algorithms', nargs='+',
+                        help='algorithms to run, all by default')
+    parser.add_argument('--queries', type=int, default=1000,
+                        help='hits and misses per file')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--reread', choices=['off', 'on', 'both'],
+                        default='both', help='reread_on_query modes')
+    parser.add_argument('--time-budget', type=float, default=5.0,
+                        help='seconds per algorithm, mode, kind and trial')
+    parser.add_argument('--trials', type=int, default=3,
+                        help='timings of every series, for the noise')
+    parser.add_argument('--data-dir',
+                        default=os.path.join(REPO_DIR, 'benchmark_data'))
+    parser.add_argument('--output', default='benchmark_results.json')
+    args = parser.parse_args(argv)
+
+    algorithms = args.algorithms or load_algorithms()
+    reread_modes = {'off': [False], 'on': [True],
+                    'both': [False, True]}[args.reread]
+    print(f"{'lines':>10} {'algorithm':<15}{'rrd':>4}{'build ms':>11}"
+          f"{'hit p50':>10}{'hit p99':>10}{'miss p50':>10}"
+          f"{'miss p99':>10}  (us)")
+    report = run_benchmark(args.sizes, algorithms, args.data_dir,
+                           args.queries, args.seed, reread_modes,
+                           args.time_budget, args.trials)
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,368 @@
+"""
+Compare a benchmark run against a stored baseline.
+
+Reads two reports of metrics.benchmark and compares the per-query
+latency of every algorithm, file size, reread mode and hit or miss
+series. The change is the ratio of the geometric means of the
+per-trial medians, with a Welch confidence interval over the trials,
+so a series only counts as a regression when even the optimistic end
+of the interval is slower than the threshold allows.
+
+Run from the repository root:
+
+    python -m metrics.compare_benchmarks baseline.json run.json
+
+Prints a markdown report, or writes it to --output, and exits with 1
+if any series regressed.
+"""
+import argparse
+import functools
+import json
+import math
+import statistics
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from metrics.benchmark import BENCHMARK_FORMAT
+
+# Environment details that make two runs hard to compare.
+ENVIRONMENT_KEYS = ('machine', 'processor', 'cpu_count', 'implementation',
+                    'python', 'numpy')
+# Order of the statuses in the report, worst first.
+STATUS_ORDER = ('regression', 'noisy', 'missing', 'improvement', 'new',
+                'ok')
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    """
+    Load a benchmark report.
+
+    Args:
+        path (str): The JSON file written by metrics.benchmark.
+
+    Returns:
+        Dict[str, Any]: The report.
+
+    Raises:
+        ValueError: If the report has a different format version.
+    """
+    with open(path, 'r') as file:
+        report = json.load(file)
+    if report.get('format') != BENCHMARK_FORMAT:
+        raise ValueError(
+            f"{path} has benchmark format {report.get('format')}, "
+            f"expected {BENCHMARK_FORMAT}")
+    return report
+
+
+@functools.lru_cache(maxsize=None)
+def t_quantile(probability: float, df: float) -> float:
+    """
+    Return an upper quantile of Student's t distribution.
+
+    Bisects the distribution function, which is integrated numerically
+    from the density, so fractional degrees of freedom work too.
+
+    Args:
+        probability (float): The cumulative probability, at least 0.5,
+        e.g. 0.975.
+        df (float): Degrees of freedom, may be fractional.
+
+    Returns:
+        float: The quantile.
+    """
+    scale = math.exp(math.lgamma((df + 1) / 2) - math.lgamma(df / 2)) \
+        / math.sqrt(df * math.pi)
+
+    def density(x: float) -> float:
+        return scale * (1 + x * x / df) ** (-(df + 1) / 2)
+
+    def upper_mass(x: float, steps: int = 400) -> float:
+        # Simpson's rule over [0, x].
+        width = x / steps
+        total = density(0) + density(x) + sum(
+            (4 if i % 2 else 2) * density(i * width)
+            for i in range(1, steps))
+        return total * width / 3
+
+    target = probability - 0.5
+    low, high = 0.0, 1.0
+    while upper_mass(high) < target:
+        low, high = high, high * 2
+    for _ in range(40):
+        middle = (low + high) / 2
+        if upper_mass(middle) < target:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def ratio_interval(baseline: List[float], current: List[float],
+                   confidence: float = 0.95
+                   ) -> Tuple[float, Optional[float], Optional[float]]:
+    """
+    Estimate how many times slower current is than baseline.
+
+    Latencies are compared on a log scale, where a slowdown by a factor
+    is a constant shift and the noise is close to symmetric.
+
+    Args:
+        baseline (List[float]): Per-trial values of the baseline.
+        current (List[float]): Per-trial values of the current run.
+        confidence (float): Coverage of the interval.
+
+    Returns:
+        Tuple[float, Optional[float], Optional[float]]: The ratio and
+        its confidence interval, None without two trials on each side.
+    """
+    log_baseline = [math.log(value) for value in baseline]
+    log_current = [math.log(value) for value in current]
+    shift = statistics.fmean(log_current) - statistics.fmean(log_baseline)
+    if len(baseline) < 2 or len(current) < 2:
+        return math.exp(shift), None, None
+
+    var_baseline = statistics.variance(log_baseline) / len(baseline)
+    var_current = statistics.variance(log_current) / len(current)
+    stderr = math.sqrt(var_baseline + var_current)
+    if stderr == 0:
+        return math.exp(shift), math.exp(shift), math.exp(shift)
+    # Welch-Satterthwaite degrees of freedom.
+    df = (var_baseline + var_current) ** 2 / (
+        var_baseline ** 2 / (len(baseline) - 1)
+        + var_current ** 2 / (len(current) - 1))
+    margin = t_quantile(0.5 + confidence / 2, round(df, 2)) * stderr
+    return (math.exp(shift), math.exp(shift - margin),
+            math.exp(shift + margin))
+
+
+def classify(ratio: float, low: Optional[float], high: Optional[float],
+             threshold: float) -> str:
+    """
+    Name the outcome of one comparison.
+
+    Args:
+        ratio (float): Current over baseline.
+        low (Optional[float]): Lower end of the interval.
+        high (Optional[float]): Upper end of the interval.
+        threshold (float): Tolerated slowdown, 0.1 for 10%.
+
+    Returns:
+        str: 'regression' if slower beyond the threshold, 'noisy' if
+        the estimate is but the interval does not rule out noise,
+        'improvement' if faster beyond the threshold, else 'ok'. Without
+        an interval the estimate alone decides.
+    """
+    limit = 1 + threshold
+    if low is None:
+        low = high = ratio
+    if low > limit:
+        return 'regression'
+    if ratio > limit:
+        return 'noisy'
+    if high < 1 / limit:
+        return 'improvement'
+    return 'ok'
+
+
+def series_key(result: Dict[str, Any]) -> Tuple[int, str, bool]:
+    """Identify a result by file size, algorithm and reread mode."""
+    return (result['lines'], result['algorithm'],
+            result['reread_on_query'])
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any],
+                    threshold: float = 0.1,
+                    thresholds: Optional[Dict[str, float]] = None,
+                    metric: str = 'median_ms',
+                    confidence: float = 0.95) -> List[Dict[str, Any]]:
+    """
+    Compare every query series of two benchmark reports.
+
+    Args:
+        baseline (Dict[str, Any]): The stored report.
+        current (Dict[str, Any]): The report of the run under test.
+        threshold (float): Tolerated slowdown, 0.1 for 10%.
+        thresholds (Optional[Dict[str, float]]): Tolerated slowdown per
+        algorithm, overriding threshold.
+        metric (str): Per-trial value to compare, 'median_ms' or
+        'mean_ms'.
+        confidence (float): Coverage of the intervals.
+
+    Returns:
+        List[Dict[str, Any]]: One row per series, worst status first.
+    """
+    thresholds = thresholds or {}
+    baseline_results = {series_key(result): result
+                        for result in baseline['results']}
+    current_results = {series_key(result): result
+                       for result in current['results']}
+
+    rows = []
+    for key in sorted(baseline_results.keys() | current_results.keys()):
+        lines, algorithm, reread_on_query = key
+        for kind in ('hit', 'miss'):
+            row: Dict[str, Any] = {
+                'lines': lines,
+                'algorithm': algorithm,
+                'reread_on_query': reread_on_query,
+                'kind': kind,
+                'baseline_ms': None,
+                'current_ms': None,
+                'ratio': None,
+                'low': None,
+                'high': None,
+            }
+            old = baseline_results.get(key, {}).get(kind, {})
+            new = current_results.get(key, {}).get(kind, {})
+            old_values = [trial[metric] for trial in old.get('trials', ())]
+            new_values = [trial[metric] for trial in new.get('trials', ())]
+            if old_values:
+                row['baseline_ms'] = statistics.geometric_mean(old_values)
+            if new_values:
+                row['current_ms'] = statistics.geometric_mean(new_values)
+            if not new_values:
+                row['status'] = 'missing'
+            elif not old_values:
+                row['status'] = 'new'
+            else:
+                row['ratio'], row['low'], row['high'] = ratio_interval(
+                    old_values, new_values, confidence)
+                row['status'] = classify(
+                    row['ratio'], row['low'], row['high'],
+                    thresholds.get(algorithm, threshold))
+            rows.append(row)
+    rows.sort(key=lambda row: STATUS_ORDER.index(row['status']))
+    return rows
+
+
+def environment_differences(baseline: Dict[str, Any],
+                            current: Dict[str, Any]) -> List[str]:
+    """
+    List the environment details in which the two runs differ.
+
+    Returns:
+        List[str]: One 'key: baseline -> current' line per difference.
+    """
+    old = baseline.get('environment', {})
+    new = current.get('environment', {})
+    return [f"{key}: {old.get(key)} -> {new.get(key)}"
+            for key in ENVIRONMENT_KEYS if old.get(key) != new.get(key)]
+
+
+def format_report(rows: List[Dict[str, Any]], baseline: Dict[str, Any],
+                  current: Dict[str, Any], threshold: float,
+                  show_all: bool = False) -> str:
+    """
+    Render the comparison as markdown.
+
+    Args:
+        rows (List[Dict[str, Any]]): Rows from compare_reports.
+        baseline (Dict[str, Any]): The stored report.
+        current (Dict[str, Any]): The report of the run under test.
+        threshold (float): The default tolerated slowdown.
+        show_all (bool): List unchanged series too.
+
+    Returns:
+        str: The report.
+    """
+    def us(value: Optional[float]) -> str:
+        return '-' if value is None else f'{value * 1000:.1f}'
+
+    def factor(value: Optional[float]) -> str:
+        return '-' if value is None else f'{value:.2f}x'
+
+    counts = {status: 0 for status in STATUS_ORDER}
+    for row in rows:
+        counts[row['status']] += 1
+    revisions = (baseline['environment'].get('git_revision'),
+                 current['environment'].get('git_revision'))
+    lines = [
+        "## Benchmark comparison",
+        "",
+        f"Baseline `{revisions[0]}`, current `{revisions[1]}`, "
+        f"threshold {threshold:.0%}.",
+        "",
+        ', '.join(f"{counts[status]} {status}" for status in STATUS_ORDER
+                  if counts[status]) + '.',
+    ]
+    differences = environment_differences(baseline, current)
+    if differences:
+        lines += ["", "Environments differ, compare with care:"]
+        lines += [f"- {difference}" for difference in differences]
+
+    shown = [row for row in rows if show_all or row['status'] != 'ok']
+    if shown:
+        lines += [
+            "",
+            "| status | lines | algorithm | reread | kind | baseline us "
+            "| current us | change | interval |",
+            "|---|---:|---|---|---|---:|---:|---:|---|",
+        ]
+        for row in shown:
+            interval = ('-' if row['low'] is None else
+                        f"{factor(row['low'])} - {factor(row['high'])}")
+            lines.append(
+                f"| {row['status']} | {row['lines']} | {row['algorithm']} "
+                f"| {'on' if row['reread_on_query'] else 'off'} "
+                f"| {row['kind']} | {us(row['baseline_ms'])} "
+                f"| {us(row['current_ms'])} | {factor(row['ratio'])} "
+                f"| {interval} |")
+    return '\n'.join(lines) + '\n'
+
+
+def parse_thresholds(values: List[str]) -> Dict[str, float]:
+    """
+    Parse ALGORITHM=THRESHOLD arguments.
+
+    Raises:
+        ValueError: If a value is not of that form.
+    """
+    thresholds = {}
+    for value in values:
+        algorithm, _, threshold = value.partition('=')
+        if not algorithm or not threshold:
+            raise ValueError(f"Expected ALGORITHM=THRESHOLD, got {value}")
+        thresholds[algorithm] = float(threshold)
+    return thresholds
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('baseline', help='stored benchmark report')
+    parser.add_argument('current', help='benchmark report to check')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='tolerated slowdown, 0.1 for 10%%')
+    parser.add_argument('--algorithm-threshold', action='append',
+                        default=[], metavar='ALGORITHM=THRESHOLD',
+                        help='tolerated slowdown of one algorithm')
+    parser.add_argument('--metric', choices=['median_ms', 'mean_ms'],
+                        default='median_ms')
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--all', action='store_true',
+                        help='list unchanged series too')
+    parser.add_argument('--output', help='write the report to a file')
+    args = parser.parse_args(argv)
+
+    try:
+        baseline = load_report(args.baseline)
+        current = load_report(args.current)
+        thresholds = parse_thresholds(args.algorithm_threshold)
+    except (OSError, ValueError) as e:
+        print(f"Cannot compare benchmarks: {e}", file=sys.stderr)
+        return 2
+
+    rows = compare_reports(baseline, current, args.threshold, thresholds,
+                           args.metric, args.confidence)
+    report = format_report(rows, baseline, current, args.threshold,
+                           args.all)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report)
+    else:
+        print(report, end='')
+    return 1 if any(row['status'] == 'regression' for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,19 +1,365 @@
-import random
+"""
+Generate large test files of semicolon separated numbers.
 
+Lines like "12;0;50;7;3;19;44;8" are generated in blocks of
+BLOCK_LINES with NumPy and written with one write per block. Every
+block draws from its own random stream derived from the seed, so a
+file is the same whether it is written by one process or by several
+processes into shards, which concatenated give the single file.
 
-def generate_test_file(filename, num_lines):
-    with open(filename, 'w') as f:
-        for _ in range(num_lines):
-            # Generate a random semicolon-separated string
-            line = ';'.join(str(random.randint(0, 50))
-                            for _ in range(8))  # Adjust the range as needed
-            f.write(line + '\n')
+Optionally a workload of queries for metrics.load_generator is
+written as well, with lines of the file as hits and lines that cannot
+be in it as misses.
 
+Run from the repository root:
 
-# Generate files with different sizes
-# file_sizes = [10000, 50000, 100000, 500000, 1000000]
-file_sizes = [10000000, 100000000, 500000000, 1000000000]
-for size in file_sizes:
-    filename = f'test_file_{size}.txt'
-    generate_test_file(filename, size)
-    print(f"DEBUG: Generated file '{filename}' with {size} lines.")
+    python -m metrics.file_generator --lines 100000000 --seed 1 \\
+        --processes 8 --workload workload.jsonl
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Lines per block. Blocks are the unit of randomness, so changing it
+# changes the content generated for a seed.
+BLOCK_LINES = 1 << 18
+DISTRIBUTIONS = ('uniform', 'zipf', 'normal')
+# Spawn key of the random stream choosing the sampled lines, apart
+# from the block indexes.
+SAMPLE_STREAM = 1 << 40
+
+
+def make_spec(seed: Optional[int] = None, fields: int = 8,
+              max_value: int = 50, distribution: str = 'uniform',
+              skew: float = 1.2,
+              duplicate_ratio: float = 0.0) -> Dict[str, Any]:
+    """
+    Describe the lines to generate.
+
+    Args:
+        seed (Optional[int]): Seed of every random stream, a fresh one
+        is drawn if None.
+        fields (int): Numbers per line.
+        max_value (int): Largest number, the smallest is 0.
+        distribution (str): 'uniform', 'zipf' for small numbers being
+        far more frequent, or 'normal' around max_value / 2.
+        skew (float): Exponent of 'zipf', spread in sixths of the range
+        for 'normal'.
+        duplicate_ratio (float): Share of lines that repeat another line
+        of the same block.
+
+    Returns:
+        Dict[str, Any]: The spec, picklable for worker processes.
+
+    Raises:
+        ValueError: If an argument is out of range.
+    """
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution {distribution}")
+    if fields < 1 or max_value < 0:
+        raise ValueError("fields must be positive and max_value not "
+                         "negative")
+    if not 0 <= duplicate_ratio < 1:
+        raise ValueError("duplicate_ratio must be in [0, 1)")
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    values = np.arange(max_value + 1)
+    probabilities = None
+    if distribution == 'zipf':
+        probabilities = 1 / (values + 1.0) ** skew
+    elif distribution == 'normal':
+        sigma = max(max_value * skew / 6, 1e-9)
+        probabilities = np.exp(-((values - max_value / 2) / sigma) ** 2 / 2)
+    if probabilities is not None:
+        probabilities = probabilities / probabilities.sum()
+    return {
+        'seed': seed,
+        'fields': fields,
+        'max_value': max_value,
+        'probabilities': probabilities,
+        'duplicate_ratio': duplicate_ratio,
+    }
+
+
+def block_rng(seed: int, index: int) -> np.random.Generator:
+    """Return the random stream of one block."""
+    return np.random.default_rng(
+        np.random.SeedSequence(seed, spawn_key=(index,)))
+
+
+def generate_block(spec: Dict[str, Any], index: int,
+                   lines: int) -> np.ndarray:
+    """
+    Draw the numbers of one block.
+
+    Args:
+        spec (Dict[str, Any]): From make_spec().
+        index (int): The block index.
+        lines (int): Lines of the block.
+
+    Returns:
+        np.ndarray: One row of numbers per line.
+    """
+    rng = block_rng(spec['seed'], index)
+    shape = (lines, spec['fields'])
+    if spec['probabilities'] is None:
+        cells = rng.integers(0, spec['max_value'] + 1, shape,
+                             dtype=np.int64)
+    else:
+        cells = rng.choice(spec['max_value'] + 1, shape,
+                           p=spec['probabilities'])
+    if spec['duplicate_ratio'] and lines > 1:
+        duplicate = rng.random(lines) < spec['duplicate_ratio']
+        duplicate[0] = False
+        originals = np.flatnonzero(~duplicate)
+        # Copies of original lines only, a copy of a line that is
+        # itself overwritten would not be in the file.
+        cells[duplicate] = cells[rng.choice(originals,
+                                            int(duplicate.sum()))]
+    return cells
+
+
+def format_lines(cells: np.ndarray) -> bytes:
+    """
+    Join rows of numbers into semicolon separated lines.
+
+    Every number is gathered as its digits plus separator from a table
+    of fixed width rows, and the padding is dropped with one mask.
+
+    Args:
+        cells (np.ndarray): One row of non-negative numbers per line.
+
+    Returns:
+        bytes: The lines, each ending with a newline.
+    """
+    if not cells.size:
+        return b''
+    top = int(cells.max())
+    width = len(str(top)) + 1
+    # Rows 0..top end with ';', rows top+1.. with the newline that
+    # follows the last number of a line.
+    table = np.zeros((2 * (top + 1), width), dtype=np.uint8)
+    lengths = np.zeros(2 * (top + 1), dtype=np.uint8)
+    for value in range(top + 1):
+        digits = str(value).encode()
+        for row, separator in ((value, b';'), (top + 1 + value, b'\n')):
+            table[row, :len(digits) + 1] = np.frombuffer(
+                digits + separator, dtype=np.uint8)
+            lengths[row] = len(digits) + 1
+
+    rows = cells.astype(np.intp)
+    rows[:, -1] += top + 1
+    gathered = np.take(table, rows, axis=0)
+    used = np.arange(width, dtype=np.uint8) < np.take(lengths, rows)[..., None]
+    return gathered[used].tobytes()
+
+
+def format_line(cells: np.ndarray) -> str:
+    """Format one row of numbers as a line without the newline."""
+    return ';'.join(str(int(value)) for value in cells)
+
+
+def write_blocks(path: str, spec: Dict[str, Any], first_block: int,
+                 last_block: int, num_lines: int,
+                 sample_rows: np.ndarray) -> List[str]:
+    """
+    Write a range of blocks to a file.
+
+    Args:
+        path (str): The file, truncated first.
+        spec (Dict[str, Any]): From make_spec().
+        first_block (int): Index of the first block.
+        last_block (int): Index after the last block.
+        num_lines (int): Lines of the whole file, the last block may
+        be shorter.
+        sample_rows (np.ndarray): Line numbers to return, sorted.
+
+    Returns:
+        List[str]: The sampled lines within these blocks.
+    """
+    samples = []
+    with open(path, 'wb') as file:
+        for index in range(first_block, last_block):
+            start = index * BLOCK_LINES
+            lines = min(BLOCK_LINES, num_lines - start)
+            cells = generate_block(spec, index, lines)
+            file.write(format_lines(cells))
+            low, high = np.searchsorted(sample_rows, [start, start + lines])
+            samples.extend(format_line(cells[row - start])
+                           for row in sample_rows[low:high])
+    return samples
+
+
+def _write_blocks(arguments: Tuple) -> List[str]:
+    """Run write_blocks() in a worker process."""
+    return write_blocks(*arguments)
+
+
+def shard_paths(filename: str, shards: int) -> List[str]:
+    """
+    Return the files a sharded file is written to.
+
+    Args:
+        filename (str): The name of the whole file.
+        shards (int): Number of shards.
+
+    Returns:
+        List[str]: "name.shard<i>.ext" for every shard, in order.
+    """
+    stem, extension = os.path.splitext(filename)
+    return [f"{stem}.shard{index}{extension}" for index in range(shards)]
+
+
+def generate_test_file(filename: str, num_lines: int,
+                       seed: Optional[int] = None,
+                       processes: int = 1, shards: int = 0,
+                       samples: int = 0, **spec_args: Any) -> List[str]:
+    """
+    Generate a file of semicolon separated numbers.
+
+    Args:
+        filename (str): The file to write.
+        num_lines (int): Lines of the file.
+        seed (Optional[int]): Same seed, same file.
+        processes (int): Processes generating blocks in parallel.
+        shards (int): Write shard_paths(filename, shards) instead of
+        filename, 0 for a single file.
+        samples (int): Number of lines at distinct positions to
+        return.
+        **spec_args: fields, max_value, distribution, skew and
+        duplicate_ratio, see make_spec().
+
+    Returns:
+        List[str]: The sampled lines, in file order.
+    """
+    spec = make_spec(seed, **spec_args)
+    blocks = -(-num_lines // BLOCK_LINES)
+    sample_rows = np.sort(block_rng(spec['seed'], SAMPLE_STREAM).choice(
+        num_lines, min(samples, num_lines), replace=False))
+
+    # Shards are the parts, otherwise one part per process.
+    parts = shards or max(min(processes, blocks), 1)
+    paths = (shard_paths(filename, shards) if shards
+             else [filename] if parts == 1
+             else [f"{filename}.part{index}" for index in range(parts)])
+    tasks = [(path, spec, blocks * index // parts,
+              blocks * (index + 1) // parts, num_lines, sample_rows)
+             for index, path in enumerate(paths)]
+    if processes > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(min(processes, len(tasks))) as pool:
+            results = pool.map(_write_blocks, tasks)
+    else:
+        results = [write_blocks(*task) for task in tasks]
+
+    if not shards and parts > 1:
+        # Parts written in parallel are joined into the single file.
+        with open(filename, 'wb') as output:
+            for path in paths:
+                with open(path, 'rb') as part:
+                    shutil.copyfileobj(part, output, 1 << 24)
+                os.remove(path)
+    return [line for result in results for line in result]
+
+
+def miss_lines(count: int, seed: int, fields: int = 8,
+               max_value: int = 50) -> List[str]:
+    """
+    Generate lines that cannot be in a generated file.
+
+    Every line has one number above max_value.
+
+    Args:
+        count (int): Number of lines.
+        seed (int): Seed of the lines.
+        fields (int): Numbers per line.
+        max_value (int): Largest number of the file.
+
+    Returns:
+        List[str]: The lines.
+    """
+    rng = block_rng(seed, SAMPLE_STREAM + 1)
+    cells = rng.integers(0, max_value + 1, (count, fields))
+    cells[np.arange(count), rng.integers(0, fields, count)] = \
+        rng.integers(max_value + 1, 2 * max_value + 2, count)
+    return [format_line(row) for row in cells]
+
+
+def write_workload(path: str, hits: List[str], misses: List[str],
+                   algorithms: List[str], seed: int) -> None:
+    """
+    Write a query workload for metrics.load_generator.
+
+    Args:
+        path (str): The JSON lines file to write.
+        hits (List[str]): Lines of the file.
+        misses (List[str]): Lines not in the file.
+        algorithms (List[str]): Algorithms the queries are spread over.
+        seed (int): Seed of the order and the algorithms.
+    """
+    rng = block_rng(seed, SAMPLE_STREAM + 2)
+    queries = [(line, True) for line in hits] + \
+        [(line, False) for line in misses]
+    with open(path, 'w') as file:
+        for index in rng.permutation(len(queries)):
+            line, expected = queries[index]
+            file.write(json.dumps({
+                'algorithm': algorithms[rng.integers(len(algorithms))],
+                'query_string': line,
+                'expect': expected,
+            }) + '\n')
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--lines', type=int, nargs='+',
+                        default=[10000000, 100000000, 500000000,
+                                 1000000000],
+                        help='lines per file, one file per size')
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--fields', type=int, default=8)
+    parser.add_argument('--max-value', type=int, default=50)
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS,
+                        default='uniform')
+    parser.add_argument('--skew', type=float, default=1.2,
+                        help='zipf exponent, or normal spread')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.0)
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--shards', type=int, default=0,
+                        help='write this many shard files per size')
+    parser.add_argument('--workload',
+                        help='write a query workload, per size the '
+                        'size is added to the name')
+    parser.add_argument('--queries', type=int, default=10000)
+    parser.add_argument('--hit-ratio', type=float, default=0.5)
+    parser.add_argument('--algorithms', nargs='+', default=['default'])
+    args = parser.parse_args(argv)
+
+    for size in args.lines:
+        filename = os.path.join(args.output_dir, f'test_file_{size}.txt')
+        hits_wanted = round(args.queries * args.hit_ratio)
+        hits = generate_test_file(
+            filename, size, args.seed, args.processes, args.shards,
+            hits_wanted if args.workload else 0, fields=args.fields,
+            max_value=args.max_value, distribution=args.distribution,
+            skew=args.skew, duplicate_ratio=args.duplicate_ratio)
+        print(f"Generated '{filename}' with {size} lines.")
+        if args.workload:
+            stem, extension = os.path.splitext(args.workload)
+            workload = (args.workload if len(args.lines) == 1
+                        else f"{stem}_{size}{extension}")
+            misses = miss_lines(args.queries - hits_wanted, args.seed,
+                                args.fields, args.max_value)
+            write_workload(workload, hits, misses, args.algorithms,
+                           args.seed)
+            print(f"Wrote {len(hits) + len(misses)} queries to "
+                  f"'{workload}'.")
+
+
+if __name__ == '__main__':
+    main()
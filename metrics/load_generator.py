@@ -0,0 +1,557 @@
+"""
+Open-loop load generator for the search server.
+
+Requests are sent at a fixed target rate, with constant or Poisson
+spaced arrivals, whether or not earlier requests were answered. Every
+latency is measured from the time the request was meant to be sent,
+so a stalled server shows up as the queueing delay its clients would
+see instead of as fewer, fast samples (coordinated omission).
+
+The requests are drawn from a workload of JSON lines, one mix entry
+per line:
+
+    {"algorithm": "default", "weight": 8, "hit_ratio": 0.9}
+    {"algorithm": "binary", "weight": 2, "query_string": "1;2;3;"}
+
+Entries without a query_string search for lines of --data-file, or
+with probability 1 - hit_ratio for strings that are not in it, and
+the responses are checked against that expectation. Entries with a
+query_string can give "expect": true or false to be checked too.
+
+Run from the repository root against a running server:
+
+    python -m metrics.load_generator workload.jsonl --rate 2000 \\
+        --duration 30 --data-file test_200k.txt
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import ssl
+import sys
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from lib.framing import (FRAMED_PROTOCOL_MARKER, FramingError,
+                         encode_frame, read_frame_async)
+from metrics.benchmark import pick_queries
+from metrics.registry import Histogram
+
+ARRIVALS = ('poisson', 'constant')
+# Responses to a search, by whether the string was found.
+FOUND_RESPONSES = {b'STRING EXISTS': True, b'STRING NOT FOUND': False}
+# Responses the server sends instead of an answer, by error name.
+ERROR_RESPONSES = {b'SERVER BUSY': 'busy', b'SERVER ERROR': 'server_error',
+                   b'INVALID QUERY': 'invalid'}
+
+
+def load_workload(path: str) -> List[Dict[str, Any]]:
+    """
+    Load the mix entries of a workload file.
+
+    Args:
+        path (str): A file of JSON lines, blank lines are skipped.
+
+    Returns:
+        List[Dict[str, Any]]: The entries, with weight and hit_ratio
+        filled in.
+
+    Raises:
+        ValueError: If an entry has no algorithm or a bad weight.
+    """
+    entries = []
+    with open(path, 'r') as file:
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if not entry.get('algorithm'):
+                raise ValueError(f"{path}:{number}: missing algorithm")
+            entry.setdefault('weight', 1)
+            entry.setdefault('hit_ratio', 1.0)
+            if entry['weight'] <= 0:
+                raise ValueError(f"{path}:{number}: weight must be > 0")
+            entries.append(entry)
+    if not entries:
+        raise ValueError(f"{path}: no workload entries")
+    return entries
+
+
+def arrival_offsets(rate: float, duration: float, arrival: str,
+                    rng: random.Random) -> Iterator[float]:
+    """
+    Yield the intended send times of the requests.
+
+    Args:
+        rate (float): Requests per second.
+        duration (float): Seconds to generate requests for.
+        arrival (str): 'constant' for evenly spaced requests, 'poisson'
+        for exponentially distributed gaps with the same mean.
+        rng (random.Random): Source of the Poisson gaps.
+
+    Returns:
+        Iterator[float]: Seconds since the start, increasing.
+    """
+    if arrival == 'constant':
+        for index in range(int(rate * duration)):
+            yield index / rate
+        return
+    offset = rng.expovariate(rate)
+    while offset < duration:
+        yield offset
+        offset += rng.expovariate(rate)
+
+
+class RequestMix:
+    """
+    Draws requests from the entries of a workload.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]], hits: List[str],
+                 misses: List[str], rng: random.Random):
+        """
+        Initialize the mix.
+
+        Args:
+            entries (List[Dict[str, Any]]): The workload entries.
+            hits (List[str]): Strings in the data file.
+            misses (List[str]): Strings not in the data file.
+            rng (random.Random): Source of every choice.
+
+        Raises:
+            ValueError: If an entry needs strings that are missing.
+        """
+        for entry in entries:
+            needs_hits = entry['hit_ratio'] > 0
+            needs_misses = entry['hit_ratio'] < 1
+            if 'query_string' not in entry and (
+                    needs_hits and not hits or needs_misses and not misses):
+                raise ValueError(
+                    f"Entry {entry} needs a query_string or a data file")
+        self.entries = entries
+        self.weights = [entry['weight'] for entry in entries]
+        self.hits = hits
+        self.misses = misses
+        self.rng = rng
+
+    def draw(self) -> Tuple[str, bytes, Optional[bool]]:
+        """
+        Draw the next request.
+
+        Returns:
+            Tuple[str, bytes, Optional[bool]]: The algorithm, the JSON
+            payload and whether it should be found, None if unknown.
+        """
+        entry = self.rng.choices(self.entries, self.weights)[0]
+        expected = entry.get('expect')
+        query_string = entry.get('query_string')
+        if query_string is None:
+            expected = self.rng.random() < entry['hit_ratio']
+            query_string = self.rng.choice(
+                self.hits if expected else self.misses)
+        payload = json.dumps({'query_string': query_string,
+                              'algorithm': entry['algorithm']})
+        return entry['algorithm'], payload.encode('utf-8'), expected
+
+
+class LoadStats:
+    """
+    Latencies, outcomes and errors of a load run.
+    """
+
+    def __init__(self):
+        """Initialize with nothing recorded."""
+        self.latency = Histogram(max_samples=0)
+        self.by_algorithm: Dict[str, Histogram] = {}
+        self.errors: Dict[str, int] = collections.Counter()
+        self.wrong = 0
+        self.completed = 0
+        self.max_send_lag = 0.0
+
+    def record(self, algorithm: str, latency_ms: float,
+               response: bytes, expected: Optional[bool]) -> None:
+        """
+        Record the response to one request.
+
+        Args:
+            algorithm (str): The algorithm of the request.
+            latency_ms (float): Milliseconds from the intended send
+            time to the complete response.
+            response (bytes): The response.
+            expected (Optional[bool]): Whether the string should have
+            been found, None if unknown.
+        """
+        response = response.strip()
+        if response in ERROR_RESPONSES:
+            self.errors[ERROR_RESPONSES[response]] += 1
+            return
+        if response not in FOUND_RESPONSES:
+            self.errors['bad_response'] += 1
+            return
+        self.completed += 1
+        self.latency.add(latency_ms)
+        histogram = self.by_algorithm.get(algorithm)
+        if histogram is None:
+            histogram = self.by_algorithm[algorithm] = \
+                Histogram(max_samples=0)
+        histogram.add(latency_ms)
+        if expected is not None and FOUND_RESPONSES[response] != expected:
+            self.wrong += 1
+
+    def report(self, offered: int, duration: float,
+               parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Summarize the run.
+
+        Args:
+            offered (int): Requests that were due to be sent.
+            duration (float): Seconds from the first intended send time
+            to the last response.
+            parameters (Dict[str, Any]): The settings of the run.
+
+        Returns:
+            Dict[str, Any]: Throughput, latencies in milliseconds,
+            errors and wrong answers.
+        """
+        return {
+            'parameters': parameters,
+            'offered': offered,
+            'offered_rate': parameters['rate'],
+            'completed': self.completed,
+            'throughput': self.completed / duration if duration else 0.0,
+            'duration_s': duration,
+            'max_send_lag_ms': self.max_send_lag * 1000,
+            'errors': dict(self.errors),
+            'wrong': self.wrong,
+            'latency': self.latency.summary(),
+            'by_algorithm': {algorithm: histogram.summary()
+                             for algorithm, histogram
+                             in sorted(self.by_algorithm.items())},
+        }
+
+
+class FramedChannel:
+    """
+    A persistent framed connection with many requests in flight.
+
+    Requests are written as soon as they are due, the responses come
+    back in request order and complete the oldest waiting future.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter):
+        """
+        Start reading responses from an open connection.
+
+        Args:
+            reader (asyncio.StreamReader): The connection reader.
+            writer (asyncio.StreamWriter): The connection writer, the
+            protocol marker was already sent.
+        """
+        self.reader = reader
+        self.writer = writer
+        self.waiting: Deque[asyncio.Future] = collections.deque()
+        self.reading = asyncio.ensure_future(self._read_responses())
+
+    @classmethod
+    async def open(cls, host: str, port: int,
+                   ssl_context: Optional[ssl.SSLContext]
+                   ) -> 'FramedChannel':
+        """
+        Connect and announce the framed protocol.
+
+        Returns:
+            FramedChannel: The channel.
+        """
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=ssl_context)
+        writer.write(FRAMED_PROTOCOL_MARKER)
+        return cls(reader, writer)
+
+    def send(self, payload: bytes) -> asyncio.Future:
+        """
+        Send a request without waiting for earlier responses.
+
+        Args:
+            payload (bytes): The JSON request.
+
+        Returns:
+            asyncio.Future: Completed with the response bytes.
+        """
+        future = asyncio.get_running_loop().create_future()
+        if self.reading.done():
+            future.set_exception(ConnectionError("Connection closed"))
+            return future
+        self.waiting.append(future)
+        self.writer.write(encode_frame(payload))
+        return future
+
+    async def _read_responses(self) -> None:
+        """Complete the waiting futures in order, fail them on close."""
+        error: Exception = ConnectionError("Server closed the connection")
+        try:
+            while True:
+                payload = await read_frame_async(self.reader)
+                if payload is None:
+                    break
+                if self.waiting:
+                    future = self.waiting.popleft()
+                    # Requests that timed out were cancelled.
+                    if not future.done():
+                        future.set_result(payload)
+        except (OSError, FramingError) as e:
+            error = ConnectionError(str(e))
+        while self.waiting:
+            future = self.waiting.popleft()
+            if not future.done():
+                future.set_exception(error)
+
+    async def close(self) -> None:
+        """Close the connection."""
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except OSError:
+            pass
+        self.reading.cancel()
+
+
+class LoadGenerator:
+    """
+    Sends a request mix to the server at a fixed rate.
+
+    With connections set to 0 every request opens its own connection,
+    as speed_test_client does. Otherwise requests are spread round
+    robin over that many pipelined framed connections.
+    """
+
+    def __init__(self, host: str, port: int, mix: RequestMix,
+                 connections: int = 0,
+                 ssl_context: Optional[ssl.SSLContext] = None,
+                 timeout: float = 10.0, max_outstanding: int = 10000):
+        """
+        Initialize the generator.
+
+        Args:
+            host (str): The server address.
+            port (int): The server port.
+            mix (RequestMix): Draws the requests.
+            connections (int): Framed connections, 0 for one
+            connection per request.
+            ssl_context (Optional[ssl.SSLContext]): Wraps connections.
+            timeout (float): Seconds a request may take.
+            max_outstanding (int): Requests in flight before new ones
+            are dropped and counted as errors. Dropping instead of
+            waiting keeps the arrival rate fixed.
+        """
+        self.host = host
+        self.port = port
+        self.mix = mix
+        self.connections = connections
+        self.ssl_context = ssl_context
+        self.timeout = timeout
+        self.max_outstanding = max_outstanding
+        self.channels: List[FramedChannel] = []
+        self.stats = LoadStats()
+
+    async def _request(self, payload: bytes) -> bytes:
+        """Send one request on its own connection and read the response."""
+        reader, writer = await asyncio.open_connection(
+            self.host, self.port, ssl=self.ssl_context)
+        try:
+            writer.write(payload)
+            await writer.drain()
+            # The server answers and closes the connection.
+            return await reader.read()
+        finally:
+            writer.close()
+
+    async def _send(self, index: int, intended: float, algorithm: str,
+                    payload: bytes, expected: Optional[bool],
+                    record: bool) -> None:
+        """Send one request and record its outcome."""
+        loop = asyncio.get_running_loop()
+        try:
+            if self.channels:
+                channel = self.channels[index % len(self.channels)]
+                response = await asyncio.wait_for(
+                    channel.send(payload), self.timeout)
+            else:
+                response = await asyncio.wait_for(
+                    self._request(payload), self.timeout)
+        except asyncio.TimeoutError:
+            error = 'timeout'
+        except OSError as e:
+            error = 'connect' if isinstance(
+                e, (ConnectionRefusedError, ConnectionError)) else 'io'
+        else:
+            error = None
+        if not record:
+            return
+        if error is not None:
+            self.stats.errors[error] += 1
+            return
+        self.stats.record(algorithm, (loop.time() - intended) * 1000,
+                          response, expected)
+
+    async def run(self, rate: float, duration: float,
+                  arrival: str = 'poisson', warmup: float = 0.0,
+                  seed: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Generate load and report what the server did with it.
+
+        Args:
+            rate (float): Requests per second.
+            duration (float): Seconds of measured load.
+            arrival (str): 'poisson' or 'constant'.
+            warmup (float): Seconds of load before measuring starts.
+            seed (Optional[int]): Seed of the arrival times.
+
+        Returns:
+            Dict[str, Any]: The report of LoadStats.report().
+        """
+        loop = asyncio.get_running_loop()
+        for _ in range(self.connections):
+            self.channels.append(await FramedChannel.open(
+                self.host, self.port, self.ssl_context))
+
+        tasks = set()
+        offered = 0
+        stats = self.stats
+        # A short lead so the first requests are not already late.
+        start = loop.time() + 0.05
+        measured_from = start + warmup
+        offsets = arrival_offsets(rate, warmup + duration, arrival,
+                                  random.Random(seed))
+        for index, offset in enumerate(offsets):
+            intended = start + offset
+            delay = intended - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Late requests are sent at once, the lateness counts
+                # towards their latency.
+                stats.max_send_lag = max(stats.max_send_lag, -delay)
+            record = intended >= measured_from
+            offered += record
+            if len(tasks) >= self.max_outstanding:
+                if record:
+                    stats.errors['dropped'] += 1
+                continue
+            algorithm, payload, expected = self.mix.draw()
+            task = loop.create_task(self._send(
+                index, intended, algorithm, payload, expected, record))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks)
+        finished = loop.time()
+        for channel in self.channels:
+            await channel.close()
+
+        parameters = {
+            'host': self.host,
+            'port': self.port,
+            'rate': rate,
+            'duration_s': duration,
+            'warmup_s': warmup,
+            'arrival': arrival,
+            'connections': self.connections,
+            'seed': seed,
+        }
+        return stats.report(offered, finished - measured_from, parameters)
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print the throughput, latency percentiles and errors."""
+    def ms(summary: Dict[str, Any], key: str) -> str:
+        value = summary.get(key)
+        return '-' if value is None else f'{value:.2f}'
+
+    print(f"offered {report['offered']} at {report['offered_rate']:g}/s, "
+          f"completed {report['completed']}, "
+          f"throughput {report['throughput']:.1f}/s, "
+          f"max send lag {report['max_send_lag_ms']:.1f} ms")
+    print(f"{'':<16}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}"
+          f"{'p99 ms':>10}{'p999 ms':>10}{'max ms':>10}")
+    rows = [('all', report['latency'])] + list(
+        report['by_algorithm'].items())
+    for name, summary in rows:
+        print(f"{name:<16}{summary['count']:>8}"
+              + ''.join(f"{ms(summary, key):>10}" for key in (
+                  'p50_ms', 'p90_ms', 'p99_ms', 'p999_ms', 'max_ms')))
+    errors = ', '.join(f"{count} {name}" for name, count
+                       in sorted(report['errors'].items()))
+    print(f"errors: {errors or 'none'}, wrong answers: {report['wrong']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('workload', help='JSON lines of the request mix')
+    parser.add_argument('--host',
+                        default=os.getenv('SERVER_IP') or '127.0.0.1')
+    parser.add_argument('--port', type=int,
+                        default=int(os.getenv('SERVER_PORT') or 44445))
+    parser.add_argument('--rate', type=float, required=True,
+                        help='requests per second')
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help='seconds of measured load')
+    parser.add_argument('--warmup', type=float, default=1.0,
+                        help='seconds of load before measuring')
+    parser.add_argument('--arrival', choices=ARRIVALS, default='poisson')
+    parser.add_argument('--connections', type=int, default=0,
+                        help='pipelined framed connections, 0 opens one '
+                        'connection per request')
+    parser.add_argument('--data-file',
+                        help='file the hits are drawn from')
+    parser.add_argument('--pool', type=int, default=10000,
+                        help='distinct hits and misses to draw from')
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--max-outstanding', type=int, default=10000)
+    parser.add_argument('--ssl', action='store_true',
+                        help='connect with TLS, without verification')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--output', help='write the report as JSON')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    hits: List[str] = []
+    misses: List[str] = []
+    try:
+        entries = load_workload(args.workload)
+        if args.data_file:
+            with open(args.data_file, 'r') as file:
+                lines = sum(1 for _ in file)
+            hits, misses = pick_queries(
+                args.data_file, lines, args.pool, rng.randrange(2 ** 32))
+        mix = RequestMix(entries, hits, misses, rng)
+    except (OSError, ValueError) as e:
+        print(f"Cannot load the workload: {e}", file=sys.stderr)
+        return 2
+
+    ssl_context = None
+    if args.ssl:
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+
+    generator = LoadGenerator(
+        args.host, args.port, mix, args.connections, ssl_context,
+        args.timeout, args.max_outstanding)
+    try:
+        report = asyncio.run(generator.run(
+            args.rate, args.duration, args.arrival, args.warmup,
+            args.seed))
+    except OSError as e:
+        print(f"Cannot connect to the server: {e}", file=sys.stderr)
+        return 2
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Measure what logging costs per query.
+
+Answers framed queries in-process, once with every debug line
+formatted and written as the server used to, and once with the
+production setup of lib/logging_config: INFO level, a queued file
+handler and one sampled line per hundred queries.
+
+Run from the repository root:
+
+    python -m metrics.logging_benchmark [data file] [queries]
+"""
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import server
+from lib.logging_config import LOG_FORMAT, configure_logging, stop_logging
+
+ALGORITHMS = ['default', 'binary', 'hash_table']
+QUERY_STRING = '9;0;1;11;0;8;5;0;'
+WARMUP_QUERIES = 200
+
+
+def debug_logging() -> None:
+    """Log every debug line synchronously, formatted, to /dev/null."""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    handler = logging.StreamHandler(open(os.devnull, 'w'))
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(logging.DEBUG)
+
+
+def time_queries(file_path: str, queries: int) -> Dict[str, float]:
+    """
+    Time framed queries against file_path.
+
+    Args:
+        file_path (str): The data file to search.
+        queries (int): Queries timed per algorithm.
+
+    Returns:
+        Dict[str, float]: Microseconds per query, by algorithm.
+    """
+    results = {}
+    for algorithm in ALGORITHMS:
+        payload = json.dumps({'query_string': QUERY_STRING,
+                              'algorithm': algorithm}).encode('utf-8')
+        for _ in range(WARMUP_QUERIES):
+            server.answer_framed_query(payload, file_path, False, None)
+        start_time = time.perf_counter()
+        for _ in range(queries):
+            server.answer_framed_query(payload, file_path, False, None)
+        results[algorithm] = \
+            (time.perf_counter() - start_time) / queries * 1e6
+    return results
+
+
+def main(argv: List[str]) -> None:
+    file_path = argv[1] if len(argv) > 1 else 'test_200k.txt'
+    queries = int(argv[2]) if len(argv) > 2 else 20000
+    # Load the file and build the indexes before timing anything.
+    server.search_in_file(file_path, {'query_string': QUERY_STRING,
+                                      'algorithm': 'binary'}, False)
+
+    debug_logging()
+    before = time_queries(file_path, queries)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        configure_logging('INFO', os.path.join(tmp_dir, 'server.log'),
+                          use_queue=True, query_sample_rate=0.01)
+        after = time_queries(file_path, queries)
+        stop_logging()
+
+    print(f"{'algorithm':<12}{'debug us':>10}{'info us':>10}{'saved':>8}")
+    for algorithm in ALGORITHMS:
+        saved = 1 - after[algorithm] / before[algorithm]
+        print(f"{algorithm:<12}{before[algorithm]:>10.1f}"
+              f"{after[algorithm]:>10.1f}{saved:>8.0%}")
+
+
+if __name__ == '__main__':
+    main(sys.argv)
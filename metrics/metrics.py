@@ -7,16 +7,19 @@ def set_metrics_data(
         target_item: str,
         algorithms_list: List[str],
         json_file: str,
-        reread_on_query: bool):
+        reread_on_query: bool,
+        metric_name: str = "execution_times"):
     """
-    Append the metric_value to the 'execution_times'
-    array in the JSON file based on the algorithm's index.
+    Append the metric_value to the metric_name (by default
+    'execution_times') array in the JSON file based on the
+    algorithm's index.
 
     Args:
         metric_value (float): The metric value to append.
         target_item (str): The name of the algorithm to find.
         algorithms_list (List[str]): List of algorithm names.
         json_file (str): Path to the JSON file.
+        metric_name (str): Prefix of the array to append to.
     """
     # Find the index of the target algorithm in the algorithms_list
     try:
@@ -26,7 +29,7 @@ def set_metrics_data(
         return
 
     # added to comply with PEP8 standards
-    exec_time_string = f"execution_times_REREAD_ON_QUERY_{reread_on_query}"
+    exec_time_string = f"{metric_name}_REREAD_ON_QUERY_{reread_on_query}"
 
     try:
         # Load the JSON file
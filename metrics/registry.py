@@ -0,0 +1,522 @@
+import atexit
+import collections
+import json
+import logging
+import math
+import os
+import threading
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# Values are counted in whole microseconds. Below 2**SUB_BUCKET_BITS
+# microseconds every value has its own bucket, above that each power
+# of two is split into 2**(SUB_BUCKET_BITS - 1) buckets, so a bucket
+# is never wider than 1/128 of the values in it.
+SUB_BUCKET_BITS = 8
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT >> 1
+# Quantiles reported for every histogram, by name.
+PERCENTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('p999', 0.999))
+# Stages of a query timed by the server: waiting for a worker,
+# receiving the request, parsing it, loading the snapshot and search
+# structure, running the search and sending the response.
+STAGES = ('queue_wait', 'read', 'parse', 'index_acquire', 'search',
+          'respond')
+
+
+def bucket_index(value_us: int) -> int:
+    """
+    Return the log-linear bucket of a value.
+
+    Args:
+        value_us (int): The value in microseconds, not negative.
+
+    Returns:
+        int: The bucket index.
+    """
+    shift = value_us.bit_length() - SUB_BUCKET_BITS
+    if shift <= 0:
+        return value_us
+    return shift * SUB_BUCKET_HALF + (value_us >> shift)
+
+
+def bucket_range(index: int) -> Tuple[int, int]:
+    """
+    Return the lowest and highest microsecond value of a bucket.
+
+    Args:
+        index (int): The bucket index.
+
+    Returns:
+        Tuple[int, int]: The bounds, both included.
+    """
+    if index < SUB_BUCKET_COUNT:
+        return index, index
+    shift = index // SUB_BUCKET_HALF - 1
+    low = (index - shift * SUB_BUCKET_HALF) << shift
+    return low, low + (1 << shift) - 1
+
+
+class Histogram:
+    """
+    A log-linear latency histogram with the most recent samples.
+
+    Like an HDR histogram, the bucket width grows with the value, so
+    percentiles keep a relative error below 1% from microseconds to
+    hours with at most a few thousand buckets, of which only the used
+    ones are stored. The buckets, count and sum cover every recorded
+    value, while only the last max_samples values are kept, for the
+    plotting scripts.
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'minimum', 'maximum', 'recent')
+
+    def __init__(self, max_samples: int = 1000):
+        """
+        Initialize an empty histogram.
+
+        Args:
+            max_samples (int): Number of recent values to keep.
+        """
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+        self.recent: Deque[float] = collections.deque(maxlen=max_samples)
+
+    def add(self, value: float) -> None:
+        """
+        Record one value.
+
+        Args:
+            value (float): The value in milliseconds.
+        """
+        index = bucket_index(max(int(value * 1000), 0))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        self.recent.append(value)
+
+    def percentile(self, quantile: float) -> Optional[float]:
+        """
+        Return the value below which the given share of values lies.
+
+        Args:
+            quantile (float): The share, e.g. 0.99.
+
+        Returns:
+            Optional[float]: The middle of the bucket holding that
+            value in milliseconds, within min and max, None if empty.
+        """
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(quantile * self.count))
+        if rank >= self.count:
+            return self.maximum
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                break
+        low, high = bucket_range(index)
+        value = (low + high) / 2000
+        return min(max(value, self.minimum), self.maximum)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Return the count, sum, mean, extremes and percentiles.
+
+        Returns:
+            Dict[str, Any]: The values in milliseconds.
+        """
+        result: Dict[str, Any] = {
+            'count': self.count,
+            'sum_ms': self.total,
+            'mean_ms': self.total / self.count if self.count else None,
+            'min_ms': self.minimum,
+            'max_ms': self.maximum,
+        }
+        for name, quantile in PERCENTILES:
+            result[f"{name}_ms"] = self.percentile(quantile)
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the buckets, totals and percentiles, without the
+        recent values."""
+        data = self.summary()
+        data.update({
+            'sub_bucket_bits': SUB_BUCKET_BITS,
+            'counts': {str(index): count
+                       for index, count in sorted(self.counts.items())},
+        })
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any],
+                  max_samples: int = 1000) -> Optional['Histogram']:
+        """
+        Restore a histogram written by to_dict.
+
+        Args:
+            data (Dict[str, Any]): The dict written by to_dict.
+            max_samples (int): Number of recent values to keep.
+
+        Returns:
+            Optional[Histogram]: The histogram, None if it was written
+            with other buckets.
+        """
+        if data.get('sub_bucket_bits') != SUB_BUCKET_BITS:
+            return None
+        histogram = cls(max_samples)
+        histogram.counts = {int(index): count
+                            for index, count in data['counts'].items()}
+        histogram.count = data['count']
+        histogram.total = data['sum_ms']
+        histogram.minimum = data['min_ms']
+        histogram.maximum = data['max_ms']
+        return histogram
+
+
+class MetricsRegistry:
+    """
+    In-process query metrics, flushed to a JSON file on an interval.
+
+    Recording a value only appends to a deque, which is thread safe
+    without a lock. A flusher thread moves the pending values into
+    one Histogram per (metric, reread mode, algorithm) and rewrites
+    the file atomically. The file keeps the layout of
+    set_metrics_data, one array of recent values per algorithm under
+    '<metric>_REREAD_ON_QUERY_<mode>', plus the histograms under
+    'histograms' and any registered summaries.
+
+    The time of each stage of a query (see STAGES) is kept in one
+    Histogram per (data file, algorithm, stage) under 'stages'.
+
+    There is one registry per JSON file in a process, see for_file.
+    """
+
+    _registries: Dict[Optional[str], 'MetricsRegistry'] = {}
+    _registries_lock = threading.Lock()
+
+    def __init__(self,
+                 algorithms: List[str],
+                 json_file: Optional[str] = None,
+                 flush_interval: float = 5.0,
+                 max_samples: int = 1000):
+        """
+        Initialize the registry, loading earlier metrics from json_file.
+
+        Args:
+            algorithms (List[str]): Algorithm names, in file order.
+            json_file (Optional[str]): File to flush to, None to keep
+            the metrics in memory only.
+            flush_interval (float): Seconds between flushes.
+            max_samples (int): Recent values kept per histogram.
+        """
+        self.algorithms = list(algorithms)
+        self.json_file = json_file
+        self.flush_interval = flush_interval
+        self.max_samples = max_samples
+
+        self.pending: Deque[Tuple[str, str, str, float]] = \
+            collections.deque()
+        self.histograms: Dict[Tuple[str, str, str], Histogram] = {}
+        self.pending_stages: Deque[Tuple[str, str, Dict[str, float]]] = \
+            collections.deque()
+        # (data file, algorithm, stage) -> Histogram
+        self.stage_histograms: Dict[Tuple[str, str, str], Histogram] = {}
+        self.summaries: Dict[str, Callable[[], Optional[Dict]]] = {}
+        # Serializes collecting and flushing, never taken by record().
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.flusher: Optional[threading.Thread] = None
+        self._load()
+
+    @classmethod
+    def for_file(cls, json_file: Optional[str],
+                 algorithms: List[str],
+                 flush_interval: float = 5.0) -> 'MetricsRegistry':
+        """
+        Return the registry of json_file, creating and starting it.
+
+        Args:
+            json_file (Optional[str]): The metrics JSON file.
+            algorithms (List[str]): Algorithm names, in file order.
+            flush_interval (float): Seconds between flushes, only used
+            when the registry is created.
+
+        Returns:
+            MetricsRegistry: The registry.
+        """
+        registry = cls._registries.get(json_file)
+        if registry is not None:
+            return registry
+        with cls._registries_lock:
+            registry = cls._registries.get(json_file)
+            if registry is None:
+                registry = cls(algorithms, json_file, flush_interval)
+                registry.start()
+                cls._registries[json_file] = registry
+            return registry
+
+    def record(self, metric_name: str, algorithm: str,
+               reread_on_query: Any, value: float) -> None:
+        """
+        Record one value, cheap enough for the query path.
+
+        Args:
+            metric_name (str): The metric, e.g. 'execution_times'.
+            algorithm (str): The algorithm of the query.
+            reread_on_query (Any): The reread mode of the query.
+            value (float): The value in milliseconds.
+        """
+        self.pending.append(
+            (metric_name, str(reread_on_query), algorithm, value))
+
+    def record_stages(self, file_name: str, algorithm: str,
+                      stages: Dict[str, float]) -> None:
+        """
+        Record the stage times of one query, as cheap as record().
+
+        Args:
+            file_name (str): The data file the query searched.
+            algorithm (str): The algorithm of the query.
+            stages (Dict[str, float]): Milliseconds per stage, stages
+            the query skipped are left out.
+        """
+        self.pending_stages.append((file_name, algorithm, stages))
+
+    def add_summary(self, name: str,
+                    provider: Callable[[], Optional[Dict]]) -> None:
+        """
+        Include provider() under name in every flush.
+
+        Args:
+            name (str): Key of the summary in the file.
+            provider (Callable[[], Optional[Dict]]): Returns the current
+            values, or None to leave them out.
+        """
+        self.summaries[name] = provider
+
+    def collect(self) -> None:
+        """Move the pending values into their histograms."""
+        with self.lock:
+            pending = self.pending
+            while pending:
+                metric_name, mode, algorithm, value = pending.popleft()
+                key = (metric_name, mode, algorithm)
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram(
+                        self.max_samples)
+                histogram.add(value)
+
+            pending_stages = self.pending_stages
+            while pending_stages:
+                file_name, algorithm, stages = pending_stages.popleft()
+                for stage, value in stages.items():
+                    key = (file_name, algorithm, stage)
+                    histogram = self.stage_histograms.get(key)
+                    if histogram is None:
+                        histogram = self.stage_histograms[key] = Histogram(0)
+                    histogram.add(value)
+
+    def stage_stats(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Return the percentiles of every stage.
+
+        Returns:
+            Dict[str, Dict[str, Dict[str, Any]]]: Histogram summaries by
+            data file, algorithm and stage.
+        """
+        self.collect()
+        stats: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        with self.lock:
+            for (file_name, algorithm, stage), histogram in sorted(
+                    self.stage_histograms.items()):
+                stats.setdefault(file_name, {}).setdefault(
+                    algorithm, {})[stage] = histogram.summary()
+        return stats
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return percentiles of every metric and the summaries, for the
+        stats command.
+
+        Returns:
+            Dict[str, Any]: Query metrics by metric and algorithm,
+            stage times by data file, algorithm and stage, and the
+            registered summaries.
+        """
+        stats: Dict[str, Any] = {
+            'queries': self.query_stats(),
+            'stages': self.stage_stats(),
+        }
+        stats.update(self._summaries())
+        return stats
+
+    def query_stats(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Return the percentiles of every query metric.
+
+        Returns:
+            Dict[str, Dict[str, Dict[str, Any]]]: Histogram summaries by
+            '<metric>_REREAD_ON_QUERY_<mode>' and algorithm.
+        """
+        self.collect()
+        queries: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        with self.lock:
+            for (metric_name, mode, algorithm), histogram in sorted(
+                    self.histograms.items()):
+                key = f"{metric_name}_REREAD_ON_QUERY_{mode}"
+                queries.setdefault(key, {})[algorithm] = histogram.summary()
+        return queries
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return every metric in the layout written to the file.
+
+        Returns:
+            Dict[str, Any]: The metrics.
+        """
+        self.collect()
+        data: Dict[str, Any] = {'algorithms': self.algorithms}
+        histograms: Dict[str, Dict[str, Any]] = {}
+        with self.lock:
+            for (metric_name, mode, algorithm), histogram in sorted(
+                    self.histograms.items()):
+                key = f"{metric_name}_REREAD_ON_QUERY_{mode}"
+                histograms.setdefault(key, {})[algorithm] = \
+                    histogram.to_dict()
+                if algorithm not in self.algorithms:
+                    continue
+                values = data.setdefault(key, [])
+                index = self.algorithms.index(algorithm)
+                while len(values) <= index:
+                    values.append([])
+                values[index] = list(histogram.recent)
+        data['histograms'] = histograms
+
+        stages: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        with self.lock:
+            for (file_name, algorithm, stage), histogram in sorted(
+                    self.stage_histograms.items()):
+                stages.setdefault(file_name, {}).setdefault(
+                    algorithm, {})[stage] = histogram.to_dict()
+        data['stages'] = stages
+        data.update(self._summaries())
+        return data
+
+    def _summaries(self) -> Dict[str, Dict]:
+        """Evaluate the registered summaries, leaving out failures."""
+        summaries = {}
+        for name, provider in self.summaries.items():
+            try:
+                summary = provider()
+            except Exception as e:
+                logging.error(f"Error collecting {name} metrics: {e}")
+                continue
+            if summary is not None:
+                summaries[name] = summary
+        return summaries
+
+    def flush(self) -> None:
+        """Write the metrics to the file, replacing it atomically.
+
+        Without a file the pending values are still collected, so they
+        do not pile up.
+        """
+        if self.json_file is None:
+            self.collect()
+            return
+        data = self.snapshot()
+        temp_path = f"{self.json_file}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.json_file)
+        except OSError as e:
+            logging.error(f"Error writing metrics to {self.json_file}: {e}")
+
+    def start(self) -> None:
+        """Flush on an interval in a daemon thread and once at exit."""
+        self.flusher = threading.Thread(target=self._run, daemon=True)
+        self.flusher.start()
+        atexit.register(self.close)
+
+    def close(self) -> None:
+        """Stop the flusher, write the final metrics and log the stage
+        percentiles. Later calls do nothing."""
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
+        if (self.flusher is not None
+                and self.flusher is not threading.current_thread()):
+            self.flusher.join()
+        self.flush()
+        self.dump_stages()
+
+    def dump_stages(self) -> None:
+        """Log one line of percentiles per data file, algorithm and
+        stage."""
+        for file_name, algorithms in self.stage_stats().items():
+            for algorithm, stages in algorithms.items():
+                for stage, summary in stages.items():
+                    logging.info(
+                        f"{file_name} {algorithm} {stage}: "
+                        f"n={summary['count']} "
+                        f"p50={summary['p50_ms']:.3f} "
+                        f"p90={summary['p90_ms']:.3f} "
+                        f"p99={summary['p99_ms']:.3f} "
+                        f"p999={summary['p999_ms']:.3f} "
+                        f"max={summary['max_ms']:.3f} ms")
+
+    def _run(self) -> None:
+        """Flush until stopped."""
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
+
+    def _load(self) -> None:
+        """Continue from the metrics already in the file."""
+        if self.json_file is None or not os.path.exists(self.json_file):
+            return
+        try:
+            with open(self.json_file) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(
+                f"Ignoring unreadable metrics file {self.json_file}: {e}")
+            return
+
+        algorithms = data.get('algorithms') or self.algorithms
+        saved_histograms = data.get('histograms', {})
+        for key, values in data.items():
+            if '_REREAD_ON_QUERY_' not in key or not isinstance(values, list):
+                continue
+            metric_name, mode = key.rsplit('_REREAD_ON_QUERY_', 1)
+            for algorithm, samples in zip(algorithms, values):
+                saved = saved_histograms.get(key, {}).get(algorithm)
+                histogram = None
+                if saved is not None:
+                    histogram = Histogram.from_dict(saved, self.max_samples)
+                if histogram is not None:
+                    histogram.recent.extend(samples)
+                else:
+                    # Written by set_metrics_data or with other buckets,
+                    # only the kept values can be counted again.
+                    histogram = Histogram(self.max_samples)
+                    for value in samples:
+                        histogram.add(value)
+                self.histograms[(metric_name, mode, algorithm)] = histogram
+
+        for file_name, algorithms in data.get('stages', {}).items():
+            for algorithm, stages in algorithms.items():
+                for stage, saved in stages.items():
+                    histogram = Histogram.from_dict(saved, 0)
+                    if histogram is not None:
+                        self.stage_histograms[
+                            (file_name, algorithm, stage)] = histogram
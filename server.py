@@ -1,39 +1,96 @@
+import asyncio
+import concurrent.futures
+import functools
+import ipaddress
 import json
+import multiprocessing
+import resource
+import signal
 import socket
 import threading
 import time
 import ssl
 import os
 import mmap
-from typing import List, Optional, Dict
-from lib.preload_data import DataPreloader
-from lib.search_engine import SearchEngine, search_alg_setup
+import sys
+from typing import Any, Callable, List, Optional, Dict, Tuple, Union
+from lib.search_engine import (
+    SearchEngine,
+    bloom_filter_stats,
+    search_alg_setup,
+    search_alg_setup_batch
+)
+from lib.admin_server import AdminServer, ConnectionCounter, PrometheusText
 from lib.configuration import load_reread_on_query_config, read_config
-from metrics.metrics import set_metrics_data
+from metrics.registry import MetricsRegistry
 import pyinotify
 from lib.event_handler import EventHandler
+from lib.reload_scheduler import ReloadScheduler
+from lib.result_cache import ResultCache
+from lib.single_flight import SingleFlight
+from lib.file_server import FileServer, FileSnapshot
+from lib.index_registry import IndexRegistry, estimate_size
+from lib.logging_config import configure_logging, query_sampler
+from lib.external_index import external_index_path
+from lib.index_snapshot import index_snapshot_path
+from lib.shared_index import SharedIndexFollower, SharedIndexPublisher
 from lib.optimized_file_reader import FileReader
+from lib.socket_exception import InvalidQueryError, ServerBusyError
+from lib.worker_pool import WorkerPool
+from lib.framing import (
+    FRAMED_PROTOCOL_MARKER,
+    FrameReader,
+    encode_frame,
+    read_frame_async
+)
 import logging
 
-logging.basicConfig(level=logging.DEBUG,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
-
 # The size of the payload buffer for receiving search queries from clients.
 PAYLOAD_SIZE = 4096
+# Algorithms cheap enough to run directly on the connection thread
+# or the asyncio event loop. Everything else goes to the worker pool.
+INLINE_ALGORITHMS = frozenset({'default'})
+# Maximum number of framed queries a client may have in flight
+# before the server stops reading from its connection.
+PIPELINE_DEPTH = 128
+# Framed responses for queries that could not be answered.
+INVALID_QUERY_RESPONSE = b'INVALID QUERY'
+SERVER_ERROR_RESPONSE = b'SERVER ERROR'
+# Response for queries rejected because the worker queue is full.
+SERVER_BUSY_RESPONSE = b'SERVER BUSY'
+# Sent instead of a query by a client on the same host, answered with
+# the metrics percentiles as JSON.
+STATS_COMMAND = b'STATS'
 shared_file_content = ""  # This will hold the content of the watched file
+# Results of recent single queries, None when caching is disabled.
+result_cache: Optional[ResultCache] = None
+# Identical single queries in flight on the worker pool share one search.
+single_flight = SingleFlight()
+# Client connections of this process, for the admin endpoint.
+connections = ConnectionCounter()
+# Reloads the data file, set by prepare_shared_data.
+reload_scheduler: Optional[ReloadScheduler] = None
 
 
-def monitor_file(file_path: str):
+def monitor_file(file_path: str, scheduler: ReloadScheduler):
     """Monitor the specified file for modifications
     and reload content when changes occur.
 
+    Bursts of modification events are coalesced by the scheduler
+    into a single reload once the file has been quiet for a while.
+
     Args:
         file_path (str): The path to the file to be monitored.
+        scheduler (ReloadScheduler): Reloads the file after changes.
     """
     wm = pyinotify.WatchManager()
-    handler = EventHandler()
+    handler = EventHandler(scheduler=scheduler)
     notifier = pyinotify.Notifier(wm, handler)
-    wm.add_watch(file_path, pyinotify.ALL_EVENTS)
+    # Watch the directory so files replaced by a rename are seen too.
+    wm.add_watch(
+        os.path.dirname(os.path.abspath(file_path)),
+        pyinotify.IN_MODIFY | pyinotify.IN_CLOSE_WRITE
+        | pyinotify.IN_MOVED_TO)
 
     logging.debug("DEBUG: Starting to monitor file...")
     notifier.loop()
@@ -90,98 +147,1172 @@ def check_algorithm_string(algorithm_string: str) -> bool:
 
 def search_in_file(file_path: str,
                    query: Dict[str, str],
-                   reread_on_query: bool = False) -> bool:
+                   reread_on_query: bool = False,
+                   check_cache: bool = True,
+                   timings: Optional[Dict[str, float]] = None
+                   ) -> Union[bool, List[bool]]:
     """Search for a query string in the specified file
     using the provided algorithm.
 
+    Batch queries carry a 'queries' list instead of 'query_string'
+    and get one result per entry.
+
     Args:
         file_path (str): The file path to search in.
         query (Dict[str, str]): A dictionary containing
-        'query_string' and 'algorithm'.
+        'query_string' (or 'queries') and 'algorithm'.
         reread_on_query (bool): Whether the file should
         be re-read before each query.
+        check_cache (bool): Look the query up in the result cache
+        first, results are stored either way.
+        timings (Optional[Dict[str, float]]): Receives the milliseconds
+        spent per stage of the search, nothing for a cached result.
 
     Returns:
-        bool: True if the query string is found, False otherwise.
+        Union[bool, List[bool]]: True if the query string is found,
+        False otherwise, or a list of those for batch queries.
     """
+    algorithm_string: str = query['algorithm']
+
+    if 'queries' in query:
+        if check_algorithm_string(algorithm_string):
+            return search_alg_setup_batch(
+                algorithm_string,
+                reread_on_query,
+                file_path,
+                query['queries'],
+                shared_file_content,
+                timings)
+
+        logging.debug("DEBUG: Invalid algorithm: %s", algorithm_string)
+        return [False] * len(query['queries'])
 
     query_string: str = query['query_string']
-    algorithm_string: str = query['algorithm']
 
     if check_algorithm_string(algorithm_string):
-        return search_alg_setup(
+        if result_cache is not None:
+            # Read before searching, a result is never stored under a
+            # newer generation than the content it came from.
+            generation = current_generation(file_path, reread_on_query)
+            result = result_cache.get(
+                generation, algorithm_string, query_string
+            ) if check_cache else None
+            if result is not None:
+                return result
+
+        result = search_alg_setup(
             algorithm_string,
             reread_on_query,
             file_path,
             query_string,
-            shared_file_content)
+            shared_file_content,
+            timings)
+        if result_cache is not None:
+            result_cache.put(
+                generation, algorithm_string, query_string, result)
+        return result
 
-    logging.debug(f"DEBUG: Invalid algorithm: {algorithm_string}")
+    logging.debug("DEBUG: Invalid algorithm: %s", algorithm_string)
     return False
 
 
+def current_generation(file_path: str, reread_on_query: bool) -> int:
+    """Return the content generation queries are answered from.
+
+    With reread_on_query the file is revalidated first.
+
+    Args:
+        file_path (str): The file path to search in.
+        reread_on_query (bool): Whether the file should
+        be re-read before each query.
+
+    Returns:
+        int: The generation of the current snapshot.
+    """
+    return SearchEngine(
+        reread_on_query, file_path, None).load_snapshot().generation
+
+
+def submit_search(
+        file_path: str,
+        parsed_query: Dict[str, str],
+        reread_on_query: bool,
+        worker_pool: WorkerPool,
+        coalesce: bool = True,
+        timings: Optional[Dict[str, float]] = None
+) -> Tuple[concurrent.futures.Future, bool]:
+    """Start a search on the worker pool unless it can be shared.
+
+    Single queries are answered from the result cache when possible,
+    or join an identical search of the same generation that is still
+    in flight, so only one of them occupies a worker.
+
+    Args:
+        file_path (str): The file path to search in.
+        parsed_query (Dict[str, str]): The parsed query.
+        reread_on_query (bool): Whether the file should
+        be re-read before each query.
+        worker_pool (WorkerPool): Pool for CPU-heavy searches.
+        coalesce (bool): Check the cache and in-flight searches, which
+        takes a stat call under reread_on_query.
+        timings (Optional[Dict[str, float]]): Receives the stage times
+        of the search, only if it is not shared.
+
+    Returns:
+        Tuple[concurrent.futures.Future, bool]: The future for the
+        result and whether it was shared rather than queued for this
+        query.
+
+    Raises:
+        ServerBusyError: If the worker queue is full.
+    """
+    algorithm = parsed_query['algorithm']
+
+    def start() -> concurrent.futures.Future:
+        # The cache was just checked, search_in_file only fills it.
+        return worker_pool.submit(
+            algorithm, search_in_file, file_path, parsed_query,
+            reread_on_query, False, timings)
+
+    if not coalesce or 'queries' in parsed_query:
+        return start(), False
+
+    generation = current_generation(file_path, reread_on_query)
+    query_string = parsed_query['query_string']
+    if result_cache is not None:
+        result = result_cache.get(generation, algorithm, query_string)
+        if result is not None:
+            future: concurrent.futures.Future = concurrent.futures.Future()
+            future.set_result(result)
+            return future, True
+    return single_flight.run((generation, algorithm, query_string), start)
+
+
+def parse_query(payload: bytes) -> Dict[str, str]:
+    """Decode a raw client payload into a search query dictionary.
+
+    Falls back to the 'default' algorithm when the query string is
+    empty or the requested algorithm is unknown.
+
+    Args:
+        payload (bytes): The raw bytes received from the client.
+
+    Returns:
+        Dict[str, str]: The parsed query with a valid 'algorithm' key.
+
+    Raises:
+        json.JSONDecodeError: If the payload is not valid JSON.
+        InvalidQueryError: If a batch query is not a list of strings.
+    """
+    query = payload.decode('utf-8').rstrip('\x00')
+    logging.debug("Search query received: '%s'", query)
+
+    parsed_query = json.loads(query)
+
+    if 'queries' in parsed_query:
+        queries = parsed_query['queries']
+        if not isinstance(queries, list) or not all(
+                isinstance(item, str) for item in queries):
+            raise InvalidQueryError("'queries' must be a list of strings")
+        has_query = bool(queries)
+    else:
+        has_query = bool(parsed_query.get('query_string'))
+
+    # Check if the search string is empty or the algorithm is invalid.
+    if not has_query or parsed_query.get(
+            'algorithm') not in ALGORITHMS_LIST:
+        parsed_query['algorithm'] = 'default'
+        logging.debug("Using default algorithm.")
+    else:
+        logging.debug("Using Custom algorithm.")
+
+    return parsed_query
+
+
+def format_response(match_found: Union[bool, List[bool]],
+                    response_format: Optional[str] = None) -> bytes:
+    """Build the wire response for a search result.
+
+    Batch results are returned as JSON, either as a list of booleans
+    or, with response_format 'bitmap', as a hex encoded bitmap where
+    bit i (least significant bit first) is set if query i was found.
+
+    Args:
+        match_found (Union[bool, List[bool]]): The search result.
+        response_format (Optional[str]): 'bitmap' for a compact
+        batch response.
+
+    Returns:
+        bytes: The response sent back to the client.
+    """
+    if isinstance(match_found, list):
+        if response_format == 'bitmap':
+            bitmap = bytearray((len(match_found) + 7) // 8)
+            for i, found in enumerate(match_found):
+                if found:
+                    bitmap[i >> 3] |= 1 << (i & 7)
+            body = {'count': len(match_found), 'bitmap': bitmap.hex()}
+        else:
+            body = {'results': match_found}
+        return json.dumps(body, separators=(',', ':')).encode('utf-8')
+
+    return b'STRING EXISTS' if match_found else b'STRING NOT FOUND'
+
+
+def record_query_metrics(
+        start_time: float,
+        algorithm: str,
+        reread_on_query: bool,
+        metrics_json_path: str,
+        queue_wait_ms: Optional[float] = None,
+        file_path: Optional[str] = None,
+        stages: Optional[Dict[str, float]] = None) -> None:
+    """Record the execution time of a finished query.
+
+    Time spent waiting for a worker is recorded separately under
+    'queue_wait_times' and is not part of the execution time. Values
+    go to the in-memory metrics registry of metrics_json_path, which
+    writes the file on an interval.
+
+    The stage times, including the queue wait, are recorded per
+    data file and algorithm.
+
+    Args:
+        start_time (float): Time at which the query started.
+        algorithm (str): The algorithm used for the query.
+        reread_on_query (bool): If true, the file is re-read for each query.
+        metrics_json_path (str): The path to the JSON file to record metrics.
+        queue_wait_ms (Optional[float]): Time the query waited for a
+        worker, None if it did not go through the worker pool.
+        file_path (Optional[str]): The data file the query searched.
+        stages (Optional[Dict[str, float]]): Milliseconds per stage of
+        the query, see metrics.registry.STAGES.
+    """
+    exec_time = (time.time() - start_time) * 1000
+    registry = MetricsRegistry.for_file(metrics_json_path, ALGORITHMS_LIST)
+    if queue_wait_ms is not None:
+        exec_time -= queue_wait_ms
+        registry.record(
+            'queue_wait_times', algorithm, reread_on_query, queue_wait_ms)
+    registry.record('execution_times', algorithm, reread_on_query, exec_time)
+    if stages is not None and file_path is not None:
+        if queue_wait_ms is not None:
+            stages['queue_wait'] = queue_wait_ms
+        registry.record_stages(os.path.basename(file_path), algorithm, stages)
+    if query_sampler.sample():
+        logging.info("Sampled query: %s on %s in %.3f ms, stages %s",
+                     algorithm, file_path, exec_time, stages)
+    else:
+        logging.debug("Query processed in %.2f ms", exec_time)
+
+
+def worker_metrics_path(metrics_json_path: Optional[str],
+                        index: int) -> Optional[str]:
+    """Return the metrics file of a pre-forked worker.
+
+    Args:
+        metrics_json_path (Optional[str]): The configured metrics file.
+        index (int): Index of the worker, kept across restarts.
+
+    Returns:
+        Optional[str]: e.g. metrics.worker0.json, None without a file.
+    """
+    if metrics_json_path is None:
+        return None
+    root, ext = os.path.splitext(metrics_json_path)
+    return f"{root}.worker{index}{ext}"
+
+
+def start_metrics(metrics_json_path: Optional[str],
+                  flush_interval: float = 5.0) -> MetricsRegistry:
+    """Start the metrics registry that record_query_metrics feeds.
+
+    Besides the query latencies, every flush includes the Bloom
+    filter, result cache and single-flight statistics.
+
+    Args:
+        metrics_json_path (Optional[str]): The JSON file the metrics
+        are flushed to.
+        flush_interval (float): Seconds between flushes.
+
+    Returns:
+        MetricsRegistry: The registry of metrics_json_path.
+    """
+    registry = MetricsRegistry.for_file(
+        metrics_json_path, ALGORITHMS_LIST, flush_interval)
+    registry.add_summary(
+        'bloom_filter', lambda: bloom_filter_stats() or None)
+    registry.add_summary(
+        'result_cache',
+        lambda: result_cache.stats() if result_cache is not None else None)
+    registry.add_summary('single_flight', single_flight.stats)
+    return registry
+
+
+def admin_metrics(worker_pool: Optional[WorkerPool],
+                  registry: Optional[MetricsRegistry]) -> str:
+    """Describe the live state of this process for the admin endpoint.
+
+    Args:
+        worker_pool (Optional[WorkerPool]): The search worker pool,
+        None in the prefork supervisor.
+        registry (Optional[MetricsRegistry]): The query metrics, None
+        in the prefork supervisor.
+
+    Returns:
+        str: Connections, worker queue, index generation, build time
+        and memory, reload, cache and filter counters and latency
+        percentiles in the Prometheus text format.
+    """
+    text = PrometheusText()
+    counts = connections.stats()
+    text.add('connections_active', 'gauge',
+             'Client connections being served.', counts['active'])
+    text.add('connections_total', 'counter',
+             'Client connections served.', counts['total'])
+    text.add('connections_rejected_total', 'counter',
+             'Connections answered with SERVER BUSY.', counts['rejected'])
+
+    if worker_pool is not None:
+        pool = worker_pool.stats()
+        text.add('worker_queue_depth', 'gauge',
+                 'Queries waiting for a search worker.', pool['queued'])
+        for algorithm, running in sorted(pool['running'].items()):
+            text.add('worker_running', 'gauge',
+                     'Searches running on a worker.', running,
+                     {'algorithm': algorithm})
+        text.add('worker_rejected_total', 'counter',
+                 'Queries rejected because the worker queue was full.',
+                 pool['rejected'])
+        text.add('worker_completed_total', 'counter',
+                 'Searches finished by the workers.', pool['completed'])
+
+    snapshot = FileServer().get_snapshot()
+    chunks = snapshot.loaded_chunks()
+    text.add('index_generation', 'gauge',
+             'Content generation queries are answered from.',
+             snapshot.generation)
+    text.add('index_bytes', 'gauge',
+             'Estimated memory of each index structure.',
+             sum(sys.getsizeof(chunk) for chunk in chunks),
+             {'structure': 'content'})
+    text.add('index_bytes', 'gauge',
+             'Estimated memory of each index structure.',
+             estimate_size(snapshot.hash_map), {'structure': 'hash_map'})
+    # The content and hash map are counted once above, not again in
+    # every structure built from them.
+    for index in IndexRegistry.stats(chunks + (snapshot.hash_map,)):
+        labels = {'structure': index['algorithm'],
+                  'generation': index['generation']}
+        text.add('index_bytes', 'gauge',
+                 'Estimated memory of each index structure.',
+                 index['bytes'], labels)
+        text.add('index_build_seconds', 'gauge',
+                 'Time it took to build each index structure.',
+                 index['build_ms'] / 1000, labels)
+
+    if reload_scheduler is not None:
+        text.add('reloads_total', 'counter',
+                 'Reloads of the data file that published a snapshot.',
+                 reload_scheduler.reload_count)
+        text.add('reloads_incremental_total', 'counter',
+                 'Reloads that only indexed appended lines.',
+                 reload_scheduler.incremental_reloads)
+        text.add('reloads_skipped_total', 'counter',
+                 'Reloads skipped because the content was unchanged.',
+                 reload_scheduler.skipped_reloads)
+        text.add('file_events_total', 'counter',
+                 'Change events received for the data file.',
+                 reload_scheduler.events_received)
+        if reload_scheduler.last_reload_ms is not None:
+            text.add('reload_seconds', 'gauge',
+                     'Duration of the latest published reload.',
+                     reload_scheduler.last_reload_ms / 1000)
+
+    if result_cache is not None:
+        cache = result_cache.stats()
+        text.add('result_cache_entries', 'gauge',
+                 'Cached query results.', cache['entries'])
+        text.add('result_cache_bytes', 'gauge',
+                 'Estimated memory of the cached results.', cache['bytes'])
+        for name in ('hits', 'misses', 'evictions', 'invalidations'):
+            text.add(f'result_cache_{name}_total', 'counter',
+                     f'Result cache {name}.', cache[name])
+        text.add('result_cache_hit_ratio', 'gauge',
+                 'Share of lookups answered from the result cache.',
+                 cache['hit_rate'])
+
+    bloom = bloom_filter_stats()
+    if bloom:
+        text.add('bloom_filter_bytes', 'gauge',
+                 'Size of the Bloom filter.', bloom['size_bytes'])
+        text.add('bloom_filter_checks_total', 'counter',
+                 'Queries checked against the Bloom filter.',
+                 bloom['checks'])
+        text.add('bloom_filter_rejections_total', 'counter',
+                 'Queries the Bloom filter ruled out.', bloom['rejections'])
+
+    flights = single_flight.stats()
+    text.add('single_flight_in_flight', 'gauge',
+             'Distinct searches in flight.', flights['in_flight'])
+    text.add('single_flight_coalesced_total', 'counter',
+             'Queries that joined an identical search in flight.',
+             flights['coalesced'])
+
+    if registry is not None:
+        for key, algorithms in registry.query_stats().items():
+            metric_name, mode = key.rsplit('_REREAD_ON_QUERY_', 1)
+            name = f"query_{metric_name.replace('_times', '')}_seconds"
+            for algorithm, summary in algorithms.items():
+                text.add_summary(
+                    name, f'Query {metric_name} per algorithm.', summary,
+                    {'algorithm': algorithm, 'reread_on_query': mode})
+        for file_name, algorithms in registry.stage_stats().items():
+            for algorithm, stages in algorithms.items():
+                for stage, summary in stages.items():
+                    text.add_summary(
+                        'stage_seconds', 'Time per stage of a query.',
+                        summary, {'file': file_name, 'algorithm': algorithm,
+                                  'stage': stage})
+    return text.render()
+
+
+def start_admin_server(
+        admin_port: int,
+        worker_pool: Optional[WorkerPool] = None,
+        registry: Optional[MetricsRegistry] = None
+) -> Optional[AdminServer]:
+    """Serve admin_metrics() on a localhost port for scrapers.
+
+    Args:
+        admin_port (int): Port of http://127.0.0.1:<port>/metrics, 0
+        to disable the endpoint.
+        worker_pool (Optional[WorkerPool]): The search worker pool.
+        registry (Optional[MetricsRegistry]): The query metrics.
+
+    Returns:
+        Optional[AdminServer]: The running endpoint, None if disabled
+        or the port could not be bound.
+    """
+    if not admin_port:
+        return None
+    try:
+        return AdminServer(
+            admin_port,
+            functools.partial(admin_metrics, worker_pool, registry)).start()
+    except OSError as e:
+        logging.error(f"Could not start admin endpoint on {admin_port}: {e}")
+        return None
+
+
+def is_stats_command(payload: bytes, addr: Optional[tuple]) -> bool:
+    """Check whether a raw payload is the stats command of a local client.
+
+    Args:
+        payload (bytes): The raw bytes received from the client.
+        addr (Optional[tuple]): The address of the client.
+
+    Returns:
+        bool: True if the stats should be sent instead of searching.
+    """
+    if payload.rstrip(b'\x00\r\n ') != STATS_COMMAND or not addr:
+        return False
+    try:
+        return ipaddress.ip_address(addr[0]).is_loopback
+    except ValueError:
+        return False
+
+
+def stats_response(metrics_json_path: Optional[str]) -> bytes:
+    """Build the answer to the stats command.
+
+    Args:
+        metrics_json_path (Optional[str]): The metrics file whose
+        registry holds the query metrics.
+
+    Returns:
+        bytes: The percentiles per stage, algorithm and data file and
+        the cache and filter statistics as JSON.
+    """
+    registry = MetricsRegistry.for_file(metrics_json_path, ALGORITHMS_LIST)
+    return json.dumps(registry.stats(), separators=(',', ':')).encode('utf-8')
+
+
+def interrupt_on_sigterm() -> None:
+    """Handle SIGTERM like Ctrl+C, so shutdown code and the final
+    metrics flush run when the server is stopped."""
+    def interrupt(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, interrupt)
+
+
+def run_search(
+        file_path: str,
+        parsed_query: Dict[str, str],
+        reread_on_query: bool,
+        worker_pool: Optional[WorkerPool] = None,
+        timings: Optional[Dict[str, float]] = None
+) -> Tuple[Union[bool, List[bool]], Optional[float]]:
+    """Run search_in_file() inline or on the worker pool and wait for it.
+
+    Args:
+        file_path (str): The path to the file for search.
+        parsed_query (Dict[str, str]): The parsed query.
+        reread_on_query (bool): If true, the file is re-read for each query.
+        worker_pool (Optional[WorkerPool]): Pool for CPU-heavy searches,
+        None to run every search inline.
+        timings (Optional[Dict[str, float]]): Receives the stage times
+        of the search.
+
+    Returns:
+        Tuple[Union[bool, List[bool]], Optional[float]]: The search
+        result and the milliseconds it waited for a worker, if any.
+
+    Raises:
+        ServerBusyError: If the worker queue is full.
+    """
+    algorithm = parsed_query['algorithm']
+    if worker_pool is None or algorithm in INLINE_ALGORITHMS:
+        return search_in_file(
+            file_path, parsed_query, reread_on_query,
+            timings=timings), None
+
+    future, shared = submit_search(
+        file_path, parsed_query, reread_on_query, worker_pool,
+        timings=timings)
+    return future.result(), None if shared else future.queue_wait_ms
+
+
+def answer_framed_query(
+        payload: bytes,
+        file_path: str,
+        reread_on_query: bool,
+        metrics_json_path: str,
+        worker_pool: Optional[WorkerPool] = None) -> bytes:
+    """Answer a single framed query.
+
+    Every frame must get a response to keep pipelined replies in order,
+    so failures are reported to the client instead of dropping it.
+
+    Args:
+        payload (bytes): The frame payload holding the JSON query.
+        file_path (str): The path to the file for search.
+        reread_on_query (bool): If true, the file is re-read for each query.
+        metrics_json_path (str): The path to the JSON file to record metrics.
+        worker_pool (Optional[WorkerPool]): Pool for CPU-heavy searches.
+
+    Returns:
+        bytes: The response payload for the frame.
+    """
+    start_time = time.time()
+    try:
+        parse_start = time.perf_counter()
+        parsed_query = parse_query(payload)
+        stages = {'parse': (time.perf_counter() - parse_start) * 1000}
+        match_found, queue_wait_ms = run_search(
+            file_path, parsed_query, reread_on_query, worker_pool, stages)
+        record_query_metrics(start_time, parsed_query['algorithm'],
+                             reread_on_query, metrics_json_path,
+                             queue_wait_ms, file_path, stages)
+        return format_response(match_found, parsed_query.get('format'))
+    except (json.JSONDecodeError, InvalidQueryError) as e:
+        logging.error("Failed to parse query: %s", e)
+        return INVALID_QUERY_RESPONSE
+    except ServerBusyError as e:
+        logging.warning("Rejected framed query: %s", e)
+        return SERVER_BUSY_RESPONSE
+    except Exception as e:
+        logging.error("Error answering framed query: %s", e)
+        return SERVER_ERROR_RESPONSE
+
+
+def serve_framed_client(
+        conn: socket.socket,
+        initial_data: bytes,
+        file_path: str,
+        reread_on_query: bool,
+        metrics_json_path: str,
+        worker_pool: Optional[WorkerPool] = None) -> None:
+    """Answer pipelined framed queries until the client disconnects.
+
+    Responses for all frames that arrived together are written back
+    with a single sendall().
+
+    Args:
+        conn (socket.socket): The client connection socket.
+        initial_data (bytes): Bytes received after the protocol marker.
+        file_path (str): The path to the file for search.
+        reread_on_query (bool): If true, the file is re-read for each query.
+        metrics_json_path (str): The path to the JSON file to record metrics.
+        worker_pool (Optional[WorkerPool]): Pool for CPU-heavy searches.
+    """
+    frame_reader = FrameReader(conn, initial_data)
+    responses = []
+
+    while (payload := frame_reader.read_frame()) is not None:
+        responses.append(encode_frame(answer_framed_query(
+            payload, file_path, reread_on_query, metrics_json_path,
+            worker_pool)))
+
+        if not frame_reader.has_buffered_frame():
+            conn.sendall(b''.join(responses))
+            responses.clear()
+
+
 def handle_client(
         conn: socket.socket,
         addr: tuple,
         file_path: str,
         reread_on_query: bool,
         metrics_json_path: str,
-        shared_file_content: str) -> None:
+        shared_file_content: str,
+        worker_pool: Optional[WorkerPool] = None) -> None:
     """Handle incoming client requests for search operations.
 
+    Clients starting with FRAMED_PROTOCOL_MARKER keep the connection
+    open and send length-prefixed queries, others send one raw query.
+    Clients on the same host may send STATS_COMMAND instead to get the
+    metrics percentiles.
+
     Args:
         conn (socket.socket): The client connection socket.
         addr (tuple): The address of the client.
         file_path (str): The path to the file for search.
         reread_on_query (bool): If true, the file is re-read for each query.
         metrics_json_path (str): The path to the JSON file to record metrics.
+        worker_pool (Optional[WorkerPool]): Pool for CPU-heavy searches.
     """
     start_time = time.time()
-    logging.debug(f"Connected with {addr}")
+    logging.debug("Connected with %s", addr)
 
     try:
         # Receive the search query from the client.
-        query = conn.recv(PAYLOAD_SIZE).decode('utf-8').rstrip('\x00')
-        logging.debug(f"Search query received: '{query}'")
-
-        # Parse the received query from JSON format.
-        parsed_query = json.loads(query)
-
-        # Check if the search string is empty or the algorithm is invalid.
-        if not parsed_query.get('query_string') or parsed_query.get(
-                'algorithm') not in ALGORITHMS_LIST:
-            parsed_query['algorithm'] = 'default'
-            logging.debug(
-                f"Using default algorithm. REREAD_ON_QUERY: {reread_on_query}")
-        else:
-            logging.debug(
-                f"Using Custom algorithm. REREAD_ON_QUERY: {reread_on_query}")
+        stage_start = time.perf_counter()
+        payload = conn.recv(PAYLOAD_SIZE)
+        read_ms = (time.perf_counter() - stage_start) * 1000
+
+        if payload.startswith(FRAMED_PROTOCOL_MARKER):
+            serve_framed_client(
+                conn,
+                payload[len(FRAMED_PROTOCOL_MARKER):],
+                file_path,
+                reread_on_query,
+                metrics_json_path,
+                worker_pool)
+            return
+
+        if is_stats_command(payload, addr):
+            conn.sendall(stats_response(metrics_json_path))
+            return
+
+        stage_start = time.perf_counter()
+        parsed_query = parse_query(payload)
+        stages = {
+            'read': read_ms,
+            'parse': (time.perf_counter() - stage_start) * 1000,
+        }
 
         # Perform the search in the shared file content.
-        match_found = search_in_file(file_path, parsed_query, reread_on_query)
+        match_found, queue_wait_ms = run_search(
+            file_path, parsed_query, reread_on_query, worker_pool, stages)
 
         # Send the search result back to the client.
-        response = b'STRING EXISTS' if match_found else b'STRING NOT FOUND'
-        conn.sendall(response)
+        stage_start = time.perf_counter()
+        conn.sendall(format_response(match_found, parsed_query.get('format')))
+        stages['respond'] = (time.perf_counter() - stage_start) * 1000
 
         # Log execution time and save metrics.
-        exec_time = (time.time() - start_time) * 1000
-        set_metrics_data(
-            exec_time,
+        record_query_metrics(start_time, parsed_query['algorithm'],
+                             reread_on_query, metrics_json_path,
+                             queue_wait_ms, file_path, stages)
+
+    except (json.JSONDecodeError, InvalidQueryError) as e:
+        logging.error("Failed to parse query: %s", e)
+    except ServerBusyError as e:
+        logging.warning("Rejected query: %s", e)
+        conn.sendall(SERVER_BUSY_RESPONSE)
+    except Exception as e:
+        logging.error("Error handling client: %s", e)
+    finally:
+        conn.close()
+
+
+async def search_async(
+        file_path: str,
+        parsed_query: Dict[str, str],
+        reread_on_query: bool,
+        worker_pool: WorkerPool,
+        timings: Optional[Dict[str, float]] = None
+) -> Tuple[Union[bool, List[bool]], Optional[float]]:
+    """Run search_in_file() inline or on the worker pool.
+
+    Cheap lookups run directly on the event loop, anything else is
+    offloaded so a slow algorithm never stalls other clients.
+
+    Args:
+        file_path (str): The path to the file for search.
+        parsed_query (Dict[str, str]): The parsed query.
+        reread_on_query (bool): If true, the file is re-read for each query.
+        worker_pool (WorkerPool): Pool for CPU-heavy searches.
+        timings (Optional[Dict[str, float]]): Receives the stage times
+        of the search.
+
+    Returns:
+        Tuple[Union[bool, List[bool]], Optional[float]]: The search
+        result and the milliseconds it waited for a worker, if any.
+
+    Raises:
+        ServerBusyError: If the worker queue is full.
+    """
+    algorithm = parsed_query['algorithm']
+    if algorithm in INLINE_ALGORITHMS and not reread_on_query:
+        return search_in_file(
+            file_path, parsed_query, reread_on_query,
+            timings=timings), None
+
+    # The revalidation stat call is kept off the event loop.
+    future, shared = submit_search(
+        file_path, parsed_query, reread_on_query, worker_pool,
+        coalesce=not reread_on_query, timings=timings)
+    return (await asyncio.wrap_future(future),
+            None if shared else future.queue_wait_ms)
+
+
+async def serve_framed_client_async(
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        file_path: str,
+        reread_on_query: bool,
+        metrics_json_path: str,
+        worker_pool: WorkerPool,
+        metrics_executor: concurrent.futures.Executor) -> None:
+    """Answer pipelined framed queries on the event loop.
+
+    Queries are started as soon as their frame arrives, while a
+    separate responder writes the answers back in request order.
+
+    Args:
+        reader (asyncio.StreamReader): The client stream reader.
+        writer (asyncio.StreamWriter): The client stream writer.
+        file_path (str): The path to the file for search.
+        reread_on_query (bool): If true, the file is re-read for each query.
+        metrics_json_path (str): The path to the JSON file to record metrics.
+        worker_pool (WorkerPool): Pool for CPU-heavy searches.
+        metrics_executor (concurrent.futures.Executor): Single worker
+        used to serialize metrics writes off the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    pending: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_DEPTH)
+
+    async def answer(payload: bytes) -> bytes:
+        start_time = time.time()
+        parse_start = time.perf_counter()
+        try:
+            parsed_query = parse_query(payload)
+        except (json.JSONDecodeError, InvalidQueryError) as e:
+            logging.error("Failed to parse query: %s", e)
+            return INVALID_QUERY_RESPONSE
+        stages = {'parse': (time.perf_counter() - parse_start) * 1000}
+
+        try:
+            match_found, queue_wait_ms = await search_async(
+                file_path, parsed_query, reread_on_query, worker_pool,
+                stages)
+        except ServerBusyError as e:
+            logging.warning("Rejected framed query: %s", e)
+            return SERVER_BUSY_RESPONSE
+        except Exception as e:
+            logging.error("Error answering framed query: %s", e)
+            return SERVER_ERROR_RESPONSE
+
+        loop.run_in_executor(
+            metrics_executor, record_query_metrics,
+            start_time,
             parsed_query['algorithm'],
-            ALGORITHMS_LIST,
+            reread_on_query,
             metrics_json_path,
-            reread_on_query)
-        logging.debug(f"Query processed in {exec_time:.2f} ms")
+            queue_wait_ms,
+            file_path,
+            stages)
+        return format_response(match_found, parsed_query.get('format'))
 
-    except json.JSONDecodeError as e:
-        logging.error(f"Failed to parse query: {e}")
+    async def respond() -> None:
+        connection_lost = False
+        while (task := await pending.get()) is not None:
+            response = await task
+            if connection_lost:
+                continue
+            try:
+                writer.write(encode_frame(response))
+                if pending.empty():
+                    await writer.drain()
+            except ConnectionError as e:
+                logging.error("Error writing framed response: %s", e)
+                connection_lost = True
+
+    responder = asyncio.create_task(respond())
+    try:
+        while (payload := await read_frame_async(reader)) is not None:
+            await pending.put(asyncio.ensure_future(answer(payload)))
+    finally:
+        await pending.put(None)
+        await responder
+
+
+async def handle_client_async(
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        file_path: str,
+        reread_on_query: bool,
+        metrics_json_path: str,
+        worker_pool: WorkerPool,
+        metrics_executor: concurrent.futures.Executor) -> None:
+    """Handle a client connection on the asyncio event loop.
+
+    Speaks the same wire protocols as handle_client(), including
+    STATS_COMMAND for local clients. Cheap lookups
+    run inline on the loop, everything else is offloaded to the
+    worker pool so a slow algorithm never stalls other clients.
+
+    Args:
+        reader (asyncio.StreamReader): The client stream reader.
+        writer (asyncio.StreamWriter): The client stream writer.
+        file_path (str): The path to the file for search.
+        reread_on_query (bool): If true, the file is re-read for each query.
+        metrics_json_path (str): The path to the JSON file to record metrics.
+        worker_pool (WorkerPool): Pool for CPU-heavy searches.
+        metrics_executor (concurrent.futures.Executor): Single worker
+        used to serialize metrics writes off the event loop.
+    """
+    start_time = time.time()
+    loop = asyncio.get_running_loop()
+    logging.debug("Connected with %s", writer.get_extra_info('peername'))
+    connections.opened()
+
+    try:
+        stage_start = time.perf_counter()
+        first_byte = await reader.read(len(FRAMED_PROTOCOL_MARKER))
+
+        if first_byte == FRAMED_PROTOCOL_MARKER:
+            await serve_framed_client_async(
+                reader,
+                writer,
+                file_path,
+                reread_on_query,
+                metrics_json_path,
+                worker_pool,
+                metrics_executor)
+            return
+
+        payload = first_byte + await reader.read(
+            PAYLOAD_SIZE - len(first_byte))
+        read_ms = (time.perf_counter() - stage_start) * 1000
+
+        if is_stats_command(payload, writer.get_extra_info('peername')):
+            writer.write(stats_response(metrics_json_path))
+            await writer.drain()
+            return
+
+        stage_start = time.perf_counter()
+        parsed_query = parse_query(payload)
+        stages = {
+            'read': read_ms,
+            'parse': (time.perf_counter() - stage_start) * 1000,
+        }
+
+        match_found, queue_wait_ms = await search_async(
+            file_path, parsed_query, reread_on_query, worker_pool, stages)
+
+        stage_start = time.perf_counter()
+        writer.write(format_response(match_found, parsed_query.get('format')))
+        await writer.drain()
+        stages['respond'] = (time.perf_counter() - stage_start) * 1000
+
+        loop.run_in_executor(
+            metrics_executor, record_query_metrics,
+            start_time,
+            parsed_query['algorithm'],
+            reread_on_query,
+            metrics_json_path,
+            queue_wait_ms,
+            file_path,
+            stages)
+
+    except (json.JSONDecodeError, InvalidQueryError) as e:
+        logging.error("Failed to parse query: %s", e)
+    except ServerBusyError as e:
+        logging.warning("Rejected query: %s", e)
+        writer.write(SERVER_BUSY_RESPONSE)
+        await writer.drain()
     except Exception as e:
-        logging.error(f"Error handling client: {e}")
+        logging.error("Error handling client: %s", e)
+    finally:
+        connections.closed()
+        writer.close()
+
+
+def create_ssl_context(
+        use_ssl: bool,
+        ssl_certfile: Optional[str] = None,
+        ssl_keyfile: Optional[str] = None) -> Optional[ssl.SSLContext]:
+    """Build the server side SSL context if SSL is enabled.
+
+    Args:
+        use_ssl (bool): Whether to use SSL for secure connections.
+        ssl_certfile (Optional[str]): Path to the SSL certificate file.
+        ssl_keyfile (Optional[str]): Path to the SSL key file.
+
+    Returns:
+        Optional[ssl.SSLContext]: The SSL context, or None if disabled.
+
+    Raises:
+        ValueError: If SSL is enabled but the configuration is incomplete.
+    """
+    if not use_ssl:
+        return None
+    if not (ssl_certfile and ssl_keyfile):
+        raise ValueError("SSL configuration is incomplete")
+
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(certfile=ssl_certfile, keyfile=ssl_keyfile)
+    return context
+
+
+def configure_result_cache(max_entries: int, max_bytes: int) -> None:
+    """Replace the result cache of this process.
+
+    Args:
+        max_entries (int): Maximum cached query results, 0 to disable
+        the cache.
+        max_bytes (int): Maximum estimated memory of the cached results.
+    """
+    global result_cache
+    result_cache = (ResultCache(max_entries, max_bytes)
+                    if max_entries > 0 else None)
+
+
+def prepare_shared_data(
+        data_file_path: str,
+        reread_on_query_config_path: Optional[str],
+        prebuild_algorithms: Optional[List[str]] = None,
+        reload_quiet_window: float = 0.2,
+        incremental_reload: bool = True,
+        on_reload: Optional[Callable[[FileSnapshot], None]] = None,
+        index_snapshot_dir: Optional[str] = None,
+        packed_keys: bool = False,
+        bloom_filter_fpr: Optional[float] = None,
+        result_cache_entries: int = 0,
+        result_cache_bytes: int = 16 * 1024 * 1024,
+        out_of_core: bool = False,
+        out_of_core_chunk_bytes: int = 32 * 1024 * 1024) -> bool:
+    """Preload the data file and start watching it for changes.
+
+    Args:
+        data_file_path (str): The file path used for search operations.
+        reread_on_query_config_path (Optional[str]): Path to the
+        configuration file for re-reading settings.
+        prebuild_algorithms (Optional[List[str]]): Algorithms whose
+        search structures are built before serving queries.
+        reload_quiet_window (float): Seconds without file events
+        before the file is reloaded.
+        incremental_reload (bool): Index only appended lines when
+        the file just grew.
+        on_reload (Optional[Callable[[FileSnapshot], None]]): Called
+        with every snapshot after it is published.
+        index_snapshot_dir (Optional[str]): Directory where the index
+        is persisted and loaded from at startup, None to disable.
+        packed_keys (bool): Index lines in the record format as packed
+        integer keys.
+        bloom_filter_fpr (Optional[float]): False positive rate of the
+        Bloom filter checked before searching, None to disable.
+        result_cache_entries (int): Maximum cached query results, 0 to
+        disable the cache.
+        result_cache_bytes (int): Maximum estimated memory of the
+        cached results.
+        out_of_core (bool): Answer queries from a sorted index file
+        instead of loading the data file into memory.
+        out_of_core_chunk_bytes (int): Bytes of the data file sorted
+        in memory at a time when building the index file.
+
+    Returns:
+        bool: The reread_on_query setting for the data file.
+    """
+    global reload_scheduler
+    if out_of_core:
+        # Built from the content, which is never in memory.
+        bloom_filter_fpr = None
+    FileServer.packed_keys = packed_keys
+    SearchEngine.bloom_filter_fpr = bloom_filter_fpr
+    configure_result_cache(result_cache_entries, result_cache_bytes)
+
+    # Load re-read on query configuration.
+    reread_on_query = load_reread_on_query_config(
+        reread_on_query_config_path, data_file_path)
+
+    # Preload file data from the source file
+    # in this case 200k.txt at start up,
+    # since event handlers will check for any file changes,
+    # and read file data again, data is loading to
+    # FileServer snapshot that is accessible in
+    # all FileServer instances. The scheduler remembers
+    # the checksum, so unchanged content is not reloaded.
+    scheduler = ReloadScheduler(
+        data_file_path, prebuild_algorithms, reload_quiet_window,
+        incremental_reload, on_reload,
+        index_snapshot_path(index_snapshot_dir, data_file_path)
+        if index_snapshot_dir and not out_of_core else None,
+        external_index_path(
+            index_snapshot_dir
+            or os.path.dirname(os.path.abspath(data_file_path)),
+            data_file_path) if out_of_core else None,
+        out_of_core_chunk_bytes)
+    scheduler.reload_now()
+    reload_scheduler = scheduler
+
+    # Start file monitoring in a separate thread.
+    monitor_thread = threading.Thread(
+        target=monitor_file, args=(
+            data_file_path, scheduler))
+    # Ensure thread exits when the main program exits
+    monitor_thread.daemon = True
+    monitor_thread.start()
+
+    return reread_on_query
+
+
+def raise_open_file_limit() -> None:
+    """Raise the soft open file limit to the hard limit.
+
+    Every client connection holds a file descriptor, so the default
+    soft limit (often 1024) caps the number of concurrent clients.
+    """
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError) as e:
+            logging.debug("DEBUG: Could not raise open file limit: %s", e)
+
+
+def reject_connection(conn: socket.socket) -> None:
+    """Tell a client the server is busy and close its connection.
+
+    Args:
+        conn (socket.socket): The client connection socket.
+    """
+    try:
+        conn.sendall(SERVER_BUSY_RESPONSE)
+    except OSError as e:
+        logging.debug("DEBUG: Could not send busy response: %s", e)
     finally:
         conn.close()
 
 
+def serve_connection(connection_slots: threading.Semaphore,
+                     *args) -> None:
+    """Run handle_client() and free the connection slot afterwards.
+
+    Args:
+        connection_slots (threading.Semaphore): Slot held by the client.
+        *args: Arguments passed to handle_client().
+    """
+    try:
+        handle_client(*args)
+    finally:
+        connections.closed()
+        connection_slots.release()
+
+
+def create_server_socket(
+        host: str,
+        port: int,
+        use_ssl: bool,
+        ssl_certfile: Optional[str] = None,
+        ssl_keyfile: Optional[str] = None,
+        reuse_port: bool = False) -> socket.socket:
+    """Create the listening TCP socket, wrapped in SSL if enabled.
+
+    Args:
+        host (str): Host IP address.
+        port (int): Port number to listen on.
+        use_ssl (bool): Whether to use SSL for secure connections.
+        ssl_certfile (Optional[str]): Path to the SSL certificate file.
+        ssl_keyfile (Optional[str]): Path to the SSL key file.
+        reuse_port (bool): Set SO_REUSEPORT so several processes can
+        listen on the same port and the kernel spreads connections.
+
+    Returns:
+        socket.socket: The listening socket.
+
+    Raises:
+        ValueError: If reuse_port is not supported on this platform.
+    """
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if reuse_port:
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            server_socket.close()
+            raise ValueError("SO_REUSEPORT is not supported")
+        server_socket.setsockopt(
+            socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    server_socket.bind((host, port))
+    server_socket.listen()
+    logging.info("Server running on %s:%s", host, port)
+
+    context = create_ssl_context(use_ssl, ssl_certfile, ssl_keyfile)
+    if context:
+        server_socket = context.wrap_socket(
+            server_socket, server_side=True)
+    return server_socket
+
+
+def accept_connections(
+        server_socket: socket.socket,
+        data_file_path: str,
+        reread_on_query: bool,
+        metrics_json_path: Optional[str],
+        worker_pool: WorkerPool,
+        max_connections: int) -> None:
+    """Accept clients forever, serving each on its own thread.
+
+    Args:
+        server_socket (socket.socket): The listening socket.
+        data_file_path (str): The file path used for search operations.
+        reread_on_query (bool): If true, the file is re-read for each query.
+        metrics_json_path (Optional[str]): Path to the JSON file
+        for saving metrics.
+        worker_pool (WorkerPool): Pool for CPU-heavy searches.
+        max_connections (int): Maximum concurrently served connections.
+    """
+    connection_slots = threading.BoundedSemaphore(max_connections)
+
+    # Main loop to accept client connections.
+    while True:
+        conn, addr = server_socket.accept()
+        logging.debug("DEBUG: Connection established with %s", addr)
+
+        if not connection_slots.acquire(blocking=False):
+            logging.warning("Rejected connection from %s", addr)
+            connections.reject()
+            reject_connection(conn)
+            continue
+        connections.opened()
+
+        # Start a new thread to handle the client's search query.
+        client_thread = threading.Thread(
+            target=serve_connection,
+            args=(
+                connection_slots,
+                conn,
+                addr,
+                data_file_path,
+                reread_on_query,
+                metrics_json_path,
+                shared_file_content,
+                worker_pool))
+        client_thread.start()
+
+
 def start_server(
         host: str,
         port: int,
@@ -190,9 +1321,29 @@ def start_server(
         ssl_certfile: Optional[str] = None,
         ssl_keyfile: Optional[str] = None,
         reread_on_query_config_path: Optional[str] = None,
-        metrics_json_path: Optional[str] = None) -> None:
+        metrics_json_path: Optional[str] = None,
+        prebuild_algorithms: Optional[List[str]] = None,
+        reload_quiet_window: float = 0.2,
+        incremental_reload: bool = True,
+        executor_workers: int = 4,
+        queue_depth: int = 256,
+        algorithm_limits: Optional[Dict[str, int]] = None,
+        max_connections: int = 1024,
+        index_snapshot_dir: Optional[str] = None,
+        packed_keys: bool = False,
+        bloom_filter_fpr: Optional[float] = None,
+        result_cache_entries: int = 0,
+        result_cache_bytes: int = 16 * 1024 * 1024,
+        metrics_flush_interval: float = 5.0,
+        admin_port: int = 0,
+        out_of_core: bool = False,
+        out_of_core_chunk_bytes: int = 32 * 1024 * 1024) -> None:
     """Start the TCP server that listens for search queries.
 
+    Each connection gets its own thread for I/O while searches run on
+    a bounded worker pool. Connections beyond max_connections and
+    queries beyond the pool's queue are answered with SERVER BUSY.
+
     Args:
         host (str): Host IP address.
         port (int): Port number to listen on.
@@ -204,90 +1355,536 @@ def start_server(
         configuration file for re-reading settings.
         metrics_json_path (Optional[str]): Path to the JSON file
         for saving metrics.
+        prebuild_algorithms (Optional[List[str]]): Algorithms whose
+        search structures are built before serving queries.
+        reload_quiet_window (float): Seconds without file events
+        before the file is reloaded.
+        incremental_reload (bool): Index only appended lines when
+        the file just grew.
+        executor_workers (int): Number of search worker threads.
+        queue_depth (int): Maximum queries waiting for a worker.
+        algorithm_limits (Optional[Dict[str, int]]): Maximum workers
+        each listed algorithm may use at once.
+        max_connections (int): Maximum concurrently served connections.
+        index_snapshot_dir (Optional[str]): Directory where the index
+        is persisted and loaded from at startup, None to disable.
+        packed_keys (bool): Index lines in the record format as packed
+        integer keys.
+        bloom_filter_fpr (Optional[float]): False positive rate of the
+        Bloom filter checked before searching, None to disable.
+        result_cache_entries (int): Maximum cached query results, 0 to
+        disable the cache.
+        result_cache_bytes (int): Maximum estimated memory of the
+        cached results.
+        metrics_flush_interval (float): Seconds between metrics file
+        writes.
+        admin_port (int): Localhost port of the Prometheus admin
+        endpoint, 0 to disable it.
+        out_of_core (bool): Answer queries from a sorted index file
+        instead of loading the data file into memory.
+        out_of_core_chunk_bytes (int): Bytes of the data file sorted
+        in memory at a time when building the index file.
     """
     try:
-        # Set up the TCP socket.
-        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server_socket.bind((host, port))
-        server_socket.listen()
-        logging.debug(f"DEBUG: Server running on {host}:{port}")
-
-        if use_ssl:
-            if ssl_certfile and ssl_keyfile:
-                context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
-                context.load_cert_chain(
-                    certfile=ssl_certfile, keyfile=ssl_keyfile)
-                server_socket = context.wrap_socket(
-                    server_socket, server_side=True)
-            else:
-                raise ValueError("SSL configuration is incomplete")
-
-        # Load re-read on query configuration.
-        reread_on_query = load_reread_on_query_config(
-            reread_on_query_config_path, data_file_path)
-
-        # Preload file data from the source file
-        # in this case 200k.txt at start up and
-        # passing it to handle_client() since
-        # event handlers will check for any file changes,
-        # and read file data again, data is loading to
-        # FileServer class object that is accessible in
-        # all FileServer instances.
-        file_preloader = DataPreloader()
-        shared_file_content = file_preloader.preload_file_data(data_file_path)
-
-        # Start file monitoring in a separate thread.
-        monitor_thread = threading.Thread(
-            target=monitor_file, args=(
-                data_file_path,))
-        # Ensure thread exits when the main program exits
-        monitor_thread.daemon = True
-        monitor_thread.start()
-
-        # Main loop to accept client connections.
-        while True:
-            conn, addr = server_socket.accept()
-            logging.debug(f"DEBUG: Connection established with {addr}")
-
-            # Start a new thread to handle the client's search query.
-            client_thread = threading.Thread(
-                target=handle_client,
-                args=(
-                    conn,
-                    addr,
-                    data_file_path,
-                    reread_on_query,
-                    metrics_json_path,
-                    shared_file_content))
-            client_thread.start()
+        server_socket = create_server_socket(
+            host, port, use_ssl, ssl_certfile, ssl_keyfile)
+
+        reread_on_query = prepare_shared_data(
+            data_file_path, reread_on_query_config_path,
+            prebuild_algorithms, reload_quiet_window, incremental_reload,
+            index_snapshot_dir=index_snapshot_dir,
+            packed_keys=packed_keys,
+            bloom_filter_fpr=bloom_filter_fpr,
+            result_cache_entries=result_cache_entries,
+            result_cache_bytes=result_cache_bytes,
+            out_of_core=out_of_core,
+            out_of_core_chunk_bytes=out_of_core_chunk_bytes)
+        registry = start_metrics(metrics_json_path, metrics_flush_interval)
+
+        worker_pool = WorkerPool(
+            executor_workers, queue_depth, algorithm_limits)
+        start_admin_server(admin_port, worker_pool, registry)
+        accept_connections(
+            server_socket, data_file_path, reread_on_query,
+            metrics_json_path, worker_pool, max_connections)
 
     except ValueError as e:
-        logging.debug(f"DEBUG: ValueError while starting server: {e}")
+        logging.error(f"ValueError while starting server: {e}")
     except Exception as e:
-        logging.debug(f"DEBUG: Unexpected error: {e}")
+        logging.error(f"Unexpected error: {e}")
     finally:
         if 'server_socket' in locals():
             server_socket.close()
             logging.debug("DEBUG: Server socket closed.")
 
 
+def prefork_worker(
+        host: str,
+        port: int,
+        pointer_name: str,
+        data_file_path: str,
+        reread_on_query: bool,
+        use_ssl: bool,
+        ssl_certfile: Optional[str],
+        ssl_keyfile: Optional[str],
+        metrics_json_path: Optional[str],
+        executor_workers: int,
+        queue_depth: int,
+        algorithm_limits: Optional[Dict[str, int]],
+        max_connections: int,
+        bloom_filter_fpr: Optional[float] = None,
+        result_cache_entries: int = 0,
+        result_cache_bytes: int = 16 * 1024 * 1024,
+        metrics_flush_interval: float = 5.0,
+        admin_port: int = 0,
+        log_config: Optional[Dict[str, Any]] = None) -> None:
+    """Serve clients in a pre-forked worker process.
+
+    The worker binds the shared port with SO_REUSEPORT and answers
+    default lookups from the supervisor's shared memory index, so the
+    index is not copied into every process.
+
+    Args:
+        host (str): Host IP address.
+        port (int): Port number to listen on.
+        pointer_name (str): Name of the supervisor's index pointer.
+        data_file_path (str): The file path used for search operations.
+        reread_on_query (bool): If true, the file is re-read for each query.
+        use_ssl (bool): Whether to use SSL for secure connections.
+        ssl_certfile (Optional[str]): Path to the SSL certificate file.
+        ssl_keyfile (Optional[str]): Path to the SSL key file.
+        metrics_json_path (Optional[str]): Path to the JSON file
+        for saving metrics.
+        executor_workers (int): Number of search worker threads.
+        queue_depth (int): Maximum queries waiting for a worker.
+        algorithm_limits (Optional[Dict[str, int]]): Maximum workers
+        each listed algorithm may use at once.
+        max_connections (int): Maximum concurrently served connections.
+        bloom_filter_fpr (Optional[float]): False positive rate of the
+        Bloom filter checked before searching, None to disable.
+        result_cache_entries (int): Maximum cached query results, 0 to
+        disable the cache.
+        result_cache_bytes (int): Maximum estimated memory of the
+        cached results.
+        metrics_flush_interval (float): Seconds between metrics file
+        writes.
+        admin_port (int): Localhost port of the Prometheus admin
+        endpoint, 0 to disable it.
+        log_config (Optional[Dict[str, Any]]): Arguments of
+        configure_logging(), spawned workers start unconfigured.
+    """
+    configure_logging(**(log_config or {}))
+    # The supervisor stops workers with SIGTERM, which would skip
+    # the final metrics flush.
+    interrupt_on_sigterm()
+    registry = start_metrics(metrics_json_path, metrics_flush_interval)
+    try:
+        SearchEngine.bloom_filter_fpr = bloom_filter_fpr
+        configure_result_cache(result_cache_entries, result_cache_bytes)
+        SharedIndexFollower(pointer_name, data_file_path).start()
+        server_socket = create_server_socket(
+            host, port, use_ssl, ssl_certfile, ssl_keyfile, reuse_port=True)
+        worker_pool = WorkerPool(
+            executor_workers, queue_depth, algorithm_limits)
+        start_admin_server(admin_port, worker_pool, registry)
+        accept_connections(
+            server_socket, data_file_path, reread_on_query,
+            metrics_json_path, worker_pool, max_connections)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Spawned processes exit without running atexit handlers.
+        registry.close()
+
+
+def start_prefork_server(
+        host: str,
+        port: int,
+        data_file_path: str,
+        use_ssl: bool,
+        ssl_certfile: Optional[str] = None,
+        ssl_keyfile: Optional[str] = None,
+        reread_on_query_config_path: Optional[str] = None,
+        metrics_json_path: Optional[str] = None,
+        prebuild_algorithms: Optional[List[str]] = None,
+        reload_quiet_window: float = 0.2,
+        incremental_reload: bool = True,
+        executor_workers: int = 4,
+        queue_depth: int = 256,
+        algorithm_limits: Optional[Dict[str, int]] = None,
+        max_connections: int = 1024,
+        prefork_workers: int = 4,
+        index_snapshot_dir: Optional[str] = None,
+        packed_keys: bool = False,
+        bloom_filter_fpr: Optional[float] = None,
+        result_cache_entries: int = 0,
+        result_cache_bytes: int = 16 * 1024 * 1024,
+        metrics_flush_interval: float = 5.0,
+        admin_port: int = 0,
+        log_config: Optional[Dict[str, Any]] = None) -> None:
+    """Start worker processes sharing the port and one in-memory index.
+
+    The supervisor watches the data file, publishes every reload as a
+    shared memory index the workers switch to, and restarts workers
+    that die.
+
+    Args:
+        host (str): Host IP address.
+        port (int): Port number to listen on.
+        data_file_path (str): The file path used for search operations.
+        use_ssl (bool): Whether to use SSL for secure connections.
+        ssl_certfile (Optional[str]): Path to the SSL certificate file.
+        ssl_keyfile (Optional[str]): Path to the SSL key file.
+        reread_on_query_config_path (Optional[str]): Path to the
+        configuration file for re-reading settings.
+        metrics_json_path (Optional[str]): Path to the JSON file
+        for saving metrics.
+        prebuild_algorithms (Optional[List[str]]): Algorithms whose
+        search structures are built before serving queries.
+        reload_quiet_window (float): Seconds without file events
+        before the file is reloaded.
+        incremental_reload (bool): Index only appended lines when
+        the file just grew.
+        executor_workers (int): Search worker threads per process.
+        queue_depth (int): Maximum queries waiting for a worker.
+        algorithm_limits (Optional[Dict[str, int]]): Maximum workers
+        each listed algorithm may use at once.
+        max_connections (int): Maximum connections per process.
+        prefork_workers (int): Number of worker processes.
+        index_snapshot_dir (Optional[str]): Directory where the index
+        is persisted and loaded from at startup, None to disable.
+        packed_keys (bool): Index lines in the record format as packed
+        integer keys.
+        bloom_filter_fpr (Optional[float]): False positive rate of the
+        Bloom filter checked before searching, None to disable.
+        result_cache_entries (int): Maximum cached query results, 0 to
+        disable the cache.
+        result_cache_bytes (int): Maximum estimated memory of the
+        cached results.
+        metrics_flush_interval (float): Seconds between metrics file
+        writes.
+        admin_port (int): Localhost port of the Prometheus admin
+        endpoint, 0 to disable it.
+        log_config (Optional[Dict[str, Any]]): Arguments of
+        configure_logging() for the worker processes.
+    """
+    publisher = SharedIndexPublisher()
+    # Spawned workers start clean instead of inheriting the
+    # supervisor's threads and its private copy of the file.
+    mp_context = multiprocessing.get_context('spawn')
+    workers: List[multiprocessing.Process] = []
+
+    try:
+        reread_on_query = prepare_shared_data(
+            data_file_path, reread_on_query_config_path,
+            prebuild_algorithms, reload_quiet_window, incremental_reload,
+            on_reload=publisher.publish,
+            index_snapshot_dir=index_snapshot_dir,
+            packed_keys=packed_keys)
+        # The supervisor reports reloads and the shared index, worker
+        # i its own connections and queries on admin_port + 1 + i.
+        start_admin_server(admin_port)
+
+        def start_worker(index: int) -> multiprocessing.Process:
+            # Filters hash with the per-process string hash, every
+            # worker builds its own. Each worker also flushes its own
+            # metrics file, so they do not overwrite each other.
+            worker = mp_context.Process(
+                target=prefork_worker, args=(
+                    host, port, publisher.pointer_name, data_file_path,
+                    reread_on_query, use_ssl, ssl_certfile, ssl_keyfile,
+                    worker_metrics_path(metrics_json_path, index),
+                    executor_workers, queue_depth, algorithm_limits,
+                    max_connections, bloom_filter_fpr,
+                    result_cache_entries, result_cache_bytes,
+                    metrics_flush_interval,
+                    admin_port + 1 + index if admin_port else 0,
+                    log_config),
+                daemon=True)
+            worker.start()
+            return worker
+
+        workers.extend(start_worker(i) for i in range(prefork_workers))
+        logging.info(
+            "Started %d workers on %s:%s", prefork_workers, host, port)
+
+        # Restart workers that died.
+        while True:
+            time.sleep(1)
+            for i, worker in enumerate(workers):
+                if not worker.is_alive():
+                    logging.warning(
+                        "Worker %s exited with %s, restarting",
+                        worker.pid, worker.exitcode)
+                    workers[i] = start_worker(i)
+
+    except ValueError as e:
+        logging.error(f"ValueError while starting server: {e}")
+    except KeyboardInterrupt:
+        logging.debug("DEBUG: Shutting down workers")
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+        publisher.close()
+
+
+async def serve_async(
+        host: str,
+        port: int,
+        data_file_path: str,
+        reread_on_query: bool,
+        context: Optional[ssl.SSLContext],
+        metrics_json_path: Optional[str],
+        worker_pool: WorkerPool,
+        listen_backlog: int) -> None:
+    """Run the asyncio TCP server until it is cancelled.
+
+    Args:
+        host (str): Host IP address.
+        port (int): Port number to listen on.
+        data_file_path (str): The file path used for search operations.
+        reread_on_query (bool): If true, the file is re-read for each query.
+        context (Optional[ssl.SSLContext]): SSL context, None for plain TCP.
+        metrics_json_path (Optional[str]): Path to the JSON file
+        for saving metrics.
+        worker_pool (WorkerPool): Pool for CPU-heavy searches.
+        listen_backlog (int): Maximum queued connections on the socket.
+    """
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=1) as metrics_executor:
+        client_handler = functools.partial(
+            handle_client_async,
+            file_path=data_file_path,
+            reread_on_query=reread_on_query,
+            metrics_json_path=metrics_json_path,
+            worker_pool=worker_pool,
+            metrics_executor=metrics_executor)
+        server = await asyncio.start_server(
+            client_handler, host, port,
+            ssl=context, backlog=listen_backlog)
+        logging.info("Async server running on %s:%s", host, port)
+
+        async with server:
+            await server.serve_forever()
+
+
+def start_async_server(
+        host: str,
+        port: int,
+        data_file_path: str,
+        use_ssl: bool,
+        ssl_certfile: Optional[str] = None,
+        ssl_keyfile: Optional[str] = None,
+        reread_on_query_config_path: Optional[str] = None,
+        metrics_json_path: Optional[str] = None,
+        executor_workers: int = 4,
+        listen_backlog: int = 4096,
+        prebuild_algorithms: Optional[List[str]] = None,
+        reload_quiet_window: float = 0.2,
+        incremental_reload: bool = True,
+        queue_depth: int = 256,
+        algorithm_limits: Optional[Dict[str, int]] = None,
+        index_snapshot_dir: Optional[str] = None,
+        packed_keys: bool = False,
+        bloom_filter_fpr: Optional[float] = None,
+        result_cache_entries: int = 0,
+        result_cache_bytes: int = 16 * 1024 * 1024,
+        metrics_flush_interval: float = 5.0,
+        admin_port: int = 0,
+        out_of_core: bool = False,
+        out_of_core_chunk_bytes: int = 32 * 1024 * 1024) -> None:
+    """Start the asyncio based TCP server that listens for search queries.
+
+    Serves every connection from a single event loop instead of a
+    thread per connection, so memory stays flat as clients grow.
+
+    Args:
+        host (str): Host IP address.
+        port (int): Port number to listen on.
+        data_file_path (str): The file path used for search operations.
+        use_ssl (bool): Whether to use SSL for secure connections.
+        ssl_certfile (Optional[str]): Path to the SSL certificate file.
+        ssl_keyfile (Optional[str]): Path to the SSL key file.
+        reread_on_query_config_path (Optional[str]): Path to the
+        configuration file for re-reading settings.
+        metrics_json_path (Optional[str]): Path to the JSON file
+        for saving metrics.
+        executor_workers (int): Size of the pool for CPU-heavy searches.
+        listen_backlog (int): Maximum queued connections on the socket.
+        prebuild_algorithms (Optional[List[str]]): Algorithms whose
+        search structures are built before serving queries.
+        reload_quiet_window (float): Seconds without file events
+        before the file is reloaded.
+        incremental_reload (bool): Index only appended lines when
+        the file just grew.
+        queue_depth (int): Maximum queries waiting for a worker.
+        algorithm_limits (Optional[Dict[str, int]]): Maximum workers
+        each listed algorithm may use at once.
+        index_snapshot_dir (Optional[str]): Directory where the index
+        is persisted and loaded from at startup, None to disable.
+        packed_keys (bool): Index lines in the record format as packed
+        integer keys.
+        bloom_filter_fpr (Optional[float]): False positive rate of the
+        Bloom filter checked before searching, None to disable.
+        result_cache_entries (int): Maximum cached query results, 0 to
+        disable the cache.
+        result_cache_bytes (int): Maximum estimated memory of the
+        cached results.
+        metrics_flush_interval (float): Seconds between metrics file
+        writes.
+        admin_port (int): Localhost port of the Prometheus admin
+        endpoint, 0 to disable it.
+        out_of_core (bool): Answer queries from a sorted index file
+        instead of loading the data file into memory.
+        out_of_core_chunk_bytes (int): Bytes of the data file sorted
+        in memory at a time when building the index file.
+    """
+    try:
+        context = create_ssl_context(use_ssl, ssl_certfile, ssl_keyfile)
+        reread_on_query = prepare_shared_data(
+            data_file_path, reread_on_query_config_path,
+            prebuild_algorithms, reload_quiet_window, incremental_reload,
+            index_snapshot_dir=index_snapshot_dir,
+            packed_keys=packed_keys,
+            bloom_filter_fpr=bloom_filter_fpr,
+            result_cache_entries=result_cache_entries,
+            result_cache_bytes=result_cache_bytes,
+            out_of_core=out_of_core,
+            out_of_core_chunk_bytes=out_of_core_chunk_bytes)
+        registry = start_metrics(metrics_json_path, metrics_flush_interval)
+        raise_open_file_limit()
+        worker_pool = WorkerPool(
+            executor_workers, queue_depth, algorithm_limits)
+        start_admin_server(admin_port, worker_pool, registry)
+
+        asyncio.run(serve_async(
+            host,
+            port,
+            data_file_path,
+            reread_on_query,
+            context,
+            metrics_json_path,
+            worker_pool,
+            listen_backlog))
+
+    except ValueError as e:
+        logging.error(f"ValueError while starting server: {e}")
+    except Exception as e:
+        logging.error(f"Unexpected error: {e}")
+
+
 if __name__ == "__main__":
     config_file = get_config_path('config.ini')
     settings = read_config(config_file)
     file_path = settings['file_path']
 
+    log_config = {
+        'level': settings['log_level'],
+        'log_file': settings['log_file'],
+        'use_queue': settings['log_queue'],
+        'query_sample_rate': settings['query_log_sample_rate'],
+    }
+    configure_logging(**log_config)
+
     if not file_path or not os.path.exists(file_path):
-        logging.debug(
-            f"DEBUG: File path '{file_path}' not found or does not exist.")
+        logging.error(
+            f"File path '{file_path}' not found or does not exist.")
         exit(1)
 
-    start_server(
-        '0.0.0.0',
-        44445,
-        file_path,
-        use_ssl=settings['use_ssl'],
-        ssl_certfile=settings['ssl_certfile'],
-        ssl_keyfile=settings['ssl_keyfile'],
-        reread_on_query_config_path=settings['reread_on_query_config'],
-        metrics_json_path=settings["metrics_path"]
-    )
+    if settings['out_of_core'] and settings['server_mode'] == 'prefork':
+        # Workers are handed the loaded content in shared memory.
+        logging.error("out_of_core is not available in prefork mode.")
+        exit(1)
+
+    bloom_filter_fpr = (settings['bloom_filter_fpr']
+                        if settings['bloom_filter'] else None)
+    # Stopping the service flushes the metrics and logs the stage
+    # percentiles.
+    interrupt_on_sigterm()
+
+    if settings['server_mode'] == 'async':
+        start_async_server(
+            '0.0.0.0',
+            44445,
+            file_path,
+            use_ssl=settings['use_ssl'],
+            ssl_certfile=settings['ssl_certfile'],
+            ssl_keyfile=settings['ssl_keyfile'],
+            reread_on_query_config_path=settings['reread_on_query_config'],
+            metrics_json_path=settings["metrics_path"],
+            executor_workers=settings['executor_workers'],
+            listen_backlog=settings['listen_backlog'],
+            prebuild_algorithms=settings['prebuild_algorithms'],
+            reload_quiet_window=settings['reload_quiet_window_ms'] / 1000,
+            incremental_reload=settings['incremental_reload'],
+            queue_depth=settings['queue_depth'],
+            algorithm_limits=settings['algorithm_limits'],
+            index_snapshot_dir=settings['index_snapshot_dir'],
+            packed_keys=settings['packed_keys'],
+            bloom_filter_fpr=bloom_filter_fpr,
+            result_cache_entries=settings['result_cache_entries'],
+            result_cache_bytes=settings['result_cache_bytes'],
+            metrics_flush_interval=settings[
+                'metrics_flush_interval_ms'] / 1000,
+            admin_port=settings['admin_port'],
+            out_of_core=settings['out_of_core'],
+            out_of_core_chunk_bytes=settings['out_of_core_chunk_bytes']
+        )
+    elif settings['server_mode'] == 'prefork':
+        start_prefork_server(
+            '0.0.0.0',
+            44445,
+            file_path,
+            use_ssl=settings['use_ssl'],
+            ssl_certfile=settings['ssl_certfile'],
+            ssl_keyfile=settings['ssl_keyfile'],
+            reread_on_query_config_path=settings['reread_on_query_config'],
+            metrics_json_path=settings["metrics_path"],
+            prebuild_algorithms=settings['prebuild_algorithms'],
+            reload_quiet_window=settings['reload_quiet_window_ms'] / 1000,
+            incremental_reload=settings['incremental_reload'],
+            executor_workers=settings['executor_workers'],
+            queue_depth=settings['queue_depth'],
+            algorithm_limits=settings['algorithm_limits'],
+            max_connections=settings['max_connections'],
+            prefork_workers=settings['prefork_workers'],
+            index_snapshot_dir=settings['index_snapshot_dir'],
+            packed_keys=settings['packed_keys'],
+            bloom_filter_fpr=bloom_filter_fpr,
+            result_cache_entries=settings['result_cache_entries'],
+            result_cache_bytes=settings['result_cache_bytes'],
+            metrics_flush_interval=settings[
+                'metrics_flush_interval_ms'] / 1000,
+            admin_port=settings['admin_port'],
+            log_config=log_config
+        )
+    else:
+        start_server(
+            '0.0.0.0',
+            44445,
+            file_path,
+            use_ssl=settings['use_ssl'],
+            ssl_certfile=settings['ssl_certfile'],
+            ssl_keyfile=settings['ssl_keyfile'],
+            reread_on_query_config_path=settings['reread_on_query_config'],
+            metrics_json_path=settings["metrics_path"],
+            prebuild_algorithms=settings['prebuild_algorithms'],
+            reload_quiet_window=settings['reload_quiet_window_ms'] / 1000,
+            incremental_reload=settings['incremental_reload'],
+            executor_workers=settings['executor_workers'],
+            queue_depth=settings['queue_depth'],
+            algorithm_limits=settings['algorithm_limits'],
+            max_connections=settings['max_connections'],
+            index_snapshot_dir=settings['index_snapshot_dir'],
+            packed_keys=settings['packed_keys'],
+            bloom_filter_fpr=bloom_filter_fpr,
+            result_cache_entries=settings['result_cache_entries'],
+            result_cache_bytes=settings['result_cache_bytes'],
+            metrics_flush_interval=settings[
+                'metrics_flush_interval_ms'] / 1000,
+            admin_port=settings['admin_port'],
+            out_of_core=settings['out_of_core'],
+            out_of_core_chunk_bytes=settings['out_of_core_chunk_bytes']
+        )
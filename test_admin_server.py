@@ -0,0 +1,51 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from lib.admin_server import AdminServer, PrometheusText
+
+
+def test_prometheus_text_groups_samples_by_metric():
+    text = PrometheusText()
+    text.add('index_bytes', 'gauge', 'Index memory.', 10,
+             {'structure': 'hash_map'})
+    text.add('reloads_total', 'counter', 'Reloads.', 2)
+    text.add('index_bytes', 'gauge', 'Index memory.', 20,
+             {'structure': 'say "hi"\\'})
+    text.add('unused', 'gauge', 'Never set.', None)
+    text.add_summary('stage_seconds', 'Stage time.', {
+        'count': 4, 'sum_ms': 10.0, 'p50_ms': 2.0, 'p90_ms': 4.0,
+        'p99_ms': 4.0, 'p999_ms': None}, {'stage': 'search'})
+
+    assert text.render().splitlines() == [
+        '# HELP search_server_index_bytes Index memory.',
+        '# TYPE search_server_index_bytes gauge',
+        'search_server_index_bytes{structure="hash_map"} 10.0',
+        'search_server_index_bytes{structure="say \\"hi\\"\\\\"} 20.0',
+        '# HELP search_server_reloads_total Reloads.',
+        '# TYPE search_server_reloads_total counter',
+        'search_server_reloads_total 2.0',
+        '# HELP search_server_stage_seconds Stage time.',
+        '# TYPE search_server_stage_seconds summary',
+        'search_server_stage_seconds{stage="search",quantile="0.5"} 0.002',
+        'search_server_stage_seconds{stage="search",quantile="0.9"} 0.004',
+        'search_server_stage_seconds{stage="search",quantile="0.99"} 0.004',
+        'search_server_stage_seconds_sum{stage="search"} 0.01',
+        'search_server_stage_seconds_count{stage="search"} 4.0',
+    ]
+
+
+def test_admin_server_serves_metrics_on_localhost():
+    server = AdminServer(0, lambda: 'search_server_up 1.0\n').start()
+    try:
+        url = f"http://127.0.0.1:{server.port}"
+        with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+            assert response.read() == b'search_server_up 1.0\n'
+            assert response.headers['Content-Type'].startswith(
+                'text/plain; version=0.0.4')
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{url}/other", timeout=5)
+    finally:
+        server.close()
+    assert server.server_address[0] == '127.0.0.1'
@@ -0,0 +1,43 @@
+import pytest
+
+from lib.file_server import FileServer
+from lib.index_registry import IndexRegistry
+from metrics.benchmark import load_algorithms, run_benchmark
+
+
+@pytest.fixture(autouse=True)
+def restore_file_server(monkeypatch):
+    # The benchmark publishes its own files
+    monkeypatch.setattr(FileServer, '_snapshot', FileServer._snapshot)
+    IndexRegistry.clear()
+    yield
+    IndexRegistry.clear()
+
+
+def test_benchmark_separates_builds_hits_and_misses(tmp_path):
+    algorithms = ['default', 'binary', 'hash_table']
+    assert set(algorithms) <= set(load_algorithms())
+    report = run_benchmark([500, 1000], algorithms, str(tmp_path),
+                           queries=20, seed=7, trials=2)
+
+    assert report['environment']['python']
+    assert [entry['lines'] for entry in report['files']] == [500, 1000]
+    assert report['files'][0]['sorted_index_ms'] is not None
+    assert len(report['results']) == 2 * len(algorithms) * 2
+    for result in report['results']:
+        assert result['hit']['count'] == 2 * 20
+        assert len(result['miss']['trials']) == 2
+        assert result['hit']['found'] == 20
+        assert result['miss']['found'] == 0
+        assert result['hit']['p50_ms'] <= result['hit']['max_ms']
+    assert report['results'][0]['build_ms'] == 0.0
+
+
+def test_benchmark_files_are_reproducible(tmp_path):
+    first = run_benchmark([300], ['default'], str(tmp_path / 'a'),
+                          queries=5, seed=3, reread_modes=[False])
+    second = run_benchmark([300], ['default'], str(tmp_path / 'b'),
+                           queries=5, seed=3, reread_modes=[False])
+    assert (tmp_path / 'a' / 'benchmark_300_3.txt').read_text() == \
+        (tmp_path / 'b' / 'benchmark_300_3.txt').read_text()
+    assert first['files'][0]['bytes'] == second['files'][0]['bytes']
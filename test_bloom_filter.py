@@ -0,0 +1,21 @@
+from lib.bloom_filter import BloomFilter
+
+LINES = [f"{i};0;1;28;0;7;5;0;" for i in range(2000)]
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom_filter = BloomFilter(LINES, len(LINES), 0.01)
+    assert all(bloom_filter.might_contain(line) for line in LINES)
+    assert bloom_filter.stats()['rejections'] == 0
+
+
+def test_bloom_filter_false_positive_rate_and_stats():
+    bloom_filter = BloomFilter(LINES, len(LINES), 0.01)
+    misses = [f"{i};9;9;9;9;9;9;9;" for i in range(10000)]
+    false_positives = sum(map(bloom_filter.might_contain, misses))
+    assert false_positives < len(misses) * 0.03
+
+    stats = bloom_filter.stats()
+    assert stats['checks'] == len(misses)
+    assert stats['rejections'] == len(misses) - false_positives
+    assert stats['size_bytes'] == len(bloom_filter.bits)
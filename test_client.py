@@ -4,13 +4,15 @@ import sys
 import pytest
 import socket
 import ssl
+import threading
 from unittest import mock
 
 from lib.configuration import read_client_config
 from client import (
-    SERVER_IP, create_socket, connect_to_server, send_request,
-    close_connection
+    SERVER_IP, FramedConnection, create_socket, connect_to_server,
+    send_request, close_connection
 )
+from lib.framing import FrameReader, encode_frame
 
 # Modify sys.path after imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -108,3 +110,28 @@ def test_close_connection_success(mock_socket):
     close_connection(mock_socket_instance)
 
     mock_socket_instance.close.assert_called_once()
+
+
+def test_large_pipeline_does_not_deadlock():
+    client_sock, server_sock = socket.socketpair()
+    client_sock.settimeout(10)
+
+    def serve():
+        # Answers one frame at a time, like the threaded server
+        reader = FrameReader(server_sock)
+        while (payload := reader.read_frame()) is not None:
+            server_sock.sendall(encode_frame(payload[:8] * 100000))
+
+    server = threading.Thread(target=serve, daemon=True)
+    server.start()
+    connection = FramedConnection.__new__(FramedConnection)
+    connection.sock = client_sock
+    connection.frame_reader = FrameReader(client_sock)
+    requests = [f"{i:08d}" * 1000 for i in range(300)]
+
+    responses = connection.send_requests(requests)
+
+    assert responses == [request[:8] * 100000 for request in requests]
+    client_sock.close()
+    server.join(timeout=10)
+    server_sock.close()
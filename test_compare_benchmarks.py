@@ -0,0 +1,74 @@
+import json
+
+from metrics.benchmark import BENCHMARK_FORMAT
+from metrics.compare_benchmarks import (compare_reports, main,
+                                        ratio_interval)
+
+
+def make_report(medians, revision='abc'):
+    # medians: {(algorithm, kind): per-trial medians}
+    results = {}
+    for (algorithm, kind), values in medians.items():
+        result = results.setdefault(algorithm, {
+            'lines': 1000, 'algorithm': algorithm,
+            'reread_on_query': False})
+        result[kind] = {'trials': [{'median_ms': value, 'mean_ms': value}
+                                   for value in values]}
+    return {'format': BENCHMARK_FORMAT,
+            'environment': {'git_revision': revision},
+            'results': list(results.values())}
+
+
+def test_ratio_interval_covers_noise():
+    ratio, low, high = ratio_interval([1.0, 1.1, 0.9], [3.0, 3.3, 2.7])
+    assert 2.9 < ratio < 3.1 and low > 2 and high < 4.5
+    # Two overlapping samples do not exclude "no change"
+    ratio, low, high = ratio_interval([1.0, 1.5], [1.2, 1.6])
+    assert low < 1 < high
+    assert ratio_interval([1.0], [2.0])[1:] == (None, None)
+
+
+def test_compare_reports_flags_only_confident_slowdowns():
+    baseline = make_report({
+        ('default', 'hit'): [0.005, 0.0052, 0.0049],
+        ('default', 'miss'): [0.004, 0.0041, 0.0039],
+        ('binary', 'hit'): [0.010, 0.020, 0.010],
+    })
+    current = make_report({
+        ('default', 'hit'): [0.015, 0.0152, 0.0149],
+        ('default', 'miss'): [0.004, 0.0040, 0.0042],
+        ('binary', 'hit'): [0.012, 0.025, 0.013],
+        ('trie', 'hit'): [0.01, 0.01],
+    })
+    rows = compare_reports(baseline, current, threshold=0.1)
+    status = {(row['algorithm'], row['kind']): row['status']
+              for row in rows}
+    assert rows[0]['status'] == 'regression'
+    assert status[('default', 'hit')] == 'regression'
+    assert status[('default', 'miss')] == 'ok'
+    assert status[('binary', 'hit')] == 'noisy'
+    assert status[('binary', 'miss')] == 'missing'
+    assert status[('trie', 'hit')] == 'new'
+
+    rows = compare_reports(baseline, current, thresholds={'default': 5})
+    assert all(row['status'] != 'regression' for row in rows)
+
+
+def test_main_exits_non_zero_on_regression(tmp_path, capsys):
+    baseline = make_report({('default', 'hit'): [1.0, 1.02, 0.98]})
+    current = make_report({('default', 'hit'): [3.0, 3.05, 2.95]}, 'def')
+    paths = []
+    for name, report in (('baseline', baseline), ('current', current)):
+        path = tmp_path / f'{name}.json'
+        path.write_text(json.dumps(report))
+        paths.append(str(path))
+
+    assert main(paths) == 1
+    report = capsys.readouterr().out
+    assert '| regression | 1000 | default |' in report
+    assert '3.00x' in report
+    assert main([paths[0], paths[0]]) == 0
+    assert main(paths + ['--threshold', '3']) == 0
+
+    (tmp_path / 'old.json').write_text(json.dumps({'format': 0}))
+    assert main([str(tmp_path / 'old.json'), paths[1]]) == 2
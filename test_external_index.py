@@ -0,0 +1,100 @@
+import os
+import pytest
+import lib.external_index as external_index
+from lib.external_index import (
+    ExternalSnapshot,
+    build_external_index,
+    external_index_path,
+    load_external_index
+)
+from lib.file_server import FileServer
+from lib.index_registry import IndexRegistry
+from lib.reload_scheduler import ReloadScheduler, sample_digest
+from lib.search_engine import search_alg_setup, search_alg_setup_batch
+
+
+@pytest.fixture(autouse=True)
+def isolated_file_server(monkeypatch):
+    # Restore the globally published snapshot after each test
+    monkeypatch.setattr(FileServer, '_snapshot', FileServer._snapshot)
+    IndexRegistry.clear()
+    yield
+    IndexRegistry.clear()
+
+
+def build(tmp_path, content, chunk_bytes):
+    data_file = tmp_path / "data.txt"
+    data_file.write_bytes(content.encode('utf-8'))
+    path = external_index_path(str(tmp_path / "idx"), str(data_file))
+    with open(data_file, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        return build_external_index(
+            path, f, stat.st_size, str(data_file),
+            FileServer.file_signature(stat),
+            sample_digest(f, stat.st_size), chunk_bytes)
+
+
+@pytest.mark.parametrize("content", [
+    "b;2;\na;1;\n  a;1;  \nb;2;\nlonger;line;3;\n",
+    "a\tb\na\nc;3;é;\n\nlast;without;newline",
+    "",
+])
+def test_membership_matches_in_memory_index(tmp_path, monkeypatch,
+                                            content):
+    # Tiny chunks and fan-in force many runs and several merge passes
+    monkeypatch.setattr(external_index, 'MERGE_FAN_IN', 2)
+    index = build(tmp_path, content, chunk_bytes=4)
+    expected = FileServer.hashing_data(content)
+
+    assert list(index) == sorted(expected, key=lambda s: s.encode())
+    for query in list(expected) + ["a;1", "zzz", "longer;line;3;;"]:
+        assert (query in index) == (query in expected)
+    index.close()
+
+
+def test_scheduler_maps_index_at_restart(tmp_path, monkeypatch):
+    data_file = tmp_path / "data.txt"
+    data_file.write_text("a;1;\nb;2;\n")
+    path = external_index_path(str(tmp_path), str(data_file))
+
+    def restart():
+        scheduler = ReloadScheduler(
+            str(data_file), quiet_window=0.01, external_index_path=path)
+        assert scheduler.reload_now() is True
+        return scheduler
+
+    restart()
+    snapshot = FileServer().get_snapshot()
+    assert isinstance(snapshot, ExternalSnapshot)
+    with pytest.raises(ValueError):
+        snapshot.content
+    # Every algorithm is answered from the index
+    assert search_alg_setup('binary', True, str(data_file), "b;2;")
+    assert not search_alg_setup('trie', True, str(data_file), "c;3;")
+    assert search_alg_setup_batch(
+        'linear', False, str(data_file), ["a;1;", "x"]) == [True, False]
+
+    def no_rebuild(*args):
+        raise AssertionError("index rebuilt")
+
+    with monkeypatch.context() as m:
+        m.setattr('lib.reload_scheduler.build_external_index', no_rebuild)
+        scheduler = restart()
+        assert scheduler.reload_now() is False
+
+    data_file.write_text("x;9;\n")
+    restart()
+    assert search_alg_setup('default', False, str(data_file), "x;9;")
+    assert not search_alg_setup('default', False, str(data_file), "a;1;")
+
+
+def test_index_for_other_file_is_ignored(tmp_path):
+    index = build(tmp_path, "a;1;\n", chunk_bytes=1024)
+    index.close()
+    path = external_index_path(str(tmp_path / "idx"),
+                               str(tmp_path / "data.txt"))
+
+    assert load_external_index(path, str(tmp_path / "other.txt")) is None
+    assert load_external_index(str(tmp_path / "missing"), path) is None
+    loaded = load_external_index(path, str(tmp_path / "data.txt"))
+    assert loaded is not None and "a;1;" in loaded[0]
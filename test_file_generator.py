@@ -0,0 +1,83 @@
+import collections
+
+import numpy as np
+import pytest
+
+from metrics import file_generator
+from metrics.file_generator import (format_lines, generate_test_file,
+                                    miss_lines, shard_paths, write_workload)
+from metrics.load_generator import load_workload
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    # Several blocks even for small files
+    monkeypatch.setattr(file_generator, 'BLOCK_LINES', 1000)
+
+
+def test_format_lines_matches_join():
+    cells = np.array([[0, 5, 50], [12, 7, 100], [9, 10, 0]])
+    assert format_lines(cells) == b'0;5;50\n12;7;100\n9;10;0\n'
+
+
+def test_same_seed_same_file_in_any_layout(tmp_path):
+    single = tmp_path / 'single.txt'
+    samples = generate_test_file(str(single), 4500, seed=11, samples=20)
+    parallel = tmp_path / 'parallel.txt'
+    generate_test_file(str(parallel), 4500, seed=11, processes=2)
+    sharded = tmp_path / 'sharded.txt'
+    generate_test_file(str(sharded), 4500, seed=11, shards=3)
+
+    content = single.read_text()
+    assert parallel.read_text() == content
+    assert ''.join(open(path).read()
+                   for path in shard_paths(str(sharded), 3)) == content
+    lines = content.split('\n')[:-1]
+    assert len(lines) == 4500 and len(samples) == 20
+    assert all(len(line.split(';')) == 8 for line in lines)
+    assert max(int(value) for line in lines
+               for value in line.split(';')) == 50
+    assert set(samples) <= set(lines)
+    assert not set(miss_lines(50, 11)) & set(lines)
+
+    generate_test_file(str(single), 4500, seed=12)
+    assert single.read_text() != content
+
+
+def test_more_processes_than_shards_writes_every_line(tmp_path):
+    single = tmp_path / 'single.txt'
+    generate_test_file(str(single), 4500, seed=11)
+    sharded = tmp_path / 'sharded.txt'
+    samples = generate_test_file(
+        str(sharded), 4500, seed=11, processes=4, shards=2, samples=20)
+
+    content = ''.join(open(path).read()
+                      for path in shard_paths(str(sharded), 2))
+    assert content == single.read_text()
+    assert set(samples) <= set(content.split('\n'))
+
+
+def test_duplicate_ratio_and_distribution(tmp_path):
+    path = tmp_path / 'duplicates.txt'
+    generate_test_file(str(path), 5000, seed=3, duplicate_ratio=0.25)
+    lines = path.read_text().split('\n')[:-1]
+    assert 0.2 < 1 - len(set(lines)) / len(lines) < 0.3
+
+    generate_test_file(str(path), 5000, seed=3, distribution='zipf',
+                       skew=1.5)
+    counts = collections.Counter(value for line in path.read_text().split()
+                                 for value in line.split(';'))
+    assert counts.most_common(1)[0][0] == '0'
+    assert counts['0'] > 10 * counts['50']
+
+
+def test_workload_is_readable_by_the_load_generator(tmp_path):
+    workload = tmp_path / 'workload.jsonl'
+    write_workload(str(workload), ['1;2', '3;4'], ['60;2'],
+                   ['default', 'binary'], seed=1)
+    entries = load_workload(str(workload))
+    assert sorted((entry['query_string'], entry['expect'])
+                  for entry in entries) == [
+        ('1;2', True), ('3;4', True), ('60;2', False)]
+    assert {entry['algorithm'] for entry in entries} <= {'default',
+                                                         'binary'}
@@ -0,0 +1,252 @@
+import sys
+import time
+import pytest
+import lib.index_registry as index_registry
+from lib.algorithms.trie_search import TrieSearch
+from lib.file_server import FileServer
+from lib.optimized_file_reader import FileReader
+from lib.index_registry import IndexRegistry, estimate_size
+from lib.reload_scheduler import ReloadScheduler
+from lib.search_engine import (
+    SearchEngine,
+    prebuild_indexes,
+    search_alg_setup
+)
+
+
+@pytest.fixture(autouse=True)
+def isolated_file_server(monkeypatch):
+    # Restore the globally published snapshot after each test
+    monkeypatch.setattr(FileServer, '_snapshot', FileServer._snapshot)
+    IndexRegistry.clear()
+    yield
+    IndexRegistry.clear()
+
+
+def test_publish_swaps_whole_snapshot():
+    # Readers holding the old snapshot keep a consistent view
+    file_server = FileServer()
+    old_snapshot = file_server.update_file_content("a;1;\nb;2;\n")
+    new_snapshot = file_server.update_file_content("c;3;\n")
+
+    assert file_server.get_snapshot() is new_snapshot
+    assert "a;1;" in old_snapshot.hash_map
+    assert "a;1;" not in new_snapshot.hash_map
+    assert new_snapshot.generation > old_snapshot.generation
+
+
+def test_stale_snapshot_is_not_published():
+    # A snapshot built earlier must not replace a newer published one
+    file_server = FileServer()
+    older = file_server.build_snapshot("a;1;\n")
+    newer = file_server.build_snapshot("b;2;\n")
+
+    assert file_server.publish_snapshot(newer) is True
+    assert file_server.publish_snapshot(older) is False
+    assert file_server.get_snapshot() is newer
+
+
+def test_publish_releases_older_indexes():
+    # Structures of older generations are dropped on publish
+    file_server = FileServer()
+    snapshot = file_server.update_file_content("a;1;\n")
+    IndexRegistry.get_or_build(
+        "data.txt", snapshot.generation, "linear", lambda: object())
+
+    newer = file_server.update_file_content("b;2;\n")
+    rebuilt = IndexRegistry.get_or_build(
+        "data.txt", snapshot.generation, "linear", lambda: "old build")
+
+    assert rebuilt == "old build"
+    assert not any(key[1] < newer.generation
+                   for key in IndexRegistry._indexes)
+
+
+def test_prebuild_keeps_published_indexes_until_swap():
+    # Building the next generation must not evict the live one
+    file_server = FileServer()
+    snapshot = file_server.update_file_content("a;1;\nb;2;\n")
+    prebuild_indexes("data.txt", ['trie', 'binary'], snapshot)
+    live_keys = set(IndexRegistry._indexes)
+
+    newer = file_server.build_snapshot("c;3;\n")
+    prebuild_indexes("data.txt", ['trie', 'binary'], newer)
+    assert live_keys <= set(IndexRegistry._indexes)
+
+    file_server.publish_snapshot(newer)
+    assert not live_keys & set(IndexRegistry._indexes)
+    assert ("data.txt", newer.generation, 'trie') in IndexRegistry._indexes
+
+
+def test_estimate_size_walks_deep_structures():
+    # Nesting deeper than the recursion limit is still sized
+    deep = node = {}
+    for _ in range(sys.getrecursionlimit() * 2):
+        node['x'] = node = {}
+
+    assert estimate_size(deep) >= sys.getrecursionlimit() * 2 * 64
+
+
+def test_estimate_size_extrapolates_past_node_budget(monkeypatch):
+    # Past the budget a trie is sized from sampled paths
+    content = "".join(f"{i * 7919};{i % 97};\n" for i in range(2000))
+    trie = TrieSearch("data.txt", (content,))
+    walked = estimate_size(trie)
+
+    monkeypatch.setattr(index_registry, 'SIZE_NODE_BUDGET', 100)
+    assert 0.5 * walked < estimate_size(trie) < 2 * walked
+
+
+def test_failed_build_releases_its_lock():
+    # A builder that raises must not leave its build lock behind
+    def fail():
+        raise ValueError("build failed")
+
+    with pytest.raises(ValueError):
+        IndexRegistry.get_or_build("data.txt", 1, "linear", fail)
+    assert ("data.txt", 1, "linear") not in IndexRegistry._build_locks
+    assert IndexRegistry.get_or_build(
+        "data.txt", 1, "linear", lambda: "built") == "built"
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_reload_scheduler_coalesces_bursts(tmp_path):
+    # A burst of events results in a single reload after the quiet window
+    data_file = tmp_path / "data.txt"
+    data_file.write_text("a;1;\n")
+    scheduler = ReloadScheduler(str(data_file), quiet_window=0.05)
+
+    for i in range(20):
+        with open(data_file, "a") as f:
+            f.write(f"b;{i};\n")
+        scheduler.notify()
+
+    assert wait_for(lambda: scheduler.reload_count == 1)
+    time.sleep(0.1)
+    assert scheduler.reload_count == 1
+    assert "b;19;" in FileServer().get_snapshot().hash_map
+
+
+def test_reload_scheduler_skips_unchanged_content(tmp_path):
+    # Events that do not change the content do not rebuild anything
+    data_file = tmp_path / "data.txt"
+    data_file.write_text("a;1;\n")
+    scheduler = ReloadScheduler(str(data_file), quiet_window=0.01)
+
+    assert scheduler.reload_now() is True
+    generation = FileServer().get_generation()
+    scheduler.notify()
+
+    assert wait_for(lambda: scheduler.skipped_reloads == 1)
+    assert scheduler.reload_count == 1
+    assert FileServer().get_generation() == generation
+
+
+def test_failed_reload_is_retried(tmp_path, monkeypatch):
+    # A reload that fails must not mark the content as indexed
+    data_file = tmp_path / "data.txt"
+    data_file.write_text("a;1;\n")
+    scheduler = ReloadScheduler(str(data_file), quiet_window=0.01)
+
+    def fail(*args):
+        raise ValueError("build failed")
+
+    with monkeypatch.context() as m:
+        m.setattr(FileServer, 'build_snapshot', fail)
+        with pytest.raises(ValueError):
+            scheduler.reload_now()
+
+    assert scheduler.reload_now() is True
+    assert "a;1;" in FileServer().get_snapshot().hash_map
+
+
+def test_append_only_indexes_new_tail(tmp_path):
+    # Appended lines are merged into the index without a full rebuild
+    data_file = tmp_path / "data.txt"
+    data_file.write_text("a;1;\nb;2;\n")
+    scheduler = ReloadScheduler(str(data_file), quiet_window=0.01)
+    assert scheduler.reload_now() is True
+
+    with open(data_file, "a") as f:
+        f.write("c;3;\n")
+    assert scheduler.reload_now() is True
+
+    snapshot = FileServer().get_snapshot()
+    assert scheduler.incremental_reloads == 1
+    assert "a;1;" in snapshot.hash_map
+    assert "c;3;" in snapshot.hash_map
+    assert snapshot.content == "a;1;\nb;2;\nc;3;\n"
+
+
+def test_append_with_bloom_filter_finds_new_lines(tmp_path):
+    # Lines repeated across index layers must not break the filter,
+    # the base is large enough for the tail to stay its own layer
+    data_file = tmp_path / "data.txt"
+    data_file.write_text("".join(f"a;{i};\n" for i in range(20)))
+    scheduler = ReloadScheduler(str(data_file), quiet_window=0.01)
+    SearchEngine.bloom_filter_fpr = 0.01
+    try:
+        assert scheduler.reload_now() is True
+        with open(data_file, "a") as f:
+            f.write("c;3;\na;1;\n")
+        assert scheduler.reload_now() is True
+
+        assert scheduler.incremental_reloads == 1
+        assert search_alg_setup('linear', False, str(data_file), "c;3;")
+        assert not search_alg_setup('linear', False, str(data_file), "d;4;")
+    finally:
+        SearchEngine.bloom_filter_fpr = None
+
+
+def test_append_after_revalidation_is_indexed_once(tmp_path):
+    # A query re-read the grown file before the scheduler got to it
+    data_file = tmp_path / "data.txt"
+    data_file.write_text("a\nb\n")
+    scheduler = ReloadScheduler(str(data_file), quiet_window=0.01)
+    assert scheduler.reload_now() is True
+
+    with open(data_file, "a") as f:
+        f.write("c\n")
+    assert FileReader().revalidate(str(data_file)) is True
+    scheduler.reload_now()
+
+    assert scheduler.incremental_reloads == 0
+    assert FileServer().get_snapshot().content == "a\nb\nc\n"
+
+
+def test_rewrite_falls_back_to_full_reload(tmp_path):
+    # Truncated or rewritten files are indexed from scratch
+    data_file = tmp_path / "data.txt"
+    data_file.write_text("a;1;\nb;2;\n")
+    scheduler = ReloadScheduler(str(data_file), quiet_window=0.01)
+    assert scheduler.reload_now() is True
+
+    data_file.write_text("x;9;\ny;8;\nz;7;\n")
+    assert scheduler.reload_now() is True
+
+    snapshot = FileServer().get_snapshot()
+    assert scheduler.incremental_reloads == 0
+    assert "a;1;" not in snapshot.hash_map
+    assert "z;7;" in snapshot.hash_map
+
+
+def test_revalidate_rereads_only_changed_file(tmp_path):
+    # Unchanged files are checked with a stat call, not read again
+    data_file = tmp_path / "data.txt"
+    data_file.write_text("a;1;\n")
+    file_reader = FileReader()
+    file_reader.read_file(str(data_file))
+    generation = FileServer().get_generation()
+
+    assert file_reader.revalidate(str(data_file)) is False
+    assert FileServer().get_generation() == generation
+
+    data_file.write_text("a;1;\nb;2;\n")
+    assert file_reader.revalidate(str(data_file)) is True
+    assert "b;2;" in FileServer().get_snapshot().hash_map
@@ -0,0 +1,83 @@
+import pytest
+from lib.file_server import FileServer
+from lib.index_registry import IndexRegistry
+from lib.index_snapshot import index_snapshot_path, load_index_snapshot
+from lib.reload_scheduler import ReloadScheduler
+from lib.shared_index import SharedSnapshot
+
+
+@pytest.fixture(autouse=True)
+def isolated_file_server(monkeypatch):
+    # Restore the globally published snapshot after each test
+    monkeypatch.setattr(FileServer, '_snapshot', FileServer._snapshot)
+    IndexRegistry.clear()
+    yield
+    IndexRegistry.clear()
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    data_file = tmp_path / "data.txt"
+    data_file.write_text("a;1;\nb;2;\n")
+    return data_file
+
+
+def restart(data_file, snapshot_path):
+    # A new scheduler behaves like the first reload after a restart
+    scheduler = ReloadScheduler(
+        str(data_file), quiet_window=0.01, index_snapshot_path=snapshot_path)
+    assert scheduler.reload_now() is True
+    return scheduler
+
+
+def test_restart_maps_saved_index(tmp_path, data_file):
+    snapshot_path = index_snapshot_path(str(tmp_path / "idx"), str(data_file))
+    restart(data_file, snapshot_path)
+    assert load_index_snapshot(snapshot_path, str(data_file)) is not None
+
+    scheduler = restart(data_file, snapshot_path)
+    snapshot = FileServer().get_snapshot()
+    assert isinstance(snapshot, SharedSnapshot)
+    assert "b;2;" in snapshot.hash_map
+    assert snapshot.content == "a;1;\nb;2;\n"
+    assert scheduler.reload_now() is False
+
+
+def test_restart_after_append_indexes_only_tail(tmp_path, data_file):
+    snapshot_path = index_snapshot_path(str(tmp_path / "idx"), str(data_file))
+    restart(data_file, snapshot_path)
+    with open(data_file, "a") as f:
+        f.write("c;3;\n")
+
+    scheduler = restart(data_file, snapshot_path)
+    snapshot = FileServer().get_snapshot()
+    assert scheduler.incremental_reloads == 1
+    assert "a;1;" in snapshot.hash_map and "c;3;" in snapshot.hash_map
+
+
+def test_rewritten_file_ignores_saved_index(tmp_path, data_file):
+    snapshot_path = index_snapshot_path(str(tmp_path / "idx"), str(data_file))
+    restart(data_file, snapshot_path)
+    data_file.write_text("x;9;\ny;8;\n")
+
+    restart(data_file, snapshot_path)
+    snapshot = FileServer().get_snapshot()
+    assert not isinstance(snapshot, SharedSnapshot)
+    assert "x;9;" in snapshot.hash_map and "a;1;" not in snapshot.hash_map
+
+
+def test_edit_between_samples_ignores_saved_index(tmp_path):
+    # Larger than both sampled ends, the edit is only in the middle
+    data_file = tmp_path / "data.txt"
+    content = "".join(f"a;{i:05};\n" for i in range(30000))
+    data_file.write_text(content)
+    snapshot_path = index_snapshot_path(str(tmp_path / "idx"), str(data_file))
+    restart(data_file, snapshot_path)
+
+    data_file.write_text(
+        content.replace("a;15000;", "b;15000;") + "c;1;\n")
+    restart(data_file, snapshot_path)
+    snapshot = FileServer().get_snapshot()
+    assert not isinstance(snapshot, SharedSnapshot)
+    assert "b;15000;" in snapshot.hash_map
+    assert "a;15000;" not in snapshot.hash_map
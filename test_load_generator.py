@@ -0,0 +1,91 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+from lib.framing import (FRAMED_PROTOCOL_MARKER, encode_frame,
+                         read_frame_async)
+from metrics.load_generator import (LoadGenerator, RequestMix,
+                                    arrival_offsets, load_workload)
+
+
+def answer(payload):
+    query_string = json.loads(payload)['query_string']
+    if query_string == 'busy':
+        return b'SERVER BUSY'
+    return b'STRING EXISTS' if query_string.startswith('hit') \
+        else b'STRING NOT FOUND'
+
+
+async def handle(reader, writer):
+    # Speaks both protocols of the server, answering every string
+    # starting with "hit" as found
+    first_byte = await reader.read(1)
+    if first_byte == FRAMED_PROTOCOL_MARKER:
+        while True:
+            payload = await read_frame_async(reader)
+            if payload is None:
+                break
+            writer.write(encode_frame(answer(payload)))
+    else:
+        writer.write(answer(first_byte + await reader.read(4096)))
+    await writer.drain()
+    writer.close()
+
+
+def run_load(entries, connections, rate=400, duration=0.5):
+    async def run():
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        mix = RequestMix(entries, ['hit1', 'hit2'], ['miss1'],
+                         random.Random(5))
+        generator = LoadGenerator('127.0.0.1', port, mix, connections)
+        try:
+            return await generator.run(rate, duration, 'constant',
+                                       warmup=0.1, seed=5)
+        finally:
+            server.close()
+            await server.wait_closed()
+    return asyncio.run(run())
+
+
+def test_arrival_offsets_keep_the_rate():
+    constant = list(arrival_offsets(100, 2, 'constant', random.Random(1)))
+    assert len(constant) == 200 and constant[1] == pytest.approx(0.01)
+    poisson = list(arrival_offsets(1000, 10, 'poisson', random.Random(1)))
+    assert 9500 < len(poisson) < 10500
+    assert poisson == sorted(poisson) and poisson[-1] < 10
+
+
+def test_load_workload_fills_defaults(tmp_path):
+    workload = tmp_path / 'workload.jsonl'
+    workload.write_text('{"algorithm": "default"}\n\n'
+                        '{"algorithm": "binary", "weight": 3, '
+                        '"hit_ratio": 0.5}\n')
+    assert load_workload(str(workload)) == [
+        {'algorithm': 'default', 'weight': 1, 'hit_ratio': 1.0},
+        {'algorithm': 'binary', 'weight': 3, 'hit_ratio': 0.5}]
+    workload.write_text('{"weight": 1}\n')
+    with pytest.raises(ValueError):
+        load_workload(str(workload))
+
+
+@pytest.mark.parametrize('connections', [0, 2])
+def test_load_generator_reports_latency_and_errors(connections):
+    entries = [
+        {'algorithm': 'default', 'weight': 3, 'hit_ratio': 0.5},
+        {'algorithm': 'binary', 'weight': 1, 'hit_ratio': 1.0,
+         'query_string': 'busy'},
+    ]
+    report = run_load(entries, connections)
+
+    assert report['offered'] == 200
+    measured = report['completed'] + sum(report['errors'].values())
+    assert measured == report['offered']
+    assert report['errors']['busy'] > 20
+    assert report['wrong'] == 0
+    assert set(report['by_algorithm']) == {'default'}
+    assert report['latency']['count'] == report['completed']
+    assert 0 < report['latency']['p50_ms'] <= report['latency']['max_ms']
+    assert report['throughput'] > 200
@@ -0,0 +1,48 @@
+import logging
+import os
+
+import pytest
+
+from lib.logging_config import (QuerySampler, configure_logging,
+                                stop_logging)
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    stop_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def test_query_sampler_logs_every_nth_query():
+    sampler = QuerySampler(0.25)
+    assert [sampler.sample() for _ in range(8)] == \
+        [True, False, False, False] * 2
+    sampler.configure(0)
+    assert not any(sampler.sample() for _ in range(100))
+
+
+def test_queued_logging_writes_after_stop(tmp_path, root_logger):
+    log_file = tmp_path / 'server.log'
+    configure_logging('warning', str(log_file), use_queue=True)
+    logging.debug("not written %s", 1)
+    logging.warning("written %s", 2)
+    stop_logging()
+    lines = log_file.read_text().splitlines()
+    assert len(lines) == 1
+    assert lines[0].endswith("WARNING - written 2")
+
+
+def test_unwritable_log_file_falls_back_to_stderr(tmp_path, root_logger,
+                                                  capsys):
+    log_file = os.path.join(str(tmp_path), 'missing', 'server.log')
+    configure_logging('INFO', log_file, use_queue=False)
+    logging.info("still logged")
+    assert "still logged" in capsys.readouterr().err
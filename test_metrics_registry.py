@@ -0,0 +1,97 @@
+import json
+
+import random
+
+from metrics.registry import Histogram, MetricsRegistry, bucket_index
+
+ALGORITHMS = ["default", "linear", "binary"]
+
+
+def test_registry_flushes_plottable_layout(tmp_path):
+    json_file = tmp_path / "metrics.json"
+    registry = MetricsRegistry(ALGORITHMS, str(json_file))
+    registry.record('execution_times', 'linear', False, 2.0)
+    registry.record('execution_times', 'linear', False, 4.0)
+    registry.record('queue_wait_times', 'binary', True, 0.3)
+    registry.add_summary('result_cache', lambda: {'hits': 1})
+    registry.add_summary('disabled', lambda: None)
+    registry.flush()
+
+    data = json.loads(json_file.read_text())
+    assert data['algorithms'] == ALGORITHMS
+    # One array per algorithm index, as metrics_plot.py reads it
+    assert data['execution_times_REREAD_ON_QUERY_False'] == [[], [2.0, 4.0]]
+    assert data['queue_wait_times_REREAD_ON_QUERY_True'][2] == [0.3]
+    histogram = data['histograms'][
+        'execution_times_REREAD_ON_QUERY_False']['linear']
+    assert histogram['count'] == 2 and histogram['sum_ms'] == 6.0
+    assert histogram['counts'][str(bucket_index(2000))] == 1
+    assert data['result_cache'] == {'hits': 1}
+    assert 'disabled' not in data
+
+
+def test_registry_continues_from_existing_file(tmp_path):
+    json_file = tmp_path / "metrics.json"
+    # Layout written by set_metrics_data
+    json_file.write_text(json.dumps({
+        'algorithms': ALGORITHMS,
+        'execution_times_REREAD_ON_QUERY_False': [[1.0, 3.0]],
+    }))
+    registry = MetricsRegistry(ALGORITHMS, str(json_file), max_samples=2)
+    registry.record('execution_times', 'default', False, 5.0)
+    registry.flush()
+
+    reloaded = MetricsRegistry(ALGORITHMS, str(json_file), max_samples=2)
+    data = reloaded.snapshot()
+    assert data['execution_times_REREAD_ON_QUERY_False'] == [[3.0, 5.0]]
+    histogram = data['histograms'][
+        'execution_times_REREAD_ON_QUERY_False']['default']
+    assert histogram['count'] == 3 and histogram['sum_ms'] == 9.0
+
+
+def test_registry_ignores_corrupt_file(tmp_path):
+    json_file = tmp_path / "metrics.json"
+    json_file.write_text('{"algorithms": [1,,')
+    registry = MetricsRegistry(ALGORITHMS, str(json_file))
+    registry.record('execution_times', 'default', False, 1.0)
+    registry.flush()
+    assert json.loads(json_file.read_text())[
+        'execution_times_REREAD_ON_QUERY_False'] == [[1.0]]
+
+
+def test_histogram_percentiles_within_one_percent():
+    rng = random.Random(18)
+    values = [rng.lognormvariate(0, 2) for _ in range(20000)]
+    histogram = Histogram(0)
+    for value in values:
+        histogram.add(value)
+
+    values.sort()
+    for quantile in (0.5, 0.9, 0.99, 0.999):
+        exact = values[int(quantile * len(values)) - 1]
+        assert abs(histogram.percentile(quantile) - exact) <= \
+            exact * 0.01 + 0.001
+    assert histogram.percentile(1.0) == values[-1]
+    # Buckets are log-linear, not one per distinct value
+    assert len(histogram.counts) < 2000
+
+
+def test_registry_stage_percentiles(tmp_path):
+    json_file = tmp_path / "metrics.json"
+    registry = MetricsRegistry(ALGORITHMS, str(json_file))
+    for i in range(1, 101):
+        registry.record_stages(
+            '200k.txt', 'linear', {'parse': 0.01, 'search': float(i)})
+    registry.record_stages('other.txt', 'default', {'respond': 0.5})
+
+    stats = registry.stats()['stages']
+    search = stats['200k.txt']['linear']['search']
+    assert search['count'] == 100
+    assert abs(search['p50_ms'] - 50) < 0.5
+    assert abs(search['p99_ms'] - 99) < 1
+    assert search['max_ms'] == 100.0
+    assert stats['other.txt']['default']['respond']['count'] == 1
+
+    registry.flush()
+    reloaded = MetricsRegistry(ALGORITHMS, str(json_file))
+    assert reloaded.stats()['stages'] == stats
@@ -0,0 +1,42 @@
+from lib.file_server import FileServer
+from lib.packed_index import PackedKeyIndex, pack_line, unpack_key
+
+CONTENT = ("3;0;1;28;0;7;5;0;\n1;2;3;4;5;6;7;8\n 9;9;9;9;9;9;9;9; \n"
+           "03;0;1;28;0;7;5;0;\n1;2;3;4;5;6;7;200;\nheader\n")
+
+
+def test_pack_line_round_trips_canonical_lines():
+    for line in ("3;0;1;28;0;7;5;0;", "1;2;3;4;5;6;7;8", "127;0;0;0;0;0;0;0;"):
+        assert unpack_key(pack_line(line)) == line
+    assert pack_line("3;0;1;28;0;7;5;0;") != pack_line("3;0;1;28;0;7;5;0")
+    for line in ("03;0;1;28;0;7;5;0;", "1;2;3;4;5;6;7;128;", "1;2;3;4;5;6;7;",
+                 " 1;2;3;4;5;6;7;8;", "1;2;3;4;5;6;7;8;;", ""):
+        assert pack_line(line) is None
+
+
+def test_packed_index_matches_string_set():
+    index = PackedKeyIndex(CONTENT)
+    expected = frozenset(line.strip() for line in CONTENT.split('\n'))
+    assert set(index) == expected
+    assert len(index) == len(expected)
+    assert len(index.keys) == 3
+    assert index.fallback == frozenset(
+        {"03;0;1;28;0;7;5;0;", "1;2;3;4;5;6;7;200;", "header", ""})
+
+    targets = list(expected) + [
+        "9;9;9;9;9;9;9;9", " 3;0;1;28;0;7;5;0;", "1;1;1;1;1;1;1;1;"]
+    assert [target in index for target in targets] == [
+        target in expected for target in targets]
+    assert index.contains_many(targets) == [
+        target in expected for target in targets]
+
+
+def test_file_server_builds_packed_index_when_enabled():
+    try:
+        FileServer.packed_keys = True
+        hash_map = FileServer.hashing_data(CONTENT)
+    finally:
+        FileServer.packed_keys = False
+    assert isinstance(hash_map, PackedKeyIndex)
+    assert "1;2;3;4;5;6;7;8" in hash_map
+    assert isinstance(FileServer.hashing_data(CONTENT), frozenset)
@@ -0,0 +1,34 @@
+from lib.result_cache import ENTRY_OVERHEAD, ResultCache
+
+
+def test_result_cache_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    cache.put(1, 'linear', 'a', True)
+    cache.put(1, 'linear', 'b', False)
+    assert cache.get(1, 'linear', 'a') is True
+    cache.put(1, 'linear', 'c', True)
+    # 'b' was the least recently used entry
+    assert cache.get(1, 'linear', 'b') is None
+    assert cache.get(1, 'linear', 'c') is True
+    assert cache.get(1, 'binary', 'a') is None
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (2, 2, 1)
+
+
+def test_result_cache_is_bounded_by_bytes():
+    cache = ResultCache(max_entries=100, max_bytes=3 * ENTRY_OVERHEAD + 200)
+    for i in range(10):
+        cache.put(1, 'linear', str(i), True)
+    assert cache.stats()['entries'] == 3
+    assert cache.bytes <= cache.max_bytes
+
+
+def test_result_cache_drops_entries_on_new_generation():
+    cache = ResultCache()
+    cache.put(1, 'linear', 'a', True)
+    assert cache.get(2, 'linear', 'a') is None
+    assert cache.stats()['invalidations'] == 1
+    # Results of the older generation are not stored anymore
+    cache.put(1, 'linear', 'a', True)
+    assert cache.get(2, 'linear', 'a') is None
@@ -4,7 +4,13 @@ import pytest
 from unittest.mock import patch, mock_open
 from lib.algorithms.binary_search import BinarySearch
 from lib.algorithms.inverted_index_search import InvertedIndexSearch
-from lib.search_engine import SearchEngine, search_alg_setup
+from lib.index_registry import IndexRegistry
+from lib.search_engine import (
+    SearchEngine,
+    bloom_filter_stats,
+    search_alg_setup,
+    search_alg_setup_batch
+)
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
@@ -16,6 +22,15 @@ SEARCH_TERM = "10;0;1;26;0;8;3;0;"  # Valid search term for testing
 NON_EXISTENT_TERM = "orange"  # Search term that does not exist in the file
 
 
+@pytest.fixture(autouse=True)
+def clear_index_registry():
+    # Prebuilt search structures must not leak between tests,
+    # in particular mocked ones
+    IndexRegistry.clear()
+    yield
+    IndexRegistry.clear()
+
+
 @pytest.fixture
 def mock_binary_search():
     # Mock the BinarySearch class for testing
@@ -109,3 +124,66 @@ def test_inverted_index_search_class(mock_file_content):
         SEARCH_TERM) is True  # Assert search term found
     assert search_instance.search(
         NON_EXISTENT_TERM) is False  # Assert non-exist
+
+
+@pytest.mark.parametrize("algorithm", ["default", "linear", "hash_table"])
+def test_search_alg_setup_batch(algorithm):
+    # Test that a batch returns one result per target, in order
+    result = search_alg_setup_batch(
+        algorithm,
+        False,
+        FILE_PATH,
+        [SEARCH_TERM, NON_EXISTENT_TERM, SEARCH_TERM])
+    assert result == [True, False, True]
+
+
+def test_search_structure_built_once_per_generation(search_engine):
+    # The sorted structure is built once and reused by later queries
+    with patch('lib.search_engine.BinarySearch',
+               wraps=BinarySearch) as MockBinarySearch:
+        assert search_engine.binary_search(SEARCH_TERM) is True
+        assert search_engine.binary_search(NON_EXISTENT_TERM) is False
+        assert MockBinarySearch.call_count == 1
+
+
+def test_sorted_algorithms_share_one_index(search_engine):
+    # The sorted algorithms probe the same SortedIndex instance
+    search_engine.binary_search(SEARCH_TERM)
+    search_engine.jump_search(SEARCH_TERM)
+    binary = search_engine.get_search_instance('binary', BinarySearch)
+    jump = search_engine.get_search_instance(
+        'jump', search_engine.search_class('jump'))
+    assert binary.sorted_index is jump.sorted_index
+
+
+@pytest.mark.parametrize(
+    "algorithm", ["binary", "linear", "trie", "shell", "inverted_index"])
+def test_bloom_filter_keeps_results(algorithm):
+    # Misses are answered by the filter, hits still by the algorithm
+    SearchEngine.bloom_filter_fpr = 0.01
+    try:
+        assert search_alg_setup(algorithm, False, FILE_PATH, SEARCH_TERM)
+        assert not search_alg_setup(
+            algorithm, False, FILE_PATH, NON_EXISTENT_TERM)
+        assert search_alg_setup_batch(
+            algorithm, False, FILE_PATH,
+            [NON_EXISTENT_TERM, SEARCH_TERM]) == [False, True]
+        assert bloom_filter_stats()['rejections'] >= 2
+    finally:
+        SearchEngine.bloom_filter_fpr = None
+
+
+def test_query_loads_snapshot_once():
+    # The filter and the search must answer from the same snapshot
+    SearchEngine.bloom_filter_fpr = 0.01
+    load_snapshot = SearchEngine.load_snapshot
+    try:
+        with patch.object(SearchEngine, 'load_snapshot', autospec=True,
+                          side_effect=load_snapshot) as loads:
+            assert search_alg_setup('binary', True, FILE_PATH, SEARCH_TERM)
+            assert loads.call_count == 1
+            assert search_alg_setup_batch(
+                'linear', True, FILE_PATH, [SEARCH_TERM]) == [True]
+            assert loads.call_count == 2
+    finally:
+        SearchEngine.bloom_filter_fpr = None
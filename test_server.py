@@ -5,8 +5,21 @@ from server import (
     check_algorithm_string,
     search_in_file,
     start_server,
-    handle_client
+    handle_client,
+    handle_client_async,
+    parse_query,
+    format_response,
+    configure_result_cache,
+    run_search,
+    submit_search
 )
+import server
+from lib.framing import FRAMED_PROTOCOL_MARKER, FrameReader, encode_frame
+from lib.worker_pool import WorkerPool
+import threading
+import asyncio
+import concurrent.futures
+import functools
 import sys
 import pytest
 import os
@@ -127,3 +140,176 @@ def test_search_in_file_not_found(test_200k_file):
              'algorithm': VALID_ALGORITHM}  # Define a non-existing query
     result = search_in_file(test_200k_file, query)  # Perform the search
     assert result is False  # Ensure the search result is False
+
+
+def test_parse_query_falls_back_to_default():
+    """Test that unknown algorithms fall back to the default one."""
+    payload = json.dumps({'query_string': '9;0;1;11;0;8;5;0;',
+                          'algorithm': INVALID_ALGORITHM}).encode('utf-8')
+    assert parse_query(payload)['algorithm'] == VALID_ALGORITHM
+
+
+def test_handle_client_async(test_200k_file):
+    """Test the asyncio handler speaks the same protocol as handle_client."""
+    async def run_query(query):
+        pool = WorkerPool(workers=2)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as metrics:
+            handler = functools.partial(
+                handle_client_async,
+                file_path=test_200k_file,
+                reread_on_query=False,
+                metrics_json_path=None,
+                worker_pool=pool,
+                metrics_executor=metrics)
+            server = await asyncio.start_server(handler, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                reader, writer = await asyncio.open_connection(
+                    '127.0.0.1', port)
+                writer.write(json.dumps(query).encode('utf-8'))
+                await writer.drain()
+                response = await reader.read()
+                writer.close()
+                return response
+
+    found = asyncio.run(run_query({'query_string': '9;0;1;11;0;8;5;0;',
+                                   'algorithm': 'linear'}))
+    missing = asyncio.run(run_query({'query_string': 'nonexistent_string',
+                                     'algorithm': VALID_ALGORITHM}))
+    assert found == b'STRING EXISTS'
+    assert missing == b'STRING NOT FOUND'
+
+
+def test_handle_client_framed_pipelining(test_200k_file):
+    """Test that framed queries share one connection and stay in order."""
+    server_conn, client_conn = socket.socketpair()
+    worker = threading.Thread(
+        target=handle_client,
+        args=(server_conn, 'socketpair', test_200k_file, False, None, ''))
+    worker.start()
+
+    queries = [
+        {'query_string': '9;0;1;11;0;8;5;0;', 'algorithm': VALID_ALGORITHM},
+        {'query_string': 'nonexistent_string', 'algorithm': 'linear'},
+        {'query_string': '3;0;1;28;0;7;5;0;', 'algorithm': 'binary'},
+    ]
+    client_conn.sendall(FRAMED_PROTOCOL_MARKER + b''.join(
+        encode_frame(json.dumps(query).encode('utf-8'))
+        for query in queries) + encode_frame(b'not json'))
+
+    frame_reader = FrameReader(client_conn)
+    responses = [frame_reader.read_frame() for _ in range(len(queries) + 1)]
+    client_conn.close()
+    worker.join(timeout=5)
+
+    assert responses == [b'STRING EXISTS', b'STRING NOT FOUND',
+                         b'STRING EXISTS', b'INVALID QUERY']
+
+
+def test_search_in_file_batch(test_200k_file):
+    """Test that a batch query returns a result per query string."""
+    query = {'queries': ['9;0;1;11;0;8;5;0;', 'nonexistent_string'],
+             'algorithm': VALID_ALGORITHM}
+    assert search_in_file(test_200k_file, query) == [True, False]
+
+
+def test_format_response_batch_bitmap():
+    """Test the list and bitmap encodings of batch results."""
+    results = [True, False, False, True, False, False, False, False, True]
+    assert json.loads(format_response(results)) == {'results': results}
+    assert json.loads(format_response(results, 'bitmap')) == {
+        'count': 9, 'bitmap': '0901'}
+
+
+def test_cached_query_skips_worker_pool(test_200k_file):
+    """A repeated query is answered from the result cache."""
+    configure_result_cache(100, 1024 * 1024)
+    pool = WorkerPool(workers=1)
+    try:
+        query = {'query_string': '9;0;1;11;0;8;5;0;', 'algorithm': 'linear'}
+        assert run_search(test_200k_file, query, False, pool)[0]
+        assert run_search(test_200k_file, query, False, pool)[0]
+        assert pool.stats()['completed'] == 1
+        assert server.result_cache.stats()['hits'] == 1
+    finally:
+        pool.shutdown()
+        configure_result_cache(0, 0)
+
+
+def test_identical_queries_share_one_search(test_200k_file):
+    """Identical queries in flight together run one search."""
+    pool = WorkerPool(workers=1)
+    blocker = threading.Event()
+    # Keep the only worker busy so both queries are in flight together
+    pool.submit('linear', blocker.wait)
+    try:
+        query = {'query_string': '9;0;1;11;0;8;5;0;', 'algorithm': 'linear'}
+        first, first_shared = submit_search(
+            test_200k_file, query, False, pool)
+        second, second_shared = submit_search(
+            test_200k_file, dict(query), False, pool)
+        assert second is first and second_shared and not first_shared
+        blocker.set()
+        assert first.result() and second.result()
+        assert pool.stats()['completed'] == 2
+    finally:
+        blocker.set()
+        pool.shutdown()
+
+
+def test_stats_command_reports_stage_percentiles(test_200k_file):
+    """Local clients get per-stage percentiles instead of a search."""
+    query = json.dumps({'query_string': '9;0;1;11;0;8;5;0;',
+                        'algorithm': 'linear'}).encode('utf-8')
+    local = ('127.0.0.1', 50000)
+    # The payload is sent before handle_client reads it
+    server_conn, client_conn = socket.socketpair()
+    client_conn.sendall(query)
+    pool = WorkerPool(workers=1)
+    handle_client(server_conn, local, test_200k_file, False, None, '', pool)
+    pool.shutdown()
+    assert client_conn.recv(64) == b'STRING EXISTS'
+    client_conn.close()
+
+    server_conn, client_conn = socket.socketpair()
+    client_conn.sendall(b'STATS')
+    handle_client(server_conn, local, test_200k_file, False, None, '')
+    stats = json.loads(client_conn.recv(1 << 20))
+    client_conn.close()
+    stages = stats['stages']['test_200k.txt']['linear']
+    assert set(stages) >= {'queue_wait', 'read', 'parse', 'index_acquire',
+                           'search', 'respond'}
+    assert stages['search']['count'] >= 1
+    assert stages['search']['p50_ms'] <= stages['search']['p999_ms']
+
+    # Remote clients cannot read the stats
+    server_conn, client_conn = socket.socketpair()
+    client_conn.sendall(b'STATS')
+    handle_client(server_conn, ('203.0.113.5', 50000), test_200k_file,
+                  False, None, '')
+    assert client_conn.recv(1 << 20) == b''
+    client_conn.close()
+
+
+def test_admin_metrics_describe_live_state(test_200k_file):
+    """The admin endpoint reports the pool, index and query latencies."""
+    pool = WorkerPool(workers=1)
+    registry = server.MetricsRegistry(['linear'])
+    try:
+        query = {'query_string': '9;0;1;11;0;8;5;0;', 'algorithm': 'linear'}
+        stages = {}
+        assert run_search(test_200k_file, query, False, pool, stages)[0]
+        registry.record('execution_times', 'linear', False, 1.5)
+        registry.record_stages('test_200k.txt', 'linear', stages)
+        text = server.admin_metrics(pool, registry)
+    finally:
+        pool.shutdown()
+
+    assert 'search_server_worker_queue_depth 0.0' in text
+    assert 'search_server_worker_completed_total 1.0' in text
+    assert 'search_server_index_bytes{structure="hash_map"}' in text
+    assert 'search_server_index_build_seconds{structure="linear"' in text
+    assert ('search_server_query_execution_seconds_count'
+            '{algorithm="linear",reread_on_query="False"} 1.0') in text
+    assert ('search_server_stage_seconds{file="test_200k.txt",'
+            'algorithm="linear",stage="search",quantile="0.99"}') in text
@@ -0,0 +1,62 @@
+import uuid
+import pytest
+from lib.file_server import FileServer
+from lib.index_registry import IndexRegistry
+from lib.shared_index import (
+    SharedIndex,
+    SharedIndexFollower,
+    SharedIndexPublisher,
+    SharedSnapshot
+)
+
+
+@pytest.fixture(autouse=True)
+def isolated_file_server(monkeypatch):
+    # Restore the globally published snapshot after each test
+    monkeypatch.setattr(FileServer, '_snapshot', FileServer._snapshot)
+    IndexRegistry.clear()
+    yield
+    IndexRegistry.clear()
+
+
+@pytest.fixture
+def publisher():
+    publisher = SharedIndexPublisher(f"test_index_{uuid.uuid4().hex[:8]}")
+    yield publisher
+    publisher.close()
+
+
+def test_shared_index_membership():
+    content = "b;2;\na;1;\nlonger;line;3;\n"
+    name = f"test_index_{uuid.uuid4().hex[:8]}"
+    index = SharedIndex.create(
+        name, content, FileServer.hashing_data(content), 1)
+    try:
+        assert "a;1;" in index
+        assert "longer;line;3;" in index
+        assert "a;1" not in index
+        assert "a;1;a;1;a;1;a;1;" not in index
+        assert index.content() == content
+    finally:
+        index.close()
+        index.owner.unlink()
+
+
+def test_follower_switches_to_published_index(publisher):
+    # Workers pick up every snapshot the supervisor publishes
+    file_server = FileServer()
+    follower = SharedIndexFollower(publisher.pointer_name, "data.txt")
+    assert follower.sync() is False
+
+    publisher.publish(file_server.build_snapshot("a;1;\n", "data.txt"))
+    assert follower.sync() is True
+    assert isinstance(file_server.get_snapshot(), SharedSnapshot)
+    assert "a;1;" in file_server.get_snapshot().hash_map
+    assert follower.sync() is False
+
+    publisher.publish(file_server.build_snapshot("b;2;\n", "data.txt"))
+    assert follower.sync() is True
+    snapshot = file_server.get_snapshot()
+    assert "b;2;" in snapshot.hash_map
+    assert "a;1;" not in snapshot.hash_map
+    assert snapshot.content == "b;2;\n"
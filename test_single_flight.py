@@ -0,0 +1,40 @@
+import concurrent.futures
+
+from lib.single_flight import SingleFlight
+
+
+def test_single_flight_shares_in_flight_future():
+    single_flight = SingleFlight()
+    started = []
+
+    def start():
+        future = concurrent.futures.Future()
+        started.append(future)
+        return future
+
+    first, first_shared = single_flight.run('key', start)
+    second, second_shared = single_flight.run('key', start)
+    other, _ = single_flight.run('other', start)
+    assert second is first and not first_shared and second_shared
+    assert other is not first and len(started) == 2
+
+    first.set_result(True)
+    # Finished computations are not shared anymore
+    third, third_shared = single_flight.run('key', start)
+    assert third is not first and not third_shared
+    assert single_flight.stats() == {
+        'in_flight': 2, 'leaders': 3, 'coalesced': 1}
+
+
+def test_single_flight_does_not_remember_failed_starts():
+    single_flight = SingleFlight()
+
+    def start():
+        raise RuntimeError("queue full")
+
+    for _ in range(2):
+        try:
+            single_flight.run('key', start)
+        except RuntimeError:
+            pass
+    assert single_flight.stats()['in_flight'] == 0
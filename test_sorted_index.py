@@ -0,0 +1,25 @@
+from lib.sorted_index import SortedIndex
+
+CONTENT = "b;2;\na;1;\n a;1; \nlonger;line;3;\n"
+
+
+def test_sorted_index_is_sorted_and_distinct():
+    index = SortedIndex(CONTENT)
+    assert index.keys.tolist() == [b'', b'a;1;', b'b;2;', b'longer;line;3;']
+
+
+def test_sorted_index_lookups():
+    index = SortedIndex(CONTENT)
+    assert index.contains("a;1;")
+    assert index.contains(" longer;line;3; ")
+    assert not index.contains("a;1")
+    # Wider than every line, must not match a truncated prefix
+    assert not index.contains("longer;line;3;extra")
+
+
+def test_sorted_index_batch_matches_single_lookups():
+    index = SortedIndex(CONTENT)
+    targets = ["a;1;", "c;3;", "longer;line;3;extra", "b;2;", "zzz"]
+    assert index.contains_many(targets) == [
+        index.contains(target) for target in targets]
+    assert index.contains_many([]) == []
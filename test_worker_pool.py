@@ -0,0 +1,49 @@
+import threading
+import time
+import pytest
+from lib.socket_exception import ServerBusyError
+from lib.worker_pool import WorkerPool
+
+
+def test_worker_pool_runs_tasks_and_records_queue_wait():
+    pool = WorkerPool(workers=2, queue_depth=4)
+    future = pool.submit('linear', sum, [1, 2, 3])
+
+    assert future.result(timeout=5) == 6
+    assert future.queue_wait_ms >= 0
+    assert future.exec_time_ms >= 0
+    pool.shutdown()
+
+
+def test_worker_pool_rejects_when_queue_is_full():
+    # Queries beyond the queue depth are rejected instead of queued
+    release = threading.Event()
+    pool = WorkerPool(workers=1, queue_depth=1)
+    running = pool.submit('linear', release.wait)
+    while pool.stats()['queued']:
+        time.sleep(0.01)
+    queued = pool.submit('linear', release.wait)
+
+    with pytest.raises(ServerBusyError):
+        pool.submit('linear', release.wait)
+
+    release.set()
+    assert running.result(timeout=5) and queued.result(timeout=5)
+    assert pool.stats()['rejected'] == 1
+    pool.shutdown()
+
+
+def test_worker_pool_caps_slow_algorithms():
+    # A capped algorithm keeps only its share of the workers busy
+    release = threading.Event()
+    pool = WorkerPool(workers=2, queue_depth=8,
+                      algorithm_limits={'shell': 1})
+    slow = [pool.submit('shell', release.wait) for _ in range(3)]
+    fast = pool.submit('linear', sum, [1, 2])
+
+    assert fast.result(timeout=5) == 3
+    assert pool.stats()['running'].get('shell') == 1
+
+    release.set()
+    assert all(future.result(timeout=5) for future in slow)
+    pool.shutdown()